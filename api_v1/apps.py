@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiV1Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_v1'
+
+    def ready(self):
+        # сигналы Board -> сброс реестра бортов в памяти
+        from .urils import board_registry  # noqa: F401
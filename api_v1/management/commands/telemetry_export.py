@@ -0,0 +1,34 @@
+# выгрузка телеметрии борта в Parquet / Feather для разбора полётов
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Board
+from api_v1.urils import telemetry_export
+from api_v1.urils.telemetry_query import QueryError, parse_time
+
+
+class Command(BaseCommand):
+    help = "Выгрузка телеметрии борта (сессия / интервал времени) в Parquet или Feather кусками, через серверный курсор."
+
+    def add_arguments(self, parser):
+        parser.add_argument("boat", type=int, help="номер борта")
+        parser.add_argument("out", help="путь к файлу")
+        parser.add_argument("--sess")
+        parser.add_argument("--from", dest="start", help="ISO-8601 или epoch, включительно")
+        parser.add_argument("--to", dest="end", help="ISO-8601 или epoch, не включая")
+        parser.add_argument("--format", choices=sorted(telemetry_export.FORMATS), default="parquet")
+        parser.add_argument("--chunk-rows", type=int, default=telemetry_export.EXPORT_CHUNK_ROWS,
+                            help="строк в row group / record batch")
+
+    def handle(self, *args, **o):
+        board_id = Board.objects.filter(boat_number=o["boat"]).values_list("id", flat=True).first()
+        if board_id is None:
+            raise CommandError(f"board {o['boat']} not found")
+        try:
+            start, end = parse_time(o["start"], "from"), parse_time(o["end"], "to")
+            batches = telemetry_export.iter_record_batches(
+                board_id, sess=o["sess"], start=start, end=end, chunk_rows=o["chunk_rows"],
+            )
+            rows = telemetry_export.write_export(o["out"], o["format"], batches)
+        except (QueryError, telemetry_export.ExportUnavailable) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"{rows} rows -> {o['out']}")
@@ -0,0 +1,185 @@
+# приём телеметрии напрямую по TCP/UDP, без HTTP и middleware
+import asyncio
+import json
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError, close_old_connections
+
+from api_v1.urils.telemetry_ingest import ingest_payloads
+from api_v1.urils.telemetry_stream import iter_bodies_payloads
+
+
+# TCP-кадр: u32 big-endian длина + тело (NDJSON / JSON / бинарные кадры, можно gzip)
+_LEN = struct.Struct(">I")
+
+
+class _Frame:
+    __slots__ = ("body", "conn")
+
+    def __init__(self, body, conn=None):
+        self.body, self.conn = body, conn
+
+
+class _Connection:
+    """Состояние TCP-соединения: не больше max_frames кадров «в полёте»."""
+
+    def __init__(self, writer, max_frames, ack):
+        self.writer = writer
+        self.slots = asyncio.Semaphore(max_frames)
+        self.ack = ack
+
+    def done(self, result):
+        self.slots.release()
+        if self.ack and not self.writer.is_closing():
+            # кадр записан; итог — общий по всей микропачке, в которую он попал.
+            # result None — микропачку записать не удалось, кадр сброшен
+            data = json.dumps({"ok": True, "flush": result} if result is not None else {"ok": False}).encode()
+            self.writer.write(_LEN.pack(len(data)) + data)
+
+
+class TelemetryListener:
+    def __init__(self, flush_interval, flush_frames, queue_frames, conn_frames, max_frame, ack):
+        self.flush_interval = flush_interval
+        self.flush_frames = flush_frames
+        self.conn_frames = conn_frames
+        self.max_frame = max_frame
+        self.ack = ack
+        self.queue = asyncio.Queue(maxsize=queue_frames)
+        # ORM синхронный — пишем в одном отдельном потоке, с одним соединением к БД
+        self.db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telemetry-db")
+        self.stats = {"connections": 0, "frames": 0, "udp_dropped": 0, "dropped": 0, "saved": 0, "updated": 0, "errors": 0}
+
+    # TCP
+
+    async def handle_tcp(self, reader, writer):
+        conn = _Connection(writer, self.conn_frames, self.ack)
+        self.stats["connections"] += 1
+        try:
+            while True:
+                head = await reader.readexactly(_LEN.size)
+                (size,) = _LEN.unpack(head)
+                if size > self.max_frame:
+                    print(f"[listener] frame {size} > {self.max_frame} bytes, closing {writer.get_extra_info('peername')}")
+                    break
+                body = await reader.readexactly(size)
+                # пока у соединения max_frames необработанных кадров — дальше из сокета не читаем,
+                # и TCP сам притормаживает борт
+                await conn.slots.acquire()
+                await self.queue.put(_Frame(body, conn))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.stats["connections"] -= 1
+            writer.close()
+
+    # UDP: одна датаграмма — одно тело, подтверждений нет; при переполнении очереди — сброс
+
+    def datagram_received(self, data, addr):
+        if len(data) > self.max_frame:
+            return
+        try:
+            self.queue.put_nowait(_Frame(data))
+        except asyncio.QueueFull:
+            self.stats["udp_dropped"] += 1
+
+    # запись
+
+    def _write(self, frames):
+        close_old_connections()
+        return ingest_payloads(iter_bodies_payloads((None, f.body) for f in frames))
+
+    async def flusher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frames = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(frames) < self.flush_frames:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    frames.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            while True:
+                try:
+                    res = await loop.run_in_executor(self.db, self._write, frames)
+                    break
+                except (OperationalError, InterfaceError) as e:
+                    # БД недоступна — держим кадры (и слоты соединений) и повторяем
+                    print(f"[listener] flush failed, retrying: {e}")
+                    await asyncio.sleep(1)
+                except Exception as e:
+                    # ошибка в данных или в коде — повтор её не исправит: кадры сбрасываем,
+                    # иначе вставший flusher держал бы слоты всех соединений и очередь
+                    print(f"[listener] flush failed, {len(frames)} frames dropped: {e!r}")
+                    res = None
+                    break
+
+            self.stats["frames"] += len(frames)
+            if res is None:
+                self.stats["dropped"] += len(frames)
+            else:
+                for k in ("saved", "updated", "errors"):
+                    self.stats[k] += res[k]
+            for f in frames:
+                if f.conn is not None:
+                    f.conn.done(res)
+
+    async def report(self, every):
+        while True:
+            await asyncio.sleep(every)
+            print(f"[listener] {time.strftime('%H:%M:%S')} {self.stats} queue={self.queue.qsize()}")
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.datagram_received(data, addr)
+
+
+class Command(BaseCommand):
+    help = "Приём телеметрии с бортов по TCP (кадры с длиной) и UDP (датаграммы) с микропакетной записью в БД."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--tcp-port", type=int, default=9100, help="0 — не слушать TCP")
+        parser.add_argument("--udp-port", type=int, default=9101, help="0 — не слушать UDP")
+        parser.add_argument("--flush-interval", type=float, default=0.2, help="секунд между записями в БД")
+        parser.add_argument("--flush-frames", type=int, default=500, help="кадров в одной записи")
+        parser.add_argument("--queue-frames", type=int, default=20000, help="общий лимит кадров в очереди")
+        parser.add_argument("--conn-frames", type=int, default=8, help="кадров «в полёте» на одно TCP-соединение")
+        parser.add_argument("--max-frame", type=int, default=1024 * 1024, help="максимальный размер кадра, байт")
+        parser.add_argument("--ack", action="store_true", help="отвечать по TCP итогом записи на каждый кадр")
+        parser.add_argument("--report", type=float, default=60, help="секунд между строками статистики")
+
+    def handle(self, *args, **o):
+        listener = TelemetryListener(
+            flush_interval=o["flush_interval"], flush_frames=o["flush_frames"],
+            queue_frames=o["queue_frames"], conn_frames=o["conn_frames"],
+            max_frame=o["max_frame"], ack=o["ack"],
+        )
+        try:
+            asyncio.run(self._serve(listener, o))
+        except KeyboardInterrupt:
+            pass
+
+    async def _serve(self, listener, o):
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.create_task(listener.flusher()), asyncio.create_task(listener.report(o["report"]))]
+
+        if o["tcp_port"]:
+            server = await asyncio.start_server(listener.handle_tcp, o["host"], o["tcp_port"])
+            tasks.append(asyncio.create_task(server.serve_forever()))
+            self.stdout.write(f"TCP {o['host']}:{o['tcp_port']}")
+        if o["udp_port"]:
+            await loop.create_datagram_endpoint(lambda: _UDPProtocol(listener), local_addr=(o["host"], o["udp_port"]))
+            self.stdout.write(f"UDP {o['host']}:{o['udp_port']}")
+
+        await asyncio.gather(*tasks)
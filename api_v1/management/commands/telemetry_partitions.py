@@ -0,0 +1,28 @@
+# обслуживание помесячных секций telemetry: создать будущие, отключить/удалить просроченные
+from django.core.management.base import BaseCommand
+
+from api_v1.urils import telemetry_partitions
+
+
+class Command(BaseCommand):
+    help = "Создаёт секции telemetry на ближайшие месяцы и отключает/удаляет секции старше срока хранения."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=telemetry_partitions.PARTITIONS_AHEAD,
+                            help="сколько месяцев вперёд держать готовые секции")
+        parser.add_argument("--retention-months", type=int, default=telemetry_partitions.RETENTION_MONTHS,
+                            help="срок хранения в месяцах; без него ничего не удаляется")
+        parser.add_argument("--detach-only", action="store_true",
+                            help="просроченные секции только отключать (DETACH), не удалять")
+
+    def handle(self, *args, **o):
+        res = telemetry_partitions.maintain(o["ahead"], o["retention_months"], o["detach_only"])
+        if not res["partitioned"]:
+            self.stdout.write("telemetry is not partitioned (not Postgres or migration 0026 not applied) — nothing to do")
+            return
+        for p in res["created"]:
+            self.stdout.write(f"created {p['partition']} (moved {p['moved']} rows from default)")
+        for p in res["expired"]:
+            self.stdout.write(f"expired {p}")
+        if not res["created"] and not res["expired"]:
+            self.stdout.write("partitions are up to date")
@@ -1,88 +1,10 @@
 import re
-from django.utils import dateparse, timezone
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import check_password
 
 from app.models import AuthUser, Note, Tags, Category, Photo, Video, UserRank, Telemetry, Board
 
-from api_v1.urils.telemetry_utils import maybe_mark_power_on
-
-
-# сериализатор для телема
-class TelemetryInSerializer(serializers.Serializer):
-    # идентификаторы/штампы
-    ts = serializers.CharField(required=False)
-    ts_epoch = serializers.IntegerField(required=False, allow_null=True)
-    raw = serializers.CharField(required=False, allow_null=True, allow_blank=True)
-    sess = serializers.CharField(required=False, allow_null=True, allow_blank=True)
-    boat = serializers.IntegerField(required=True)
-    seq = serializers.IntegerField(required=False, allow_null=True)
-
-    # данные
-    mode = serializers.CharField(required=False, allow_null=True, allow_blank=True)
-    lat = serializers.FloatField(required=False, allow_null=True)
-    lon = serializers.FloatField(required=False, allow_null=True)
-    alt_m = serializers.FloatField(required=False, allow_null=True)
-    gs = serializers.FloatField(required=False, allow_null=True)
-    hdg = serializers.FloatField(required=False, allow_null=True)
-    volt = serializers.FloatField(required=False, allow_null=True)
-    airspd = serializers.FloatField(required=False, allow_null=True)
-    wind_n = serializers.FloatField(required=False, allow_null=True)
-    wind_e = serializers.FloatField(required=False, allow_null=True)
-    wind_spd = serializers.FloatField(required=False, allow_null=True)
-    wind_dir = serializers.FloatField(required=False, allow_null=True)
-    gps = serializers.CharField(required=False, allow_null=True, allow_blank=True)
-    arm = serializers.IntegerField(required=False, allow_null=True)
-
-    def _parse_ts(self, ts_str, ts_epoch):
-        if ts_epoch is not None:
-            try:
-                return timezone.datetime.fromtimestamp(int(ts_epoch), tz=timezone.utc)
-            except Exception:
-                pass
-        if not ts_str:
-            return timezone.now()
-        dt = dateparse.parse_datetime(ts_str) or dateparse.parse_datetime(ts_str.replace(" ", "T"))
-        if dt is None:
-            return timezone.now()
-        if timezone.is_naive(dt):
-            dt = timezone.make_aware(dt, timezone.get_current_timezone())
-        return dt
-
-    def create(self, v):
-        board, _ = Board.objects.get_or_create(boat_number=v["boat"])
-        ts = self._parse_ts(v.get("ts"), v.get("ts_epoch"))
-
-        tel = Telemetry.objects.create(
-            board=board,
-            ts=ts,
-            ts_epoch=v.get("ts_epoch"),
-            raw=v.get("raw"),
-            sess=v.get("sess"),
-            seq=v.get("seq"),
-            mode=v.get("mode"),
-            lat=v.get("lat"),
-            lon=v.get("lon"),
-            alt_m=v.get("alt_m"),
-            gs=v.get("gs"),
-            hdg=v.get("hdg"),
-            volt=v.get("volt"),
-            airspd=v.get("airspd"),
-            wind_n=v.get("wind_n"),
-            wind_e=v.get("wind_e"),
-            wind_spd=v.get("wind_spd"),
-            wind_dir=v.get("wind_dir"),
-            gps=v.get("gps"),
-            arm=bool(v.get("arm", 0)),
-        )
-
-        # обновим только «сводку» в борте (без «last_*» служебных полей)
-        maybe_mark_power_on(board, v, ts)
-
-        return tel
-
-
 
 # сериализаторы для бота        
 
@@ -1,3 +1,692 @@
-from django.test import TestCase
+import gzip
+import asyncio
+import io
+import json
+import math
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DataError, OperationalError, connection
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory
+
+from app.models import Board, FlightSession, Telemetry, TelemetryRollup1s
+from api_v1.urils import board_registry, seq_tracker, telemetry_binary, telemetry_export, telemetry_query, telemetry_rollup, telemetry_spool
+from api_v1.urils import notify_outbox, telemetry_batches, telemetry_ingest, telemetry_limits, telemetry_shards, telemetry_writer
+from api_v1.urils.telemetry_ingest import _write_rows_one_by_one, ingest_payloads, write_rows
+from api_v1.urils.telemetry_normalize import normalize_batch
+from api_v1.urils.telemetry_binary import BinaryFormatError, encode, iter_frames_payloads
+from api_v1.views import TelemetryFromJsonl
+from api_v1.management.commands.telemetry_listener import TelemetryListener, _Connection, _Frame
+from api_v1.urils.telemetry_stream import KIND_BINARY, KIND_NDJSON, BodyTooLarge, iter_body, iter_lines, iter_payloads
+
+
+def _sample(i, **kw):
+    p = {
+        "ts_epoch": 1756500000 + i, "seq": 100 + i,
+        "lat": 55.7558 + i * 1e-4, "lon": 37.6173 - i * 2e-4, "alt_m": 120.3 + i,
+        "gs": 17.25, "hdg": 359.99, "volt": 23.87,
+        "wind_spd": 4.1, "wind_dir": 270.5,
+        "mode": "AUTO", "gps": "3D", "arm": 1,
+    }
+    p.update(kw)
+    return p
+
+
+class TelemetryBinaryRoundTripTests(SimpleTestCase):
+
+    def assertSampleEqual(self, got, want, boat, sess):
+        self.assertEqual(got["boat"], boat)
+        self.assertEqual(got["sess"], sess)
+        self.assertEqual(got["ts_epoch"], want["ts_epoch"])
+        self.assertEqual(got["seq"], want.get("seq"))
+        for key, tol in (("lat", 1e-6), ("lon", 1e-6), ("alt_m", 0.05), ("gs", 0.005),
+                         ("hdg", 0.005), ("volt", 0.005), ("wind_spd", 0.005), ("wind_dir", 0.005)):
+            w = want.get(key)
+            if w is None or (isinstance(w, float) and math.isnan(w)):
+                self.assertIsNone(got[key], key)
+            else:
+                self.assertAlmostEqual(got[key], w, delta=tol, msg=key)
+        self.assertEqual(got["mode"], want.get("mode"))
+        self.assertEqual(got["gps"], want.get("gps"))
+        self.assertEqual(got["arm"], want.get("arm") == 1)
+
+    def roundtrip(self, samples, boat=17, sess="s-1"):
+        got = list(iter_frames_payloads(encode(boat, sess, samples)))
+        self.assertEqual(len(got), len(samples))
+        for g, w in zip(got, samples):
+            self.assertSampleEqual(g, w, boat, sess)
+        return got
+
+    def test_roundtrip_full_samples(self):
+        self.roundtrip([_sample(i) for i in range(50)])
+
+    def test_record_size_is_fixed(self):
+        one = encode(1, "s", [_sample(0)])
+        two = encode(1, "s", [_sample(0), _sample(1)])
+        self.assertEqual(len(two) - len(one), telemetry_binary.RECORD_DTYPE.itemsize)
+
+    def test_nulls_and_nan(self):
+        samples = [
+            _sample(0),
+            _sample(1, lat=None, lon=float("nan"), alt_m=None, volt=None, mode=None, gps="", arm=0),
+            _sample(2),
+        ]
+        samples[1]["gps"] = None
+        self.roundtrip(samples)
+
+    def test_without_sess_and_seq(self):
+        samples = [{k: v for k, v in _sample(i).items() if k != "seq"} for i in range(3)]
+        got = self.roundtrip(samples, sess=None)
+        self.assertTrue(all(g["seq"] is None for g in got))
+
+    def test_new_frame_when_delta_does_not_fit(self):
+        samples = [
+            _sample(0),
+            _sample(1, ts_epoch=1756500000 + 3600),   # большой разрыв по времени
+            _sample(2, ts_epoch=1756500000 + 3601, lat=10.0, lon=-70.0),  # скачок координат
+            _sample(3, ts_epoch=1756500000 + 3602, seq=5),  # seq пошёл назад
+            _sample(4, ts_epoch=1756500000 + 3603, seq=5000),
+        ]
+        data = encode(3, "s", samples)
+        self.assertEqual(data.count(telemetry_binary.MAGIC), 5)
+        self.roundtrip(samples, boat=3, sess="s")
+
+    def test_sub_second_timestamps(self):
+        samples = [dict(_sample(0), ts_ms=1756500000000 + i * 200, seq=i) for i in range(10)]
+        got = list(iter_frames_payloads(encode(1, "s", samples)))
+        self.assertEqual([g["ts_epoch"] for g in got], [1756500000 + (i * 200) // 1000 for i in range(10)])
+
+    def test_many_modes_in_one_frame(self):
+        samples = [_sample(i, mode=f"M{i}") for i in range(300)]
+        self.roundtrip(samples)
+
+    def test_gzip_and_concatenated_frames_via_stream(self):
+        a = [_sample(i) for i in range(5)]
+        b = [_sample(i, mode="RTL") for i in range(5, 9)]
+        body = gzip.compress(encode(1, "a", a) + encode(2, "b", b))
+        got = list(iter_payloads(iter_body(io.BytesIO(body), 7), KIND_BINARY))
+        self.assertEqual([g["boat"] for g in got], [1] * 5 + [2] * 4)
+        self.assertEqual(got[-1]["mode"], "RTL")
+
+    def test_truncated_frame(self):
+        data = encode(1, "s", [_sample(i) for i in range(3)])
+        with self.assertRaises(BinaryFormatError):
+            list(iter_frames_payloads(data[:-1]))
+        with self.assertRaises(BinaryFormatError):
+            list(iter_frames_payloads(data[:10]))
+
+    def test_bad_magic_and_version(self):
+        data = bytearray(encode(1, "s", [_sample(0)]))
+        with self.assertRaises(BinaryFormatError):
+            list(iter_frames_payloads(b"XXXX" + bytes(data[4:])))
+        data[4] = 99
+        with self.assertRaises(BinaryFormatError):
+            list(iter_frames_payloads(bytes(data)))
+
+
+class NormalizeBatchTests(SimpleTestCase):
+
+    def test_out_of_range_values_are_clamped(self):
+        rows, errs = normalize_batch([
+            _sample(0, boat=1, lat=91.5, lon=-200.0, volt=-0.3),
+            _sample(1, boat=1, lat="null", lon=None, volt=float("nan")),
+        ])
+        self.assertEqual(errs, [])
+        self.assertEqual([(r["lat"], r["lon"], r["volt"]) for r in rows], [(90.0, -180.0, 0.0), (None, None, None)])
+
+
+class GzipBodyTests(SimpleTestCase):
+
+    def test_chunks_are_bounded(self):
+        body = gzip.compress(b"x" * 1_000_000)
+        chunks = list(iter_body(io.BytesIO(body), 4096))
+        self.assertEqual(b"".join(chunks), b"x" * 1_000_000)
+        self.assertLessEqual(max(map(len, chunks)), 4096)
+
+    def test_concatenated_members(self):
+        body = gzip.compress(b"a" * 70_000) + gzip.compress(b"b" * 10)
+        self.assertEqual(b"".join(iter_body(io.BytesIO(body), 1024)), b"a" * 70_000 + b"b" * 10)
+
+    def test_decompression_bomb(self):
+        body = gzip.compress(b"\0" * 10_000_000)
+        self.assertLess(len(body), 20_000)
+        with self.assertRaises(BodyTooLarge):
+            for _ in iter_body(io.BytesIO(body), 64 * 1024, max_bytes=1_000_000):
+                pass
+
+    def test_truncated(self):
+        body = gzip.compress(b"x" * 1000)
+        with self.assertRaises(EOFError):
+            list(iter_body(io.BytesIO(body[:-8])))
+
+    def test_plain_body_is_bounded(self):
+        self.assertEqual(b"".join(iter_body(io.BytesIO(b"x" * 5000), 1024, max_bytes=5000)), b"x" * 5000)
+        with self.assertRaises(BodyTooLarge):
+            list(iter_body(io.BytesIO(b"x" * 5001), 1024, max_bytes=5000))
+
+
+class IterLinesTests(SimpleTestCase):
+
+    def test_lines_across_chunks(self):
+        body = b"a1\nbb22\n\nccc333\nd"
+        for size in (1, 2, 3, 5, 100):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(list(iter_lines(chunks)), [b"a1", b"bb22", b"", b"ccc333", b"d"])
+
+    def test_long_line_is_rejected(self):
+        self.assertEqual(list(iter_lines([b"x" * 6, b"x" * 4 + b"\n"], max_line=10)), [b"x" * 10])
+        with self.assertRaises(BodyTooLarge):
+            list(iter_lines([b"x" * 6, b"x" * 5 + b"\n"], max_line=10))
+        with self.assertRaises(BodyTooLarge):
+            list(iter_lines(iter([b"x" * 6] * 1000), max_line=10))
+        with self.assertRaises(BodyTooLarge):
+            list(iter_lines([b"a\n" + b"x" * 11 + b"\nb"], max_line=10))
+
+
+class ParseTimeTests(SimpleTestCase):
+
+    def test_epoch_and_iso(self):
+        want = datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
+        self.assertEqual(telemetry_query.parse_time("1700000000", "from"), want)
+        self.assertEqual(telemetry_query.parse_time("2023-11-14T22:13:20", "from"), want)
+        self.assertIsNone(telemetry_query.parse_time("", "from"))
+
+    def test_out_of_range_is_query_error(self):
+        for value in ("inf", "-inf", "nan", "1e20", "2024-13-45T00:00:00", "yesterday"):
+            with self.assertRaises(telemetry_query.QueryError, msg=value):
+                telemetry_query.parse_time(value, "from")
+
+
+def _rows(board, seqs, sess="s-1", **kw):
+    """Нормализованные строки борта с board_id, как их видит write_rows."""
+    objs = [dict(_sample(seq, seq=seq, sess=sess), boat=board.boat_number, **kw) for seq in seqs]
+    rows, errs = normalize_batch(objs)
+    assert not errs, errs
+    for r in rows:
+        r["board_id"] = board.pk
+    return rows
+
+
+class TelemetryDbTestCase(TestCase):
+    """Кэши процесса (реестр бортов, трекер seq) живут дольше транзакции теста — чистим."""
+
+    def setUp(self):
+        board_registry.clear()
+        seq_tracker.clear()
+        self.addCleanup(board_registry.clear)
+        self.addCleanup(seq_tracker.clear)
+
+
+class BulkWriteCountsTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.bulk = Board.objects.create(boat_number=101)
+        self.slow = Board.objects.create(boat_number=102)
+
+    def both(self, seqs, **kw):
+        """(saved, updated, errors) пакетного и построчного путей на одинаковых данных разных бортов."""
+        bulk = write_rows(_rows(self.bulk, seqs, **kw))
+        slow_rows = _rows(self.slow, seqs, **kw)
+        seq_tracker.classify(slow_rows)
+        for r in slow_rows:
+            r["fresh"] = r["failed"] = False
+        slow = _write_rows_one_by_one(slow_rows, 0)
+        self.assertEqual(bulk, slow)
+        return bulk
+
+    def test_new_then_overlapping_batch(self):
+        self.assertEqual(self.both(range(10)), (10, 0, 0))
+        self.assertEqual(self.both(range(5, 15)), (5, 5, 0))
+        self.assertEqual(Telemetry.objects.filter(board=self.bulk).count(), 15)
+        self.assertEqual(Telemetry.objects.filter(board=self.slow).count(), 15)
+
+    def test_updated_counts_only_rows_of_the_batch(self):
+        self.both(range(100))
+        # в диапазон seq 0..99 попадают 100 строк БД, но в пачке их две
+        self.assertEqual(self.both([0, 99]), (0, 2, 0))
+
+    def test_rows_without_stream_key_are_always_new(self):
+        self.assertEqual(self.both(range(3), sess=None), (3, 0, 0))
+        self.assertEqual(self.both(range(3), sess=None), (3, 0, 0))
+
+    def test_fresh_flags_and_values_are_updated(self):
+        write_rows(_rows(self.bulk, range(3)))
+        rows = _rows(self.bulk, range(2, 5), volt=12.5)
+        self.assertEqual(write_rows(rows), (2, 1, 0))
+        self.assertEqual([r["fresh"] for r in rows], [False, True, True])
+        self.assertEqual(Telemetry.objects.get(board=self.bulk, seq=2).volt, 12.5)
+
+    def test_retransmit_without_device_time_is_deduplicated(self):
+        def rows(now):
+            objs = [{"boat": self.bulk.boat_number, "sess": "s-1", "seq": i, "volt": 20.0 + i} for i in range(3)]
+            out, _ = normalize_batch(objs, now=now)
+            for r in out:
+                r["board_id"] = self.bulk.pk
+            return out
+
+        first = datetime(2025, 9, 1, 12, 0, tzinfo=timezone.utc)
+        self.assertEqual(write_rows(rows(first)), (3, 0, 0))
+        self.assertEqual(write_rows(rows(first + timedelta(minutes=5))), (0, 3, 0))
+        self.assertEqual(list(Telemetry.objects.filter(board=self.bulk).values_list("ts", flat=True).distinct()), [first])
+
+
+class SpoolTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        for name, value in (("SPOOL_DIR", self.dir), ("_writer", telemetry_spool._SpoolWriter())):
+            patcher = mock.patch.object(telemetry_spool, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def body(self, boat, seqs):
+        return "\n".join(json.dumps(dict(_sample(i, seq=i), boat=boat, sess="s-1")) for i in seqs).encode()
+
+    def files(self, suffix):
+        return sorted(p.name for p in self.dir.iterdir() if p.suffix == suffix)
+
+    def test_append_and_drain(self):
+        telemetry_spool.spool_batch(self.body(201, range(3)), KIND_NDJSON)
+        telemetry_spool.spool_batch(gzip.compress(self.body(201, range(3, 5))), KIND_NDJSON)
+        res = telemetry_spool.drain_spool()
+        self.assertEqual((res["records"], res["saved"]), (2, 5))
+        self.assertEqual(Telemetry.objects.filter(board__boat_number=201).count(), 5)
+        # молодой .open остаётся, но второй проход его не перечитывает
+        self.assertEqual(len(self.files(".open")), 1)
+        self.assertEqual(telemetry_spool.drain_spool()["records"], 0)
+
+    def test_sealed_segment_is_removed_after_drain(self):
+        telemetry_spool.spool_batch(self.body(202, range(2)), KIND_NDJSON)
+        with mock.patch.object(telemetry_spool, "SPOOL_SEGMENT_SECONDS", 0):
+            telemetry_spool.spool_batch(self.body(202, range(2, 4)), KIND_NDJSON)
+        self.assertEqual(len(self.files(".seg")), 1)
+        self.assertEqual(len(self.files(".open")), 1)
+        res = telemetry_spool.drain_spool()
+        self.assertEqual((res["saved"], res["segments_done"]), (4, 1))
+        self.assertEqual(self.files(".seg"), [])
+
+    def test_writer_survives_drained_idle_segment(self):
+        telemetry_spool.spool_batch(self.body(203, [0]), KIND_NDJSON)
+        [name] = self.files(".open")
+        # дренаж удалил простоявший .open, следующая пачка приходит позже срока сегмента
+        os.unlink(self.dir / name)
+        telemetry_spool._writer._created = time.time() - telemetry_spool.SPOOL_SEGMENT_SECONDS - 1
+        telemetry_spool.spool_batch(self.body(203, [1]), KIND_NDJSON)
+        telemetry_spool.spool_batch(self.body(203, [2]), KIND_NDJSON)
+        self.assertEqual(telemetry_spool.drain_spool()["saved"], 2)
+
+    def test_corrupt_segment_is_quarantined(self):
+        telemetry_spool.spool_batch(self.body(204, range(2)), KIND_NDJSON)
+        [name] = self.files(".open")
+        with open(self.dir / name, "ab") as f:
+            f.write(b"garbage" * 10)
+        res = telemetry_spool.drain_spool()
+        self.assertEqual((res["saved"], res["quarantined"]), (2, 1))
+        self.assertEqual(self.files(".open"), [])
+        self.assertTrue((self.dir / "quarantine" / name).exists())
+        self.assertEqual(telemetry_spool.drain_spool()["records"], 0)
+
+    def test_second_drain_is_skipped(self):
+        telemetry_spool.spool_batch(self.body(205, [0]), KIND_NDJSON)
+        with open(self.dir / ".drain.lock", "w") as held:
+            self.assertTrue(telemetry_spool._try_lock(held))
+            self.assertEqual(telemetry_spool.drain_spool(), {"skipped": "another drain is running"})
+        self.assertEqual(telemetry_spool.drain_spool()["saved"], 1)
+
+    def test_rows_without_device_time_keep_arrival_time(self):
+        received = datetime(2025, 9, 1, 12, 0, tzinfo=timezone.utc)
+        body = "\n".join(json.dumps({"boat": 206, "sess": "s-1", "seq": i}) for i in range(3)).encode()
+        with mock.patch.object(telemetry_spool.time, "time", return_value=received.timestamp()):
+            telemetry_spool.spool_batch(body, KIND_NDJSON)
+        self.assertEqual(telemetry_spool.drain_spool()["saved"], 3)
+        self.assertEqual(set(Telemetry.objects.filter(board__boat_number=206).values_list("ts", flat=True)), {received})
+
+    def test_old_records_are_still_read(self):
+        body = self.body(207, range(2))
+        seg = self.dir / "0000000000001-1-00000000.seg"
+        seg.write_bytes(telemetry_spool._HEADER_V1.pack(
+            telemetry_spool._MAGIC_V1, 0, len(body), zlib.crc32(body), bytes(16)) + body)
+        res = telemetry_spool.drain_spool()
+        self.assertEqual((res["saved"], res["segments_done"], res["quarantined"]), (2, 1, 0))
+
+
+class RollupWatermarkTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.board = Board.objects.create(boat_number=301)
+        self.t0 = datetime(2025, 9, 1, 12, 0, tzinfo=timezone.utc)
+
+    def row(self, pk, sec):
+        Telemetry.objects.create(id=pk, board=self.board, ts=self.t0 + timedelta(seconds=sec), sess="s", seq=pk, volt=24.0)
+
+    def run_pass(self, xmin, xmax):
+        snapshot = {"pg_snapshot_xmin": xmin, "pg_snapshot_xmax": xmax}
+        with mock.patch.object(telemetry_rollup, "_snapshot_xid", snapshot.get):
+            return telemetry_rollup.update_rollups()
+
+    def buckets(self):
+        return sorted(TelemetryRollup1s.objects.filter(board=self.board).values_list("bucket", flat=True))
+
+    def test_row_committed_below_watermark_is_rolled_up(self):
+        self.row(100, 0)
+        self.row(200, 2)
+        self.assertEqual(self.run_pass(10, 20)["rows"], 2)
+        # транзакция с id 150 коммитится после прохода
+        self.row(150, 1)
+        # она ещё шла во время прошлого прохода (xmin < guard) — ждём
+        res = self.run_pass(15, 30)
+        self.assertEqual((res["rows"], res["rescanned"]), (0, 0))
+        self.assertEqual(len(self.buckets()), 2)
+        # все те транзакции завершились — (100, 200] пересчитан
+        self.assertEqual(self.run_pass(35, 40)["rescanned"], 3)
+        self.assertEqual(self.buckets(), [self.t0 + timedelta(seconds=i) for i in range(3)])
+        # дальше закрытый диапазон не перечитывается
+        self.assertEqual(self.run_pass(45, 50)["rescanned"], 0)
+
+
+class ExportTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.board = Board.objects.create(boat_number=401)
+        modes = ["AUTO", "AUTO", "RTL", "LOITER", None]
+        write_rows(_rows(self.board, range(5)))
+        for seq, mode in enumerate(modes):
+            Telemetry.objects.filter(board=self.board, seq=seq).update(mode=mode)
+        self.modes = modes
+
+    def test_feather_with_different_modes_per_batch(self):
+        import pyarrow as pa
+
+        batches = telemetry_export.iter_record_batches(self.board.pk, chunk_rows=2)
+        body = b"".join(telemetry_export.stream_export("feather", batches))
+        table = pa.ipc.open_file(pa.BufferReader(body)).read_all()
+        self.assertEqual(table.column("mode").to_pylist(), self.modes)
+        self.assertEqual(table.column("seq").to_pylist(), list(range(5)))
+
+    def test_parquet_keeps_dictionary_columns(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buf = io.BytesIO()
+        rows = telemetry_export.write_export(buf, "parquet", telemetry_export.iter_record_batches(self.board.pk, chunk_rows=2))
+        self.assertEqual(rows, 5)
+        table = pq.read_table(pa.BufferReader(buf.getvalue()))
+        self.assertEqual(table.column("mode").to_pylist(), self.modes)
+
+
+class SessionFoldTests(TelemetryDbTestCase):
+
+    def payloads(self, boat, seqs):
+        return [dict(_sample(i, seq=i), boat=boat, sess="f-1") for i in seqs]
+
+    def session(self, boat):
+        return FlightSession.objects.get(board__boat_number=boat, sess="f-1")
+
+    def test_chunks_fold_like_one_batch(self):
+        ingest_payloads(self.payloads(501, range(10)))
+        ingest_payloads(self.payloads(502, range(10)), chunk_rows=3)
+        one, chunked = self.session(501), self.session(502)
+        for f in ("samples", "seq_min", "seq_max", "last_seq", "gap_runs", "late_samples", "iat_n", "start_ts", "end_ts"):
+            self.assertEqual(getattr(chunked, f), getattr(one, f), f)
+        self.assertEqual(chunked.samples, 10)
+        self.assertAlmostEqual(chunked.distance_m, one.distance_m, places=6)
+        self.assertAlmostEqual(chunked.arm_seconds, one.arm_seconds, places=6)
+        self.assertAlmostEqual(Board.objects.get(boat_number=502).distance_m, one.distance_m, places=6)
+
+    def test_retransmit_is_not_folded_twice(self):
+        ingest_payloads(self.payloads(503, range(5)))
+        ingest_payloads(self.payloads(503, range(3, 8)), chunk_rows=2)
+        self.assertEqual(self.session(503).samples, 8)
+
+    def test_failed_merge_rolls_back_the_chunk(self):
+        with mock.patch.object(telemetry_ingest, "apply_sessions", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                ingest_payloads(self.payloads(504, range(5)))
+        self.assertFalse(Telemetry.objects.filter(board__boat_number=504).exists())
+        # повтор пачки: строки снова новые и попадают в сводку
+        self.assertEqual(ingest_payloads(self.payloads(504, range(5)))["saved"], 5)
+        self.assertEqual(self.session(504).samples, 5)
+
+
+class NotifyBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_state_is_shared_through_cache(self):
+        for _ in range(notify_outbox.TELEGRAM_CHAT_BURST):
+            self.assertEqual(notify_outbox._bucket(7).wait_time(), 0)
+            notify_outbox._bucket(7).take()
+        # новое ведро того же чата (другой процесс, перезапуск) видит, что запас исчерпан
+        self.assertGreater(notify_outbox._bucket(7).wait_time(), 0)
+        self.assertEqual(notify_outbox._bucket(8).wait_time(), 0)
+
+    def test_pause_holds_the_chat(self):
+        notify_outbox._bucket(7).pause(30)
+        self.assertGreater(notify_outbox._bucket(7).wait_time(), 29)
+
+
+class SeqTrackerTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.board = Board.objects.create(boat_number=601)
+
+    def write(self, rows):
+        # в TestCase COMMIT не наступает — on_commit (запоминание в трекере) выполняем сами
+        with self.captureOnCommitCallbacks(execute=True):
+            return write_rows(rows)
+
+    def classes(self, rows):
+        seq_tracker.classify(rows)
+        return [r["seq_class"] for r in rows]
+
+    def test_only_identical_rows_are_duplicates(self):
+        self.write(_rows(self.board, [1, 2, 3, 5]))
+        rows = _rows(self.board, [1, 2, 4, 6])
+        rows[1]["volt"] = 99.0
+        self.assertEqual(self.classes(rows), [seq_tracker.DUPLICATE, seq_tracker.KNOWN, seq_tracker.OUT_OF_ORDER, seq_tracker.NEW])
+        moved = _rows(self.board, [3])
+        moved[0]["ts"] += timedelta(seconds=1)
+        self.assertEqual(self.classes(moved), [seq_tracker.KNOWN])
+
+    def test_corrected_retransmit_reaches_the_db(self):
+        self.write(_rows(self.board, range(3)))
+        self.assertEqual(self.write(_rows(self.board, range(3))), (0, 3, 0))
+        self.assertEqual(self.write(_rows(self.board, range(3), volt=12.5)), (0, 3, 0))
+        self.assertEqual(set(Telemetry.objects.filter(board=self.board).values_list("volt", flat=True)), {12.5})
+
+    def test_ranges_are_recovered_from_db(self):
+        self.write(_rows(self.board, [1, 2, 3, 5, 8, 9]))
+        seq_tracker.clear()
+        r = seq_tracker.load_ranges(self.board.pk, "s-1")
+        self.assertEqual(list(zip(r.lo, r.hi)), [(1, 3), (5, 5), (8, 9)])
+        # после перезапуска содержимое строк неизвестно — повтор сверяет БД, а не пропускается
+        self.assertEqual(self.classes(_rows(self.board, [2, 4, 10])), [seq_tracker.KNOWN, seq_tracker.OUT_OF_ORDER, seq_tracker.NEW])
+        self.assertEqual(self.write(_rows(self.board, [2, 4], volt=7.0)), (1, 1, 0))
+        self.assertEqual(Telemetry.objects.get(board=self.board, seq=2).volt, 7.0)
+
+
+def _post(objs, **headers):
+    """POST NDJSON в приём телеметрии мимо роутинга и middleware."""
+    body = "\n".join(json.dumps(o) for o in objs)
+    request = APIRequestFactory().post("/api/v1/telemetry/", body, content_type="text/plain", **headers)
+    return TelemetryFromJsonl.as_view()(request)
+
+
+class BatchReplayTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_retry_gets_the_first_response_without_db_work(self):
+        objs = [_sample(i, boat=701, sess="b-1") for i in range(3)]
+        first = _post(objs, HTTP_X_BATCH_ID="701-b-1-1")
+        self.assertEqual((first.status_code, first.data["saved"]), (200, 3))
+        with self.assertNumQueries(0):
+            again = _post(objs, HTTP_X_BATCH_ID="701-b-1-1")
+        self.assertEqual((again.status_code, again.data), (200, first.data))
+        self.assertEqual(again["X-Batch-Replay"], "1")
+        self.assertEqual(Telemetry.objects.filter(board__boat_number=701).count(), 3)
+
+    def test_replay_survives_a_cold_cache(self):
+        objs = [_sample(i, boat=702, sess="b-1") for i in range(2)]
+        first = _post(objs, HTTP_X_BATCH_ID="702-1")
+        cache.clear()
+        with mock.patch("api_v1.views.ingest_payloads") as ingest:
+            again = _post(objs, HTTP_X_BATCH_ID="702-1")
+        ingest.assert_not_called()
+        self.assertEqual(again.data, first.data)
+
+    def test_sharded_202_is_not_remembered(self):
+        with mock.patch.object(telemetry_shards, "enabled", return_value=True), \
+                mock.patch.object(telemetry_shards, "dispatch", return_value={"accepted": 1, "shards": {"0": 1}}):
+            resp = _post([_sample(0, boat=704)], HTTP_X_BATCH_ID="704-1")
+        self.assertEqual(resp.status_code, 202)
+        self.assertIsNone(telemetry_batches.lookup("704-1"))
+
+    def test_bad_batch_id_is_rejected(self):
+        self.assertEqual(_post([_sample(0, boat=703)], HTTP_X_BATCH_ID=" ").status_code, 400)
+
+
+class BoardQuotaTests(TelemetryDbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for name, value in (("BOARD_RATE", 1.0), ("BOARD_BURST", 2)):
+            patcher = mock.patch.object(telemetry_limits, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_over_quota_rows_are_deferred(self):
+        with mock.patch.object(telemetry_limits, "spool_batch") as spool:
+            resp = _post([_sample(i, boat=801, sess="q-1") for i in range(5)])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data["saved"], resp.data["deferred"], resp.data["rejected"]), (2, 3, 0))
+        spool.assert_called_once()
+
+    def test_failed_defer_is_rejected_not_dropped(self):
+        with mock.patch.object(telemetry_limits, "spool_batch", side_effect=OSError("disk full")):
+            resp = _post([_sample(i, boat=802, sess="q-1") for i in range(5)], HTTP_X_BATCH_ID="802-1")
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn("Retry-After", resp)
+        self.assertEqual((resp.data["saved"], resp.data["dropped"], resp.data["rejected"]), (2, 0, 3))
+        # 429 не запоминается по X-Batch-Id: повтор пачки пройдёт приём заново
+        self.assertIsNone(telemetry_batches.lookup("802-1"))
+
+
+class GroupCommitErrorTests(TelemetryDbTestCase):
+
+    def test_failed_group_is_unavailable(self):
+        writer = telemetry_writer.GroupCommitWriter(max_rows=10, delay=0)
+        with mock.patch.object(telemetry_writer, "ingest_rows", side_effect=OperationalError("db gone")):
+            with self.assertRaises(telemetry_writer.WriterUnavailable):
+                writer.submit([{"fresh": False, "failed": False}])
+
+    def test_writer_failure_answers_503(self):
+        for error in (telemetry_writer.WriterUnavailable("timeout"), OperationalError("db gone")):
+            with mock.patch.object(telemetry_writer, "enabled", return_value=True), \
+                    mock.patch.object(telemetry_writer, "ingest_payloads", side_effect=error):
+                resp = _post([_sample(0, boat=901)], HTTP_X_BATCH_ID="901-1")
+            self.assertEqual(resp.status_code, 503)
+        self.assertIsNone(telemetry_batches.lookup("901-1"))
+
+
+class StaleBoardIdTests(TelemetryDbTestCase):
+
+    def test_board_deleted_in_another_process(self):
+        stale = board_registry.board_ids_for([1001])[1001]
+        # удаление мимо ORM — сигнал post_delete этого процесса не срабатывает, реестр не знает
+        with connection.cursor() as c:
+            c.execute("DELETE FROM boards WHERE id = %s", [stale])
+        res = ingest_payloads([_sample(i, boat=1001, sess="d-1") for i in range(3)])
+        board = Board.objects.get(boat_number=1001)
+        self.assertNotEqual(board.pk, stale)
+        self.assertEqual((res["saved"], res["errors"]), (3, 0))
+        self.assertEqual(Telemetry.objects.filter(board=board).count(), 3)
+        self.assertEqual(FlightSession.objects.get(board=board, sess="d-1").samples, 3)
+
+
+class ShardRetryTests(SimpleTestCase):
+
+    def test_transient_error_is_retried_in_place(self):
+        sleeps = []
+        with mock.patch.object(telemetry_shards, "ingest_payloads",
+                               side_effect=[OperationalError("gone"), OperationalError("gone"), {"saved": 1}]) as ingest:
+            self.assertEqual(telemetry_shards.ingest_shard([{}], sleep=sleeps.append), {"saved": 1})
+        self.assertEqual(ingest.call_count, 3)
+        self.assertEqual(sleeps, [1.0, 2.0])
+
+    def test_permanent_error_is_not_retried(self):
+        with mock.patch.object(telemetry_shards, "ingest_payloads", side_effect=DataError("bad")) as ingest:
+            with self.assertRaises(DataError):
+                telemetry_shards.ingest_shard([{}], sleep=self.fail)
+        self.assertEqual(ingest.call_count, 1)
+
+    def test_gives_up_after_last_attempt(self):
+        with mock.patch.object(telemetry_shards, "SHARD_RETRY_ATTEMPTS", 2), \
+                mock.patch.object(telemetry_shards, "ingest_payloads", side_effect=OperationalError("gone")):
+            with self.assertRaises(OperationalError):
+                telemetry_shards.ingest_shard([{}], sleep=lambda s: None)
+
+
+class ShardArrivalTimeTests(TelemetryDbTestCase):
+
+    def test_rows_without_device_time_keep_request_time(self):
+        received = datetime(2025, 9, 1, 12, 0, tzinfo=timezone.utc)
+        with mock.patch.object(telemetry_shards, "INGEST_SHARDS", 2), mock.patch.object(telemetry_shards, "_ring", None), \
+                mock.patch.object(telemetry_shards.time, "time", return_value=received.timestamp()), \
+                mock.patch("djangoBackend.tasks.ingest_telemetry_shard.apply_async") as enqueue:
+            telemetry_shards.dispatch([{"boat": 1101, "sess": "a-1", "seq": i} for i in range(3)])
+        [(_, kw)] = enqueue.call_args_list
+        # воркер берёт пачку много позже запроса — ts всё равно время приёма
+        res = telemetry_shards.ingest_shard(*kw["args"], **kw["kwargs"])
+        self.assertEqual(res["saved"], 3)
+        self.assertEqual(set(Telemetry.objects.filter(board__boat_number=1101).values_list("ts", flat=True)), {received})
+
+
+class ListenerFlushTests(SimpleTestCase):
+
+    def flush_one(self, side_effect):
+        """Один кадр через flusher с подменённой записью -> (статистика, ответ борту)."""
+        async def run():
+            listener = TelemetryListener(flush_interval=0, flush_frames=10, queue_frames=10,
+                                         conn_frames=1, max_frame=1024, ack=True)
+            writer = mock.Mock()
+            writer.is_closing.return_value = False
+            conn = _Connection(writer, 1, ack=True)
+            await conn.slots.acquire()
+            with mock.patch.object(listener, "_write", side_effect=side_effect):
+                await listener.queue.put(_Frame(b"{}", conn))
+                task = asyncio.create_task(listener.flusher())
+                # слот освобождается, когда кадр обработан
+                await asyncio.wait_for(conn.slots.acquire(), 5)
+                task.cancel()
+            [(data,), _] = writer.write.call_args
+            return listener.stats, json.loads(data[4:])
+        return asyncio.run(run())
+
+    def test_transient_error_is_retried(self):
+        stats, ack = self.flush_one([OperationalError("gone"), {"saved": 1, "updated": 0, "errors": 0}])
+        self.assertEqual((stats["saved"], stats["dropped"], ack["ok"]), (1, 0, True))
+
+    def test_permanent_error_drops_frames(self):
+        stats, ack = self.flush_one(DataError("bad"))
+        self.assertEqual((stats["frames"], stats["dropped"], ack), (1, 1, {"ok": False}))
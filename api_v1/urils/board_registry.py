@@ -0,0 +1,83 @@
+# реестр бортов в памяти процесса: boat_number -> Board.id
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.models import Board
+
+
+BOARD_REGISTRY_SIZE = getattr(settings, "TELEMETRY_BOARD_REGISTRY_SIZE", 4096)
+
+_lock = threading.Lock()
+_ids: "OrderedDict[int, int]" = OrderedDict()
+
+
+def _remember(boat_number: int, board_id: int):
+    _ids[boat_number] = board_id
+    _ids.move_to_end(boat_number)
+    while len(_ids) > BOARD_REGISTRY_SIZE:
+        _ids.popitem(last=False)
+
+
+def board_ids_for(boat_numbers) -> dict:
+    """
+    Возвращает {boat_number: board_id}. Неизвестные борта создаются.
+    Попадание в кэш — без запросов; промахи добираются пачкой:
+    SELECT + INSERT ... ON CONFLICT DO NOTHING, так что два воркера,
+    одновременно увидевшие новый борт, не падают на unique(boat_number).
+    """
+    found, missing = {}, []
+    with _lock:
+        for n in set(boat_numbers):
+            bid = _ids.get(n)
+            if bid is None:
+                missing.append(n)
+            else:
+                _ids.move_to_end(n)
+                found[n] = bid
+    if not missing:
+        return found
+
+    rows = dict(Board.objects.filter(boat_number__in=missing).values_list("boat_number", "id"))
+    new = [n for n in missing if n not in rows]
+    if new:
+        Board.objects.bulk_create(
+            [Board(boat_number=n, status="active") for n in new],
+            ignore_conflicts=True,
+        )
+        rows.update(Board.objects.filter(boat_number__in=new).values_list("boat_number", "id"))
+
+    with _lock:
+        for n, bid in rows.items():
+            _remember(n, bid)
+    found.update(rows)
+    return found
+
+
+def clear():
+    with _lock:
+        _ids.clear()
+
+
+def _forget_id(board_id):
+    for n in [n for n, bid in _ids.items() if bid == board_id]:
+        del _ids[n]
+
+
+@receiver(post_save, sender=Board)
+def _board_saved(sender, instance, **kwargs):
+    # boat_number мог поменяться — убираем старую привязку этого id
+    with _lock:
+        if _ids.get(instance.boat_number) == instance.pk:
+            return
+        _forget_id(instance.pk)
+        _remember(instance.boat_number, instance.pk)
+
+
+@receiver(post_delete, sender=Board)
+def _board_deleted(sender, instance, **kwargs):
+    with _lock:
+        _forget_id(instance.pk)
@@ -0,0 +1,198 @@
+# сводка по сессиям (полётам): свёртка новых строк при приёме и слияние с БД в транзакции куска
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.models import Board, FlightSession
+
+
+# паузы длиннее этой не засчитываем во время во взводе (пропала связь, борт выключали)
+FLIGHT_MAX_GAP_SECONDS = getattr(settings, "TELEMETRY_FLIGHT_MAX_GAP_SECONDS", 10)
+
+_EARTH_R = 6371008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * _EARTH_R * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _arm_dt(prev_ts, ts) -> float:
+    return min((ts - prev_ts).total_seconds(), FLIGHT_MAX_GAP_SECONDS)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _seq_step(f, d, dt):
+    # d — шаг seq вперёд по цепочке, dt — секунды между этими строками
+    if d == 1:
+        f["iat_n"] += 1
+        f["iat_sum"] += dt
+        f["iat_sq_sum"] += dt * dt
+    else:
+        f["gap_runs"] += 1
+
+
+def _fold_seq(f, seq, ts):
+    last = f["last_seq"]
+    if last is None:
+        f["first_seq"], f["first_seq_ts"] = seq, ts
+    elif seq <= last:
+        f["late_samples"] += 1
+        return
+    else:
+        _seq_step(f, seq - last, (ts - f["last_seq_ts"]).total_seconds())
+    f["last_seq"], f["last_seq_ts"] = seq, ts
+
+
+def fold_sessions(rows, folds=None) -> dict:
+    """
+    Сворачивает новые строки (board_id, sess, ts, seq, lat, lon, alt_m, gs, volt, mode, arm)
+    в {(board_id, sess): свёртка}. Строки без sess пропускаются.
+    Путь, время во взводе и статистика канала (разрывы seq, интервалы между соседними seq)
+    идут по цепочке строк с неубывающим ts: внутри пачки строки сортируются, а опоздавшие
+    (ts раньше уже свёрнутых или seq не больше последнего) попадают в счётчики, экстремумы
+    и late_samples, но к траектории не пристёгиваются.
+    """
+    if folds is None:
+        folds = {}
+    for r in sorted((r for r in rows if r["sess"]), key=lambda r: r["ts"]):
+        key = (r["board_id"], r["sess"])
+        f = folds.get(key)
+        ts = r["ts"]
+        if f is None:
+            f = folds[key] = {
+                "start_ts": ts, "end_ts": ts, "chain_ts": ts,
+                "samples": 0, "seq_min": None, "seq_max": None,
+                "distance_m": 0.0, "arm_seconds": 0.0,
+                "alt_max": None, "gs_max": None, "volt_min": None, "volt_max": None,
+                "modes": Counter(),
+                "first_fix": None, "last_fix": None, "last_arm": r["arm"],
+                "first_seq": None, "first_seq_ts": None, "last_seq": None, "last_seq_ts": None,
+                "gap_runs": 0, "late_samples": 0, "iat_n": 0, "iat_sum": 0.0, "iat_sq_sum": 0.0,
+            }
+        elif ts >= f["end_ts"]:
+            if f["last_arm"]:
+                f["arm_seconds"] += _arm_dt(f["end_ts"], ts)
+            f["end_ts"], f["last_arm"] = ts, r["arm"]
+
+        if ts < f["start_ts"]:
+            f["start_ts"] = ts
+        f["samples"] += 1
+        if r["seq"] is not None:
+            f["seq_min"], f["seq_max"] = _min(f["seq_min"], r["seq"]), _max(f["seq_max"], r["seq"])
+        f["alt_max"] = _max(f["alt_max"], r["alt_m"])
+        f["gs_max"] = _max(f["gs_max"], r["gs"])
+        f["volt_min"] = _min(f["volt_min"], r["volt"])
+        f["volt_max"] = _max(f["volt_max"], r["volt"])
+        if r["mode"]:
+            f["modes"][r["mode"]] += 1
+
+        if r["seq"] is not None:
+            if ts >= f["end_ts"]:
+                _fold_seq(f, r["seq"], ts)
+            else:
+                f["late_samples"] += 1
+
+        if r["lat"] is not None and r["lon"] is not None and ts >= f["end_ts"]:
+            fix = (r["lat"], r["lon"])
+            if f["last_fix"] is not None:
+                f["distance_m"] += haversine_m(*f["last_fix"], *fix)
+            else:
+                f["first_fix"] = fix
+            f["last_fix"] = fix
+    return folds
+
+
+def _merge(s: FlightSession, f: dict):
+    """Сливает свёртку в строку сессии; возвращает (прирост пути, прирост времени во взводе)."""
+    distance, arm = f["distance_m"], f["arm_seconds"]
+    if s.samples and f["chain_ts"] >= s.end_ts:
+        # свёртка продолжает то, что уже лежит в БД
+        if s.last_lat is not None and f["first_fix"] is not None:
+            distance += haversine_m(s.last_lat, s.last_lon, *f["first_fix"])
+        if s.last_arm:
+            arm += _arm_dt(s.end_ts, f["chain_ts"])
+
+    # цепочка seq продолжается по номеру, а не по ts
+    if s.last_seq is not None and f["first_seq"] is not None:
+        if f["first_seq"] > s.last_seq:
+            _seq_step(f, f["first_seq"] - s.last_seq, (f["first_seq_ts"] - s.end_ts).total_seconds())
+        else:
+            f["late_samples"] += 1
+
+    if not s.samples or f["end_ts"] >= s.end_ts:
+        s.end_ts, s.last_arm = f["end_ts"], f["last_arm"]
+        if f["last_fix"] is not None:
+            s.last_lat, s.last_lon = f["last_fix"]
+    if f["last_seq"] is not None:
+        s.last_seq = _max(s.last_seq, f["last_seq"])
+    s.start_ts = f["start_ts"] if not s.samples else min(s.start_ts, f["start_ts"])
+    s.samples += f["samples"]
+    s.seq_min, s.seq_max = _min(s.seq_min, f["seq_min"]), _max(s.seq_max, f["seq_max"])
+    s.alt_max, s.gs_max = _max(s.alt_max, f["alt_max"]), _max(s.gs_max, f["gs_max"])
+    s.volt_min, s.volt_max = _min(s.volt_min, f["volt_min"]), _max(s.volt_max, f["volt_max"])
+    s.modes = dict(Counter(s.modes) + f["modes"])
+    s.distance_m += distance
+    s.arm_seconds += arm
+    s.gap_runs += f["gap_runs"]
+    s.late_samples += f["late_samples"]
+    s.iat_n += f["iat_n"]
+    s.iat_sum += f["iat_sum"]
+    s.iat_sq_sum += f["iat_sq_sum"]
+    return distance, arm
+
+
+_MERGED_FIELDS = [
+    "start_ts", "end_ts", "samples", "seq_min", "seq_max", "distance_m", "arm_seconds",
+    "alt_max", "gs_max", "volt_min", "volt_max", "modes", "last_lat", "last_lon", "last_arm", "updated_at",
+    "gap_runs", "late_samples", "iat_n", "iat_sum", "iat_sq_sum", "last_seq",
+]
+
+
+def apply_sessions(folds: dict) -> int:
+    """
+    Слияние свёрток с FlightSession в одной транзакции: недостающие строки создаются
+    пустыми (ON CONFLICT DO NOTHING), затем все нужные строки берутся FOR UPDATE —
+    параллельные загрузки одной сессии сливаются по очереди, а не затирают друг друга.
+    Прирост пути и времени во взводе добавляется к счётчикам борта (F()).
+    """
+    if not folds:
+        return 0
+    with transaction.atomic():
+        FlightSession.objects.bulk_create(
+            [FlightSession(board_id=b, sess=sess, start_ts=f["start_ts"], end_ts=f["end_ts"])
+             for (b, sess), f in sorted(folds.items())],
+            ignore_conflicts=True,
+        )
+        cond = Q()
+        for b, sess in folds:
+            cond |= Q(board_id=b, sess=sess)
+        sessions = list(FlightSession.objects.select_for_update().filter(cond).order_by("id"))
+
+        per_board, now = {}, timezone.now()
+        for s in sessions:
+            distance, arm = _merge(s, folds[(s.board_id, s.sess)])
+            s.updated_at = now
+            d, a = per_board.get(s.board_id, (0.0, 0.0))
+            per_board[s.board_id] = (d + distance, a + arm)
+        FlightSession.objects.bulk_update(sessions, _MERGED_FIELDS)
+
+        for board_id, (distance, arm) in sorted(per_board.items()):
+            if distance or arm:
+                Board.objects.filter(pk=board_id).update(
+                    distance_m=F("distance_m") + distance, flight_seconds=F("flight_seconds") + arm,
+                )
+    return len(sessions)
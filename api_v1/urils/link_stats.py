@@ -0,0 +1,121 @@
+# качество канала по сессиям: потерянные seq, разрывы, интервалы и их разброс (jitter)
+#
+# exact — один проход оконных функций по строкам борта (LAG по seq внутри сессии),
+# live — готовые счётчики FlightSession, которые ведёт приём (urils/flight_sessions.py).
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import connection
+
+from app.models import FlightSession, Telemetry
+
+
+# без ?sess= и ?from= считаем за столько последних часов — не по всей истории борта
+LINK_STATS_DEFAULT_HOURS = getattr(settings, "TELEMETRY_LINK_STATS_DEFAULT_HOURS", 24)
+
+
+def _epoch_sql(col: str) -> str:
+    if connection.vendor == "postgresql":
+        return f"EXTRACT(EPOCH FROM {col})"
+    # sqlite хранит datetime строкой: целые секунды + доли из %f (SS.SSS)
+    return f"(CAST(strftime('%%s', {col}) AS REAL) + strftime('%%f', {col}) - strftime('%%S', {col}))"
+
+
+def _stats(sess, first_ts, last_ts, samples, distinct, seq_min, seq_max, gap_runs, max_gap,
+           iat_n, iat_sum, iat_sq_sum, **extra) -> dict:
+    expected = seq_max - seq_min + 1 if seq_min is not None else 0
+    missing = max(0, expected - distinct)
+    mean = iat_sum / iat_n if iat_n else None
+    jitter = math.sqrt(max(0.0, iat_sq_sum / iat_n - mean * mean)) if iat_n else None
+    return dict({
+        "sess": sess, "first_ts": first_ts, "last_ts": last_ts,
+        "samples": samples, "seq_min": seq_min, "seq_max": seq_max,
+        "expected": expected, "missing": missing,
+        "loss_pct": round(100.0 * missing / expected, 3) if expected else None,
+        "gap_runs": gap_runs, "max_gap": max_gap,
+        "iat_mean": mean, "jitter": jitter,
+    }, **extra)
+
+
+def exact_stats(board_id, sess=None, start=None, end=None) -> list:
+    """
+    По сессиям борта: одна выборка по индексу, LAG(seq) и LAG(ts) в окне PARTITION BY sess
+    ORDER BY seq. Разрыв — шаг seq больше 1; интервалы берутся только между соседними seq.
+    Повтор seq с другим ts (шаг 0) не считается ни разрывом, ни интервалом.
+    """
+    if sess is None and start is None:
+        start = (end or datetime.now(timezone.utc)) - timedelta(hours=LINK_STATS_DEFAULT_HOURS)
+    table = connection.ops.quote_name(Telemetry._meta.db_table)
+    epoch = _epoch_sql("ts")
+
+    where, params = ["board_id = %s", "sess IS NOT NULL", "seq IS NOT NULL"], [board_id]
+    if sess is not None:
+        where.append("sess = %s")
+        params.append(sess)
+    if start is not None:
+        where.append("ts >= %s")
+        params.append(connection.ops.adapt_datetimefield_value(start))
+    if end is not None:
+        where.append("ts < %s")
+        params.append(connection.ops.adapt_datetimefield_value(end))
+
+    sql = f"""
+        SELECT sess, MIN(ts), MAX(ts), COUNT(*), COUNT(DISTINCT seq), MIN(seq), MAX(seq),
+               SUM(CASE WHEN d > 1 THEN 1 ELSE 0 END),
+               MAX(CASE WHEN d > 1 THEN d - 1 ELSE 0 END),
+               SUM(CASE WHEN d = 1 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN d = 1 THEN dt ELSE 0 END),
+               SUM(CASE WHEN d = 1 THEN dt * dt ELSE 0 END)
+        FROM (
+            SELECT sess, seq, ts,
+                   seq - LAG(seq) OVER w AS d,
+                   {epoch} - LAG({epoch}) OVER w AS dt
+            FROM {table}
+            WHERE {" AND ".join(where)}
+            WINDOW w AS (PARTITION BY sess ORDER BY seq, ts)
+        ) t
+        GROUP BY sess
+        ORDER BY MIN(ts)
+    """
+    # MIN(ts)/MAX(ts) в том виде, что вернул драйвер (sqlite — строка) -> aware datetime
+    col = Telemetry._meta.get_field("ts").get_col(Telemetry._meta.db_table)
+    converters = connection.ops.get_db_converters(col)
+    with connection.cursor() as c:
+        c.execute(sql, params)
+        rows = c.fetchall()
+
+    out = []
+    for (sess_, first_ts, last_ts, samples, distinct, seq_min, seq_max,
+         gap_runs, max_gap, iat_n, iat_sum, iat_sq_sum) in rows:
+        for conv in converters:
+            first_ts, last_ts = conv(first_ts, col, connection), conv(last_ts, col, connection)
+        out.append(_stats(
+            sess_, first_ts, last_ts, samples, distinct, seq_min, seq_max,
+            int(gap_runs or 0), int(max_gap or 0), int(iat_n or 0), float(iat_sum or 0), float(iat_sq_sum or 0),
+        ))
+    return out
+
+
+def live_stats(board_id, sess=None, start=None, end=None) -> list:
+    """
+    То же по счётчикам FlightSession, без чтения телеметрии. Считается в порядке прихода,
+    поэтому разрыв, позже закрытый опоздавшими строками, остаётся в gap_runs (а строки — в late),
+    max_gap неизвестен. missing = ожидаемое по диапазону seq минус принятые строки.
+    """
+    qs = FlightSession.objects.filter(board_id=board_id)
+    if sess is not None:
+        qs = qs.filter(sess=sess)
+    if start is not None:
+        qs = qs.filter(end_ts__gte=start)
+    if end is not None:
+        qs = qs.filter(start_ts__lt=end)
+    if sess is None and start is None:
+        qs = qs.filter(end_ts__gte=(end or datetime.now(timezone.utc)) - timedelta(hours=LINK_STATS_DEFAULT_HOURS))
+    return [
+        _stats(
+            s.sess, s.start_ts, s.end_ts, s.samples, s.samples, s.seq_min, s.seq_max,
+            s.gap_runs, None, s.iat_n, s.iat_sum, s.iat_sq_sum, late=s.late_samples,
+        )
+        for s in qs.order_by("start_ts")
+    ]
@@ -0,0 +1,193 @@
+# pub/sub свежей телеметрии для потоковых подписчиков (SSE / WebSocket)
+#
+# Приём (синхронный, в любом потоке) публикует образцы; подписчики живут в event loop'е
+# ASGI-сервера, у каждого своя ограниченная очередь — при переполнении выбрасываются
+# самые старые кадры. Разность «что изменилось» считается в момент отправки против того,
+# что клиент действительно получил, поэтому выброшенные кадры её не ломают.
+#
+# LocalBus работает в пределах процесса. Если приём и подписчики в разных процессах
+# (gunicorn-воркеры, listener, дренаж спула) — TELEMETRY_STREAM_BUS = "...RedisBus".
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+STREAM_FIELDS = ("sess", "seq", "lat", "lon", "alt_m", "hdg", "gs", "volt", "mode", "gps", "arm", "wind_spd", "wind_dir")
+
+# кадров в очереди одного подписчика
+STREAM_QUEUE_FRAMES = getattr(settings, "TELEMETRY_STREAM_QUEUE_FRAMES", 256)
+# старые строки (выгрузка логов за прошлые дни) в поток не идут
+STREAM_MAX_AGE_SECONDS = getattr(settings, "TELEMETRY_STREAM_MAX_AGE_SECONDS", 300)
+# не больше стольких последних строк на борт из одной пачки
+STREAM_MAX_PER_BOARD = getattr(settings, "TELEMETRY_STREAM_MAX_PER_BOARD", 50)
+
+
+def samples_from_rows(rows) -> list:
+    """Нормализованные строки пачки -> образцы для публикации (ts в секундах эпохи)."""
+    cutoff = time.time() - STREAM_MAX_AGE_SECONDS
+    per_board = {}
+    for r in rows:
+        ts = r["ts"].timestamp()
+        if ts < cutoff:
+            continue
+        sample = {"boat": r["boat"], "ts": ts}
+        for f in STREAM_FIELDS:
+            sample[f] = r[f]
+        per_board.setdefault(r["boat"], []).append(sample)
+    out = []
+    for samples in per_board.values():
+        samples.sort(key=lambda s: s["ts"])
+        out.extend(samples[-STREAM_MAX_PER_BOARD:])
+    return out
+
+
+class Subscriber:
+    """Один клиент: фильтр по бортам, очередь в своём event loop'е и последнее отправленное по бортам."""
+
+    def __init__(self, boats=None, maxsize: int = STREAM_QUEUE_FRAMES):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.boats = set(boats) if boats else None    # None — все борта
+        self.dropped = 0
+        self._sent = {}
+
+    def wants(self, boat) -> bool:
+        boats = self.boats
+        return boats is None or boat in boats
+
+    def _offer(self, samples):
+        # выполняется в потоке event loop'а
+        for s in samples:
+            if self.queue.full():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(s)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def delta(self, sample: dict):
+        """
+        Поля, изменившиеся с прошлой отправки по этому борту (boat и ts — всегда).
+        Первый кадр по борту — полный. None, если не изменилось ничего, кроме ts.
+        """
+        boat = sample["boat"]
+        last = self._sent.get(boat)
+        if last is None:
+            msg = {k: v for k, v in sample.items() if v is not None or k in ("boat", "ts")}
+        else:
+            msg = {k: v for k, v in sample.items() if k not in ("boat", "ts") and last.get(k) != v}
+            if not msg:
+                self._sent[boat] = sample
+                return None
+            msg["boat"], msg["ts"] = boat, sample["ts"]
+        self._sent[boat] = sample
+        if self.dropped:
+            msg["dropped"], self.dropped = self.dropped, 0
+        return msg
+
+
+class LocalBus:
+    """Шина в пределах процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = []
+
+    def subscribe(self, boats=None, maxsize: int = STREAM_QUEUE_FRAMES) -> Subscriber:
+        sub = Subscriber(boats, maxsize)
+        with self._lock:
+            self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subs)
+
+    def publish(self, samples: list):
+        self._dispatch(samples)
+
+    def _dispatch(self, samples: list):
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            mine = [s for s in samples if sub.wants(s["boat"])]
+            if not mine:
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, mine)
+            except RuntimeError:
+                # event loop подписчика уже закрыт
+                self.unsubscribe(sub)
+
+
+class RedisBus(LocalBus):
+    """
+    Шина между узлами через Redis pub/sub: publish уходит в канал, а поток-слушатель
+    каждого процесса раздаёт сообщения своим подписчикам. Нужен пакет redis.
+    """
+
+    channel = "telemetry:stream"
+
+    def __init__(self):
+        super().__init__()
+        import redis
+        self._redis = redis.Redis.from_url(getattr(settings, "TELEMETRY_STREAM_REDIS_URL", None) or settings.CACHE_REDIS_URL)
+        self._listener = None
+
+    def has_subscribers(self) -> bool:
+        return True    # подписчики могут быть на других узлах
+
+    def publish(self, samples: list):
+        self._redis.publish(self.channel, json.dumps(samples))
+
+    def subscribe(self, boats=None, maxsize: int = STREAM_QUEUE_FRAMES) -> Subscriber:
+        sub = super().subscribe(boats, maxsize)
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="telemetry-stream-bus", daemon=True)
+                self._listener.start()
+        return sub
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self._dispatch(json.loads(message["data"]))
+            except Exception as e:
+                print(f"[stream] redis listener error, reconnecting: {e}")
+                time.sleep(1)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus() -> LocalBus:
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                path = getattr(settings, "TELEMETRY_STREAM_BUS", "api_v1.urils.live_bus.LocalBus")
+                _bus = import_string(path)()
+    return _bus
+
+
+def publish_rows(rows):
+    """Вызывается приёмом после записи пачки."""
+    bus = get_bus()
+    if not bus.has_subscribers():
+        return
+    samples = samples_from_rows(rows)
+    if samples:
+        bus.publish(samples)
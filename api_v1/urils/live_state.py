@@ -0,0 +1,114 @@
+# последнее состояние бортов для карты операторов: пишет приём, читает /fleet/live/ без запросов к БД
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+LIVE_FIELDS = ("lat", "lon", "alt_m", "hdg", "gs", "volt", "mode", "gps", "arm")
+
+# борт «в сети», если приём видел его не раньше стольких секунд назад (как у check_offline_boards)
+LIVE_ONLINE_SECONDS = getattr(settings, "TELEMETRY_LIVE_ONLINE_SECONDS", 180)
+# сколько процесс отдаёт один и тот же снимок, прежде чем перечитать кэш
+LIVE_SNAPSHOT_SECONDS = getattr(settings, "TELEMETRY_LIVE_SNAPSHOT_SECONDS", 1.0)
+# запись борта, о котором давно ничего не слышно, из кэша уходит сама
+LIVE_ENTRY_TTL = getattr(settings, "TELEMETRY_LIVE_ENTRY_TTL", 24 * 3600)
+
+_INDEX = "telemetry:live:boards"      # {board_id: boat}
+
+
+def _key(board_id) -> str:
+    return f"telemetry:live:{board_id}"
+
+
+def fold_live(rows, live=None) -> dict:
+    """
+    {board_id: последнее состояние} по строкам пачки: ts самой свежей строки и для
+    каждого поля — последнее непустое значение (позиция не пропадает из-за строки без GPS).
+    """
+    if live is None:
+        live = {}
+    for r in rows:
+        ts = r["ts"].timestamp()
+        e = live.get(r["board_id"])
+        if e is None:
+            e = live[r["board_id"]] = {"boat": r["boat"], "ts": ts}
+        elif ts < e["ts"]:
+            continue
+        e["ts"] = ts
+        for f in LIVE_FIELDS:
+            if r[f] is not None:
+                e[f] = r[f]
+    return live
+
+
+def apply_live(live: dict):
+    """Сливает свёртку с кэшем: один get_many и один set_many на загрузку."""
+    if not live:
+        return
+    now = time.time()
+    keys = {board_id: _key(board_id) for board_id in live}
+    current = cache.get_many(list(keys.values()))
+
+    out = {}
+    for board_id, e in live.items():
+        old = current.get(keys[board_id]) or {}
+        if old.get("ts", 0) > e["ts"]:
+            # пришли старые данные — состояние не трогаем, но борт на связи
+            merged = dict(old)
+        else:
+            merged = dict(old, **e)
+        merged["seen"] = now
+        out[keys[board_id]] = merged
+    cache.set_many(out, timeout=LIVE_ENTRY_TTL)
+
+    index = cache.get(_INDEX) or {}
+    if any(board_id not in index for board_id in live):
+        # гонка двух процессов может потерять новый борт — следующая пачка его вернёт
+        index.update({board_id: e["boat"] for board_id, e in live.items()})
+        cache.set(_INDEX, index, timeout=None)
+
+
+def snapshot(online_seconds: int = LIVE_ONLINE_SECONDS) -> dict:
+    """Колонки по бортам в сети, по возрастанию номера борта."""
+    index = cache.get(_INDEX) or {}
+    entries = cache.get_many([_key(board_id) for board_id in index])
+    now = time.time()
+    online = sorted(
+        (e for e in entries.values() if now - e.get("seen", 0) <= online_seconds),
+        key=lambda e: e["boat"],
+    )
+    return {
+        "now": now,
+        "boat": [e["boat"] for e in online],
+        "ts": [e["ts"] for e in online],
+        "lat": [e.get("lat") for e in online],
+        "lon": [e.get("lon") for e in online],
+        "alt": [e.get("alt_m") for e in online],
+        "hdg": [e.get("hdg") for e in online],
+        "gs": [e.get("gs") for e in online],
+        "volt": [e.get("volt") for e in online],
+        "mode": [e.get("mode") for e in online],
+        "arm": [bool(e.get("arm")) for e in online],
+    }
+
+
+_memo = {"until": 0.0, "body": b""}
+_memo_lock = threading.Lock()
+
+
+def snapshot_json() -> bytes:
+    """
+    Готовое тело ответа. Процесс пересобирает его не чаще раза в LIVE_SNAPSHOT_SECONDS,
+    так что сколько бы экранов ни опрашивали, к кэшу идёт один запрос в секунду.
+    """
+    now = time.monotonic()
+    if now < _memo["until"]:
+        return _memo["body"]
+    with _memo_lock:
+        if now >= _memo["until"]:
+            _memo["body"] = json.dumps(snapshot()).encode()
+            _memo["until"] = time.monotonic() + LIVE_SNAPSHOT_SECONDS
+        return _memo["body"]
@@ -0,0 +1,126 @@
+# потоковая выдача свежей телеметрии по ASGI: SSE (через view) и WebSocket (сырое ASGI-приложение)
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .live_bus import get_bus
+
+
+# пустой комментарий SSE / ping WS, чтобы прокси не рвали тихое соединение
+STREAM_KEEPALIVE_SECONDS = getattr(settings, "TELEMETRY_STREAM_KEEPALIVE_SECONDS", 15)
+
+WS_PATH = "/api/v1/ws/telemetry/"
+
+
+def token_ok(raw) -> bool:
+    """Проверка access-токена без запроса пользователя из БД."""
+    if not raw:
+        return False
+    try:
+        AccessToken(raw)
+    except TokenError:
+        return False
+    return True
+
+
+def bearer(header: str):
+    if header and header.lower().startswith("bearer "):
+        return header[7:].strip()
+    return None
+
+
+def parse_boats(value):
+    """'1,2,5' -> {1, 2, 5}; пусто — все борта. ValueError на мусор."""
+    if not value:
+        return None
+    return {int(b) for b in value.split(",") if b.strip()}
+
+
+def _json(msg) -> str:
+    return json.dumps(msg, separators=(",", ":"))
+
+
+# SSE
+
+async def sse_events(boats):
+    """Тело ответа text/event-stream; подписка снимается, когда клиент отключился."""
+    bus = get_bus()
+    sub = bus.subscribe(boats)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                sample = await asyncio.wait_for(sub.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            msg = sub.delta(sample)
+            if msg is not None:
+                yield f"event: sample\ndata: {_json(msg)}\n\n".encode()
+    finally:
+        bus.unsubscribe(sub)
+
+
+# WebSocket
+#
+# клиент -> сервер: {"subscribe": [1, 2]} | {"unsubscribe": [2]} | {"subscribe": []} (все борта)
+# сервер -> клиент: {"type": "sample", ...изменившиеся поля...} | {"type": "subscribed", "boats": [...] | null}
+
+async def websocket_app(scope, receive, send):
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+    query = parse_qs(scope.get("query_string", b"").decode())
+    headers = {k.decode().lower(): v.decode() for k, v in scope.get("headers", [])}
+    token = bearer(headers.get("authorization", "")) or (query.get("token") or [None])[0]
+    if scope.get("path") != WS_PATH or not token_ok(token):
+        await send({"type": "websocket.close", "code": 4401 if scope.get("path") == WS_PATH else 4404})
+        return
+    try:
+        boats = parse_boats((query.get("boats") or [""])[0])
+    except ValueError:
+        await send({"type": "websocket.close", "code": 4400})
+        return
+
+    await send({"type": "websocket.accept"})
+    bus = get_bus()
+    sub = bus.subscribe(boats)
+
+    async def writer():
+        while True:
+            try:
+                sample = await asyncio.wait_for(sub.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await send({"type": "websocket.send", "text": _json({"type": "ping"})})
+                continue
+            msg = sub.delta(sample)
+            if msg is not None:
+                await send({"type": "websocket.send", "text": _json(dict(msg, type="sample"))})
+
+    task = asyncio.create_task(writer())
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            if event["type"] != "websocket.receive":
+                continue
+            try:
+                cmd = json.loads(event.get("text") or event.get("bytes") or b"")
+                if "subscribe" in cmd:
+                    add = {int(b) for b in cmd["subscribe"]}
+                    sub.boats = None if not add else (sub.boats or set()) | add
+                if "unsubscribe" in cmd and sub.boats is not None:
+                    sub.boats = sub.boats - {int(b) for b in cmd["unsubscribe"]}
+            except (ValueError, TypeError, AttributeError):
+                await send({"type": "websocket.send", "text": _json({"type": "error", "error": "bad command"})})
+                continue
+            boats_out = sorted(sub.boats) if sub.boats is not None else None
+            await send({"type": "websocket.send", "text": _json({"type": "subscribed", "boats": boats_out})})
+    finally:
+        task.cancel()
+        bus.unsubscribe(sub)
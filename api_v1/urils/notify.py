@@ -1,38 +1,131 @@
 import os, json, requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 
 TELEGRAM_BOT_TOKEN = os.getenv("BOT_TOKEN") or getattr(settings, "TELEGRAM_BOT_TOKEN", None)
 TELEGRAM_CHAT_ID   = os.getenv("TG_CHAT_ID")   or getattr(settings, "TELEGRAM_CHAT_ID", None)
 TELEGRAM_THREAD_ID = os.getenv("TG_THREAD_ID") or getattr(settings, "TELEGRAM_THREAD_ID", None)
 
-def tg_send(text: str, parse_mode: str = "HTML", thread_id: int | None = None):
+# (соединение, чтение) — отправляет воркер, так что можно не спешить, но и не висеть
+TELEGRAM_TIMEOUT = (3.05, 10)
+
+# одно keep-alive соединение с api.telegram.org на процесс вместо нового TLS на каждое сообщение
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+
+def _thread_id(thread_id):
+    tid = thread_id or TELEGRAM_THREAD_ID
+    try:
+        return int(tid) if tid else None
+    except Exception:
+        return None
+
+
+def post_message(chat_id, text: str, parse_mode: str = "HTML", thread_id: int | None = None):
+    """
+    Один sendMessage. Возвращает (ok, retry_after, error, permanent):
+    retry_after — секунды из ответа 429, permanent — повтор не поможет (400/403: плохой текст, бот удалён из чата).
+    """
     if not TELEGRAM_BOT_TOKEN:
-        print("[tg_send] ERROR: TELEGRAM_BOT_TOKEN is empty")
-        return False
-    if not TELEGRAM_CHAT_ID:
-        print("[tg_send] ERROR: TELEGRAM_CHAT_ID is empty")
-        return False
+        return False, None, "TELEGRAM_BOT_TOKEN is empty", False
 
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     data = {
-        "chat_id": int(TELEGRAM_CHAT_ID),
+        "chat_id": int(chat_id),
         "text": text,
         "parse_mode": parse_mode,
         "disable_web_page_preview": True,
     }
-    tid = thread_id or TELEGRAM_THREAD_ID
-    if tid:
-        try:
-            data["message_thread_id"] = int(tid)
-        except Exception:
-            pass
+    if thread_id:
+        data["message_thread_id"] = thread_id
 
     try:
-        r = requests.post(url, data=data, timeout=15)
-        ok = (r.status_code == 200 and r.json().get("ok"))
-        if not ok:
-            print(f"[tg_send] FAIL {r.status_code} {r.text}")
-        return ok
+        r = _session.post(url, data=data, timeout=TELEGRAM_TIMEOUT)
     except Exception as e:
-        print(f"[tg_send] EXC {e}")
-        return False
\ No newline at end of file
+        return False, None, f"EXC {e}", False
+    try:
+        body = r.json()
+    except ValueError:
+        body = {}
+    if r.status_code == 200 and body.get("ok"):
+        return True, None, None, False
+    error = f"{r.status_code} {r.text[:500]}"
+    if r.status_code == 429:
+        return False, (body.get("parameters") or {}).get("retry_after", 5), error, False
+    return False, None, error, r.status_code in (400, 403)
+
+
+def tg_send(text: str, parse_mode: str = "HTML", thread_id: int | None = None):
+    """Синхронная отправка — для ручных вызовов. Приём и задачи пишут в очередь (notify)."""
+    if not TELEGRAM_BOT_TOKEN:
+        print("[tg_send] ERROR: TELEGRAM_BOT_TOKEN is empty")
+        return False
+    if not TELEGRAM_CHAT_ID:
+        print("[tg_send] ERROR: TELEGRAM_CHAT_ID is empty")
+        return False
+
+    ok, _, error, _ = post_message(TELEGRAM_CHAT_ID, text, parse_mode, _thread_id(thread_id))
+    if not ok:
+        print(f"[tg_send] FAIL {error}")
+    return ok
+
+
+TG_MAX_TEXT = 4096
+
+def split_message(header: str, lines, limit: int = TG_MAX_TEXT) -> list:
+    """Режет список строк на сообщения не длиннее limit, заголовок — в каждом."""
+    out, cur = [], header
+    for line in lines:
+        if len(cur) + 1 + len(line) > limit and cur != header:
+            out.append(cur)
+            cur = header
+        cur += "\n" + line
+    out.append(cur)
+    return out
+
+
+# очередь исходящих: вызывающий делает только INSERT, отправляет воркер (urils/notify_outbox.py)
+
+def notify(texts, parse_mode: str = "HTML", thread_id: int | None = None) -> int:
+    """Ставит сообщение (или список сообщений) в NotificationOutbox одним INSERT. Возвращает число строк."""
+    from app.models import NotificationOutbox
+
+    if isinstance(texts, str):
+        texts = [texts]
+    if not texts:
+        return 0
+    if not TELEGRAM_CHAT_ID:
+        print("[notify] ERROR: TELEGRAM_CHAT_ID is empty")
+        return 0
+    tid = _thread_id(thread_id)
+    NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(chat_id=str(TELEGRAM_CHAT_ID), thread_id=tid, text=t, parse_mode=parse_mode)
+        for t in texts
+    ])
+    return len(texts)
+
+
+def notify_lines(header: str, lines, parse_mode: str = "HTML", thread_id: int | None = None) -> int:
+    return notify(split_message(header, lines), parse_mode=parse_mode, thread_id=thread_id)
+
+
+def notify_transitions(kind: str, boards, thread_id: int | None = None) -> int:
+    """
+    Переходы бортов (kind: "online" / "offline") — не отдельными сообщениями, а в сводку:
+    воркер копит их окно NOTIFY_DIGEST_SECONDS и шлёт одно сообщение на чат.
+    boards — [(номер борта, текст на случай, если борт в сводке один)].
+    """
+    from app.models import NotificationOutbox
+
+    if not boards:
+        return 0
+    if not TELEGRAM_CHAT_ID:
+        print("[notify] ERROR: TELEGRAM_CHAT_ID is empty")
+        return 0
+    tid = _thread_id(thread_id)
+    NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(chat_id=str(TELEGRAM_CHAT_ID), thread_id=tid, text=text, kind=kind, boat=boat)
+        for boat, text in boards
+    ])
+    return len(boards)
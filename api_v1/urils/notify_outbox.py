@@ -0,0 +1,258 @@
+# воркер очереди уведомлений: NotificationOutbox -> Telegram
+#
+# Отправитель один (advisory lock на Postgres); лимиты Telegram держатся корзинами
+# токенов в общем кэше (на чат и общая на бота), так что переживают перезапуск воркера.
+# Ошибки сети и 5xx повторяются с экспоненциальной паузой, 429 — через retry_after
+# из ответа, 400/403 — сразу failed.
+#
+# Переходы бортов (kind online/offline) отдельно не шлются: за окно NOTIFY_DIGEST_SECONDS
+# они сводятся в одно сообщение на чат/тему, а «мигание» борта гасится.
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from app.models import NotificationOutbox
+
+from .notify import post_message, split_message
+
+
+# Telegram: в группу не больше ~20 сообщений в минуту, всего не больше ~30 в секунду
+TELEGRAM_CHAT_PER_MINUTE = getattr(settings, "TELEGRAM_CHAT_PER_MINUTE", 20)
+TELEGRAM_CHAT_BURST = getattr(settings, "TELEGRAM_CHAT_BURST", 3)
+TELEGRAM_GLOBAL_PER_SECOND = getattr(settings, "TELEGRAM_GLOBAL_PER_SECOND", 25)
+
+NOTIFY_MAX_ATTEMPTS = getattr(settings, "NOTIFY_MAX_ATTEMPTS", 8)
+NOTIFY_RETRY_BASE_SECONDS = getattr(settings, "NOTIFY_RETRY_BASE_SECONDS", 5)
+NOTIFY_RETRY_MAX_SECONDS = getattr(settings, "NOTIFY_RETRY_MAX_SECONDS", 600)
+# отправленные строки старше этого удаляются
+NOTIFY_KEEP_DAYS = getattr(settings, "NOTIFY_KEEP_DAYS", 7)
+
+# переходы бортов копятся столько секунд с первого и уходят одной сводкой
+NOTIFY_DIGEST_SECONDS = getattr(settings, "NOTIFY_DIGEST_SECONDS", 10)
+# о борте, попавшем в сводку, следующие столько секунд не сообщаем: переходы копятся
+# и по истечении дают итог (офлайн -> онлайн -> офлайн не даст ничего); 0 — выключено
+NOTIFY_BOARD_COOLDOWN_SECONDS = getattr(settings, "NOTIFY_BOARD_COOLDOWN_SECONDS", 0)
+
+# ключ pg_try_advisory_lock для deliver()
+OUTBOX_LOCK = 0x0B0C5
+
+
+class TokenBucket:
+    """
+    rate токенов в секунду, не больше burst в запасе. Состояние (токены, отметка времени,
+    пауза до) лежит в общем кэше под key, а не в памяти процесса: перезапуск воркера или
+    второй процесс с тем же ботом не получают полное ведро заново.
+    """
+
+    def __init__(self, key: str, rate: float, burst: float):
+        self.key, self.rate, self.burst = key, rate, burst
+
+    def _load(self, now):
+        tokens, stamp, paused_until = cache.get(self.key) or (self.burst, now, 0.0)
+        return min(self.burst, tokens + max(0.0, now - stamp) * self.rate), paused_until
+
+    def _save(self, tokens, now, paused_until):
+        # полное ведро хранить незачем: по истечении ключа оно и так полное
+        ttl = max(0.0, paused_until - now) + self.burst / self.rate + 60
+        cache.set(self.key, (tokens, now, paused_until), timeout=int(ttl))
+
+    def wait_time(self) -> float:
+        """Сколько ждать до следующего токена (0 — можно сейчас)."""
+        now = time.time()
+        tokens, paused_until = self._load(now)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+        return max(wait, paused_until - now)
+
+    def take(self):
+        now = time.time()
+        tokens, paused_until = self._load(now)
+        self._save(tokens - 1, now, paused_until)
+
+    def pause(self, seconds: float):
+        # 429 от Telegram: до retry_after в этот чат не пишем
+        now = time.time()
+        self._save(0, now, now + seconds)
+
+
+_global = TokenBucket("notify:bucket:global", TELEGRAM_GLOBAL_PER_SECOND, TELEGRAM_GLOBAL_PER_SECOND)
+
+
+def _bucket(chat_id) -> TokenBucket:
+    return TokenBucket(f"notify:bucket:{chat_id}", TELEGRAM_CHAT_PER_MINUTE / 60.0, TELEGRAM_CHAT_BURST)
+
+
+def backoff_seconds(attempts: int) -> float:
+    return min(NOTIFY_RETRY_BASE_SECONDS * 2 ** (attempts - 1), NOTIFY_RETRY_MAX_SECONDS)
+
+
+def _deliver_one(m: NotificationOutbox, bucket: TokenBucket) -> bool:
+    bucket.take()
+    _global.take()
+    ok, retry_after, error, permanent = post_message(m.chat_id, m.text, m.parse_mode, m.thread_id)
+    now = timezone.now()
+    m.attempts += 1
+    if ok:
+        m.status, m.sent_at, m.last_error = NotificationOutbox.SENT, now, None
+    else:
+        m.last_error = error
+        print(f"[notify] message #{m.pk} attempt {m.attempts} failed: {error}")
+        if retry_after:
+            bucket.pause(retry_after)
+            m.next_attempt_at = now + timedelta(seconds=retry_after)
+        elif permanent or m.attempts >= NOTIFY_MAX_ATTEMPTS:
+            m.status = NotificationOutbox.FAILED
+        else:
+            m.next_attempt_at = now + timedelta(seconds=backoff_seconds(m.attempts))
+    m.save(update_fields=["status", "attempts", "next_attempt_at", "last_error", "sent_at"])
+    return ok
+
+
+# сводки переходов бортов
+
+_ONLINE, _OFFLINE = NotificationOutbox.ONLINE, NotificationOutbox.OFFLINE
+_OPPOSITE = {_ONLINE: _OFFLINE, _OFFLINE: _ONLINE}
+_DIGEST_HEADER = {_ONLINE: "🟢 <b>Онлайн бортов: {n}</b>", _OFFLINE: "🔴 <b>Офлайн бортов: {n}</b>"}
+
+
+def _cooldown_key(chat_id, boat) -> str:
+    return f"notify:cooldown:{chat_id}:{boat}"
+
+
+def digest_texts(kind: str, items: list) -> list:
+    """Один борт — его собственный текст, несколько — «🟢 Онлайн бортов: 12» и список номеров."""
+    if len(items) == 1:
+        return [items[0].text]
+    boats = sorted(m.boat for m in items)
+    # номера через запятую, в лимит Telegram — по строкам из 20 номеров
+    lines = [", ".join(f"#{b}" for b in boats[i:i + 20]) for i in range(0, len(boats), 20)]
+    return split_message(_DIGEST_HEADER[kind].format(n=len(boats)), lines)
+
+
+def coalesce(window: float = None, cooldown: float = None) -> int:
+    """
+    Сводит накопившиеся переходы бортов в сообщения. Группа (чат, тема) ждёт, пока
+    её первому переходу не исполнится window секунд. По каждому борту в сводку идёт
+    только итоговое состояние, и только если оно отличается от исходного — пара
+    «офлайн, снова онлайн» внутри окна не даёт ничего. Возвращает число сводок.
+    """
+    window = NOTIFY_DIGEST_SECONDS if window is None else window
+    cooldown = NOTIFY_BOARD_COOLDOWN_SECONDS if cooldown is None else cooldown
+    rows = list(
+        NotificationOutbox.objects
+        .filter(status=NotificationOutbox.PENDING).exclude(kind="")
+        .order_by("id")
+    )
+    if not rows:
+        return 0
+
+    now = timezone.now()
+    groups = {}
+    for m in rows:
+        groups.setdefault((m.chat_id, m.thread_id), []).append(m)
+
+    digests, done, cooled = [], [], {}
+    for (chat_id, thread_id), items in groups.items():
+        per_boat = {}
+        for m in items:
+            per_boat.setdefault(m.boat, []).append(m)
+        if cooldown:
+            # борта в cooldown ждут, пока ключ не истечёт, и окно группы не держат
+            recent = cache.get_many([_cooldown_key(chat_id, b) for b in per_boat])
+            per_boat = {b: ms for b, ms in per_boat.items() if _cooldown_key(chat_id, b) not in recent}
+        if not per_boat or (now - min(ms[0].created_at for ms in per_boat.values())).total_seconds() < window:
+            continue
+
+        final = {_ONLINE: [], _OFFLINE: []}
+        for boat, ms in per_boat.items():
+            done.extend(ms)
+            # переходы чередуются, так что до первого борт был в противоположном состоянии
+            if ms[-1].kind == _OPPOSITE[ms[0].kind]:
+                continue
+            final[ms[-1].kind].append(ms[-1])
+
+        for kind in (_OFFLINE, _ONLINE):
+            for text in digest_texts(kind, final[kind]) if final[kind] else []:
+                digests.append(NotificationOutbox(chat_id=chat_id, thread_id=thread_id, text=text))
+            if cooldown:
+                cooled.update({_cooldown_key(chat_id, m.boat): now.timestamp() for m in final[kind]})
+
+    if done:
+        with transaction.atomic():
+            NotificationOutbox.objects.bulk_create(digests)
+            NotificationOutbox.objects.filter(pk__in=[m.pk for m in done]).update(status=NotificationOutbox.DIGESTED)
+        if cooled:
+            cache.set_many(cooled, timeout=cooldown)
+    return len(digests)
+
+
+def _held_chats() -> dict:
+    # {chat_id: id первого сообщения, ждущего повтора} — более поздние в этот чат не обгоняют его
+    return dict(
+        NotificationOutbox.objects
+        .filter(status=NotificationOutbox.PENDING, kind="", next_attempt_at__gt=timezone.now())
+        .values_list("chat_id").annotate(first=Min("id"))
+    )
+
+
+def _deliver(max_seconds: float, batch: int, sleep) -> dict:
+    deadline = time.monotonic() + max_seconds
+    stats = {"sent": 0, "failed": 0, "deferred": 0}
+    while True:
+        coalesce()
+        due = list(
+            NotificationOutbox.objects
+            .filter(status=NotificationOutbox.PENDING, kind="", next_attempt_at__lte=timezone.now())
+            .order_by("id")[:batch]
+        )
+        if not due:
+            break
+        held, progressed = _held_chats(), False
+        for m in due:
+            if m.chat_id in held and held[m.chat_id] < m.pk:
+                continue
+            bucket = _bucket(m.chat_id)
+            wait = max(bucket.wait_time(), _global.wait_time())
+            if wait > deadline - time.monotonic():
+                held[m.chat_id] = m.pk
+                continue
+            if wait:
+                sleep(wait)
+            if _deliver_one(m, bucket):
+                stats["sent"] += 1
+            else:
+                if m.status == NotificationOutbox.PENDING:
+                    held[m.chat_id] = m.pk
+                stats["failed" if m.status == NotificationOutbox.FAILED else "deferred"] += 1
+            progressed = True
+        if not progressed or time.monotonic() >= deadline:
+            break
+    return stats
+
+
+def deliver(max_seconds: float = 30, batch: int = 100, sleep=time.sleep) -> dict:
+    """
+    Отправляет накопившиеся сообщения, пока очередь не опустеет или не выйдет max_seconds.
+    Параллельный вызов (наложившийся beat) сразу возвращает {"locked": True}.
+    """
+    pg = connection.vendor == "postgresql"
+    if pg:
+        with connection.cursor() as c:
+            c.execute("SELECT pg_try_advisory_lock(%s)", [OUTBOX_LOCK])
+            if not c.fetchone()[0]:
+                return {"locked": True}
+    try:
+        stats = _deliver(max_seconds, batch, sleep)
+        NotificationOutbox.objects.filter(
+            status__in=[NotificationOutbox.SENT, NotificationOutbox.DIGESTED],
+            created_at__lt=timezone.now() - timedelta(days=NOTIFY_KEEP_DAYS)
+        ).delete()
+        return stats
+    finally:
+        if pg:
+            with connection.cursor() as c:
+                c.execute("SELECT pg_advisory_unlock(%s)", [OUTBOX_LOCK])
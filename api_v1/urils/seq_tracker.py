@@ -0,0 +1,179 @@
+# уже записанные seq по сессиям в памяти процесса: повторы пачек отсекаются до БД
+#
+# Для каждой (board_id, sess) — множество интервалов seq, подтверждённых записью в БД.
+# Ошибаться можно только в одну сторону: чего трекер не знает, то идёт в БД обычным путём
+# (upsert + проверка существующих ключей). «Повтор» (строку можно не писать) он говорит
+# только про seq, которые этот процесс сам записал, и только если совпал отпечаток строки
+# (ts и все перезаписываемые поля): исправленная борт-ом строка с тем же seq — не повтор.
+# seq, известные лишь по индексу (board, sess, seq) из БД, — KNOWN: их сверит upsert.
+import bisect
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from app.models import Board, Telemetry
+
+
+# сколько сессий держим в памяти (LRU)
+SEQ_TRACKER_SESSIONS = getattr(settings, "TELEMETRY_SEQ_TRACKER_SESSIONS", 4096)
+# интервалов на сессию: при сильно дырявом потоке самые старые забываются (станут «неизвестными»)
+SEQ_TRACKER_RANGES = getattr(settings, "TELEMETRY_SEQ_TRACKER_RANGES", 1024)
+# отпечатков строк на сессию: за пределами последних столько записанных seq повтор сверяет БД
+SEQ_TRACKER_PRINTS = getattr(settings, "TELEMETRY_SEQ_TRACKER_PRINTS", 4096)
+
+NEW, DUPLICATE, KNOWN, OUT_OF_ORDER = "new", "duplicate", "known", "out_of_order"
+
+# из чего складывается отпечаток строки: ключ ts и всё, что перезаписывает upsert
+_PRINT_FIELDS = (
+    "ts", "ts_epoch", "lat", "lon", "alt_m", "gs", "hdg", "volt", "mode",
+    "wind_spd", "wind_dir", "gps", "arm",
+)
+
+
+def fingerprint(r) -> int:
+    # hash() живёт только в этом процессе — как и сам трекер
+    return hash(tuple(r[f] for f in _PRINT_FIELDS))
+
+
+class SeqRanges:
+    """
+    Отсортированные непересекающиеся [lo, hi] с отсечкой floor: ниже неё — неизвестно.
+    prints — {seq: отпечаток} для последних записанных этим процессом seq.
+    """
+
+    __slots__ = ("lo", "hi", "floor", "prints")
+
+    def __init__(self, ranges=()):
+        self.lo, self.hi = [], []
+        self.floor = None
+        self.prints = {}
+        for lo, hi in sorted(ranges):
+            self.add_range(lo, hi)
+
+    @property
+    def high(self):
+        return self.hi[-1] if self.hi else None
+
+    def __contains__(self, seq) -> bool:
+        i = bisect.bisect_right(self.lo, seq) - 1
+        return i >= 0 and seq <= self.hi[i]
+
+    def add(self, seq):
+        self.add_range(seq, seq)
+
+    def add_range(self, lo, hi):
+        if self.floor is not None and hi < self.floor:
+            return
+        # первый интервал, который может слиться (его hi >= lo - 1), и первый за пределами (lo > hi + 1)
+        i = bisect.bisect_left(self.hi, lo - 1)
+        j = bisect.bisect_right(self.lo, hi + 1)
+        if i < j:
+            lo, hi = min(lo, self.lo[i]), max(hi, self.hi[j - 1])
+        self.lo[i:j], self.hi[i:j] = [lo], [hi]
+        if len(self.lo) > SEQ_TRACKER_RANGES:
+            drop = len(self.lo) - SEQ_TRACKER_RANGES
+            self.floor = self.hi[drop - 1] + 1
+            del self.lo[:drop], self.hi[:drop]
+
+    def remember(self, seq, fp):
+        self.add(seq)
+        self.prints.pop(seq, None)
+        self.prints[seq] = fp
+        if len(self.prints) > SEQ_TRACKER_PRINTS:
+            del self.prints[next(iter(self.prints))]
+
+    def classify(self, seq, fp=None) -> str:
+        if self.floor is not None and seq < self.floor:
+            return NEW    # забытая область — решит БД
+        if seq in self:
+            return DUPLICATE if fp is not None and self.prints.get(seq) == fp else KNOWN
+        high = self.high
+        return OUT_OF_ORDER if high is not None and seq < high else NEW
+
+
+_lock = threading.Lock()
+_sessions: "OrderedDict[tuple, SeqRanges]" = OrderedDict()
+
+
+def load_ranges(board_id, sess) -> SeqRanges:
+    """Интервалы seq сессии из БД одним запросом по индексу (gaps-and-islands)."""
+    table = connection.ops.quote_name(Telemetry._meta.db_table)
+    with connection.cursor() as c:
+        c.execute(
+            f"SELECT MIN(seq), MAX(seq) FROM ("
+            f"  SELECT seq, seq - DENSE_RANK() OVER (ORDER BY seq) AS grp FROM {table}"
+            f"  WHERE board_id = %s AND sess = %s AND seq IS NOT NULL"
+            f") t GROUP BY grp",
+            [board_id, sess],
+        )
+        return SeqRanges(c.fetchall())
+
+
+def _ranges_for(keys) -> dict:
+    found, missing = {}, []
+    with _lock:
+        for k in keys:
+            r = _sessions.get(k)
+            if r is None:
+                missing.append(k)
+            else:
+                _sessions.move_to_end(k)
+                found[k] = r
+    for k in missing:
+        found[k] = load_ranges(*k)
+    if missing:
+        with _lock:
+            for k in missing:
+                # пока читали, другой поток мог уже завести сессию — не затираем
+                found[k] = _sessions.setdefault(k, found[k])
+                _sessions.move_to_end(k)
+            while len(_sessions) > SEQ_TRACKER_SESSIONS:
+                _sessions.popitem(last=False)
+    return found
+
+
+def classify(rows) -> dict:
+    """
+    Ставит r["seq_class"] строкам с board_id, sess и seq: duplicate — та же строка уже
+    записана (можно не писать), known — seq в БД есть, но совпадение не проверено
+    (пусть решит upsert), out_of_order / new — seq ещё не видели; строкам без ключа
+    потока — new. Возвращает счётчики по классам.
+    """
+    keyed = [r for r in rows if r["sess"] and r["seq"] is not None]
+    for r in rows:
+        r["seq_class"] = NEW
+    counts = {NEW: len(rows) - len(keyed), DUPLICATE: 0, KNOWN: 0, OUT_OF_ORDER: 0}
+    if not keyed:
+        return counts
+    ranges = _ranges_for({(r["board_id"], r["sess"]) for r in keyed})
+    with _lock:
+        for r in keyed:
+            cls = r["seq_class"] = ranges[(r["board_id"], r["sess"])].classify(r["seq"], fingerprint(r))
+            counts[cls] += 1
+    return counts
+
+
+def remember(rows):
+    """Отмечает seq и отпечатки строк, записанных в БД (вызывать после COMMIT)."""
+    with _lock:
+        for r in rows:
+            if r["sess"] and r["seq"] is not None:
+                ranges = _sessions.get((r["board_id"], r["sess"]))
+                if ranges is not None:
+                    ranges.remember(r["seq"], fingerprint(r))
+
+
+def clear():
+    with _lock:
+        _sessions.clear()
+
+
+@receiver(post_delete, sender=Board)
+def _board_deleted(sender, instance, **kwargs):
+    with _lock:
+        for k in [k for k in _sessions if k[0] == instance.pk]:
+            del _sessions[k]
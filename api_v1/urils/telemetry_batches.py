@@ -0,0 +1,71 @@
+# идемпотентный приём: пачка с X-Batch-Id, которую сервер уже записал, повторно не разбирается
+#
+# Борт, не дождавшийся ответа (связь упала после COMMIT), шлёт ту же пачку ещё раз.
+# По X-Batch-Id ответ первой попытки отдаётся как есть — без чтения тела и без работы с БД по строкам.
+# Хранится в TelemetryBatch (одна строка на пачку) и в кэше перед ней; id — уникальный
+# на стороне борта (UUID или «борт-сессия-номер»), другие борта его не повторяют.
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from app.models import TelemetryBatch
+
+
+# сколько помним записанные пачки (повтор позже — просто пройдёт приём заново, upsert его переварит)
+BATCH_ID_TTL_HOURS = getattr(settings, "TELEMETRY_BATCH_ID_TTL_HOURS", 24)
+BATCH_ID_MAX_LENGTH = 64
+
+
+def _key(batch_id) -> str:
+    return f"telemetry:batch:{batch_id}"
+
+
+def batch_id_from(meta):
+    """X-Batch-Id из request.META или None; ValueError, если id пустой, длинный или не ASCII."""
+    raw = meta.get("HTTP_X_BATCH_ID")
+    if raw is None:
+        return None
+    batch_id = raw.strip()
+    if not batch_id or len(batch_id) > BATCH_ID_MAX_LENGTH or not batch_id.isascii() or not batch_id.isprintable():
+        raise ValueError(f"X-Batch-Id must be 1..{BATCH_ID_MAX_LENGTH} printable ASCII characters")
+    return batch_id
+
+
+def lookup(batch_id, now=None):
+    """(status_code, result) уже записанной пачки или None."""
+    hit = cache.get(_key(batch_id))
+    if hit is not None:
+        return hit
+    now = now or datetime.now(timezone.utc)
+    ttl = timedelta(hours=BATCH_ID_TTL_HOURS)
+    row = (
+        TelemetryBatch.objects.filter(batch_id=batch_id, created_at__gte=now - ttl)
+        .values_list("status_code", "result", "created_at").first()
+    )
+    if row is None:
+        return None
+    status_code, result, created_at = row
+    # в кэше — не дольше, чем строка проживёт в таблице
+    cache.set(_key(batch_id), (status_code, result), timeout=max(1, int((created_at + ttl - now).total_seconds())))
+    return status_code, result
+
+
+def remember(batch_id, status_code: int, result: dict, now=None):
+    """
+    Запоминает ответ записанной пачки. Если та же пачка параллельно пришла дважды,
+    остаётся ответ первой записи (ON CONFLICT DO NOTHING) — строки телеметрии те же.
+    """
+    TelemetryBatch.objects.bulk_create(
+        [TelemetryBatch(batch_id=batch_id, status_code=status_code, result=result,
+                        created_at=now or datetime.now(timezone.utc))],
+        ignore_conflicts=True,
+    )
+    cache.add(_key(batch_id), (status_code, result), timeout=BATCH_ID_TTL_HOURS * 3600)
+
+
+def purge(now=None) -> int:
+    """Удаляет пачки старше BATCH_ID_TTL_HOURS (по индексу created_at). Возвращает число строк."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=BATCH_ID_TTL_HOURS)
+    deleted, _ = TelemetryBatch.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,259 @@
+# компактный бинарный формат телеметрии (Content-Type: application/x-sova-telemetry)
+#
+# Тело — один или несколько кадров подряд (можно в gzip). Кадр v1, little-endian:
+#
+#   заголовок  <4sBBIqIIii>  magic "SOVT", version=1, flags, boat, base_ts_ms,
+#                            base_seq, count, base_lat, base_lon (1e-6 град)
+#   sess       u8 длина + utf-8
+#   строки     u8 число + (u8 длина + utf-8)*  — таблица режимов/gps для индексов ниже
+#   записи     count * 22 байта <HBhhhHHHHHBBB>:
+#     dt_ms     u16  от предыдущей записи (первая — от base_ts_ms)
+#     dseq      u8   от предыдущей записи (первая — от base_seq), если flags & HAS_SEQ
+#     dlat/dlon i16  1e-6 град, от последнего непустого значения (первое — от base_*)
+#     alt       i16  дм
+#     gs        u16  см/с      hdg       u16  сотые градуса
+#     volt      u16  сотые В   wind_spd  u16  см/с   wind_dir  u16  сотые градуса
+#     mode/gps  u8   индекс в таблице строк
+#     flags     u8   bit0 — arm
+#   Пусто (null): i16 -32768, u16 0xFFFF, u8 0xFF.
+import struct
+
+import numpy as np
+
+
+CONTENT_TYPE = "application/x-sova-telemetry"
+
+MAGIC = b"SOVT"
+VERSION = 1
+HAS_SEQ = 0x01
+ARMED = 0x01
+
+_FRAME = struct.Struct("<4sBBIqIIii")
+_RECORD = struct.Struct("<HBhhhHHHHHBBB")
+RECORD_DTYPE = np.dtype([
+    ("dt", "<u2"), ("dseq", "u1"),
+    ("dlat", "<i2"), ("dlon", "<i2"), ("alt", "<i2"),
+    ("gs", "<u2"), ("hdg", "<u2"), ("volt", "<u2"),
+    ("wind_spd", "<u2"), ("wind_dir", "<u2"),
+    ("mode", "u1"), ("gps", "u1"), ("flags", "u1"),
+])
+assert RECORD_DTYPE.itemsize == _RECORD.size
+
+I16_NULL, U16_NULL, U8_NULL = -32768, 0xFFFF, 0xFF
+
+# поле -> (тип, множитель); кольцевые величины кодируются по модулю 360
+_SCALED = {
+    "alt_m": ("alt", 10),
+    "gs": ("gs", 100),
+    "hdg": ("hdg", 100),
+    "volt": ("volt", 100),
+    "wind_spd": ("wind_spd", 100),
+    "wind_dir": ("wind_dir", 100),
+}
+_ANGLES = ("hdg", "wind_dir")
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+# декодер
+
+def _read_str(buf, off):
+    n = buf[off]
+    return bytes(buf[off + 1: off + 1 + n]).decode("utf-8", "replace"), off + 1 + n
+
+
+def _scaled(col, null, scale):
+    valid = col != null
+    out = (col.astype(np.float64) / scale).astype(object)
+    out[~valid] = None
+    return out
+
+
+def _coord(col, base):
+    d = col.astype(np.int64)
+    valid = d != I16_NULL
+    out = ((base + np.cumsum(np.where(valid, d, 0))) / 1e6).astype(object)
+    out[~valid] = None
+    return out
+
+
+def _indexed(col, strings):
+    table = np.array(strings + [None], dtype=object)
+    idx = np.where(col < len(strings), col, len(strings))
+    return table[idx]
+
+
+def _decode_frame(buf, off):
+    if len(buf) - off < _FRAME.size:
+        raise BinaryFormatError("truncated frame header")
+    magic, version, flags, boat, base_ts_ms, base_seq, count, base_lat, base_lon = _FRAME.unpack_from(buf, off)
+    if magic != MAGIC:
+        raise BinaryFormatError(f"bad magic at {off}")
+    if version != VERSION:
+        raise BinaryFormatError(f"unsupported version {version}")
+    off += _FRAME.size
+
+    try:
+        sess, off = _read_str(buf, off)
+        strings = []
+        n_str = buf[off]; off += 1
+        for _ in range(n_str):
+            s, off = _read_str(buf, off)
+            strings.append(s)
+    except IndexError:
+        raise BinaryFormatError("truncated frame strings")
+
+    end = off + count * RECORD_DTYPE.itemsize
+    if end > len(buf):
+        raise BinaryFormatError("truncated frame records")
+    recs = np.frombuffer(buf, dtype=RECORD_DTYPE, count=count, offset=off)
+
+    # всё восстановление — векторно, по столбцам
+    cols = {
+        "ts_epoch": ((base_ts_ms + np.cumsum(recs["dt"], dtype=np.int64)) // 1000).tolist(),
+        "seq": (base_seq + np.cumsum(recs["dseq"], dtype=np.int64)).tolist() if flags & HAS_SEQ else [None] * count,
+        "lat": _coord(recs["dlat"], base_lat).tolist(),
+        "lon": _coord(recs["dlon"], base_lon).tolist(),
+        "mode": _indexed(recs["mode"], strings).tolist(),
+        "gps": _indexed(recs["gps"], strings).tolist(),
+        "arm": (recs["flags"] & ARMED).astype(bool).tolist(),
+    }
+    for name, (col, scale) in _SCALED.items():
+        null = I16_NULL if RECORD_DTYPE[col] == np.dtype("<i2") else U16_NULL
+        cols[name] = _scaled(recs[col], null, scale).tolist()
+
+    names = list(cols)
+    payloads = [
+        dict(zip(names, values), boat=boat, sess=sess or None)
+        for values in zip(*(cols[n] for n in names))
+    ]
+    return payloads, end
+
+
+def iter_frames_payloads(buf):
+    """Разбирает кадры подряд и отдаёт записи в виде тех же dict, что и NDJSON."""
+    buf = memoryview(buf)
+    off = 0
+    while off < len(buf):
+        payloads, off = _decode_frame(buf, off)
+        yield from payloads
+
+
+# эталонный кодер (для бортов, стендов и тестов)
+
+def _q(v, scale, lo, hi, null):
+    if v is None or v != v:  # None / NaN
+        return null
+    return max(lo, min(hi, int(round(float(v) * scale))))
+
+
+def _sample_ts_ms(p):
+    if p.get("ts_ms") is not None:
+        return int(p["ts_ms"])
+    return int(p["ts_epoch"]) * 1000
+
+
+class _FrameBuilder:
+    def __init__(self, boat, sess, first):
+        self.boat, self.sess = boat, sess or ""
+        self.base_ts = self.prev_ts = _sample_ts_ms(first)
+        self.has_seq = first.get("seq") is not None
+        self.base_seq = self.prev_seq = int(first["seq"]) if self.has_seq else 0
+        self.base_lat = self.prev_lat = _q(first.get("lat"), 1e6, -2**31 + 1, 2**31 - 1, 0)
+        self.base_lon = self.prev_lon = _q(first.get("lon"), 1e6, -2**31 + 1, 2**31 - 1, 0)
+        self.strings, self.records = [], []
+
+    def _str_index(self, s):
+        if s is None or s == "":
+            return U8_NULL
+        s = str(s)
+        if s not in self.strings:
+            if len(self.strings) >= 254:
+                return None
+            self.strings.append(s)
+        return self.strings.index(s)
+
+    def add(self, p) -> bool:
+        """Добавляет запись; False — не влезает в дельты этого кадра, нужен новый."""
+        if len(self.records) >= 0xFFFF:
+            return False
+        ts = _sample_ts_ms(p)
+        dt = ts - self.prev_ts
+        if not 0 <= dt < 0xFFFF:
+            return False
+
+        seq = p.get("seq")
+        if (seq is not None) != self.has_seq:
+            return False
+        dseq = int(seq) - self.prev_seq if self.has_seq else 0
+        if not 0 <= dseq < U8_NULL:
+            return False
+
+        deltas = []
+        for key, prev in (("lat", self.prev_lat), ("lon", self.prev_lon)):
+            q = _q(p.get(key), 1e6, -2**31 + 1, 2**31 - 1, None)
+            if q is None:
+                deltas.append((I16_NULL, prev))
+            elif -32767 <= q - prev <= 32767:
+                deltas.append((q - prev, q))
+            else:
+                return False
+
+        mode, gps = self._str_index(p.get("mode")), self._str_index(p.get("gps"))
+        if mode is None or gps is None:
+            return False
+
+        values = {}
+        for name, (col, scale) in _SCALED.items():
+            v = p.get(name)
+            if name in _ANGLES and v is not None and v == v:
+                v = float(v) % 360
+            if col == "alt":
+                values[col] = _q(v, scale, -32767, 32767, I16_NULL)
+            else:
+                values[col] = _q(v, scale, 0, 0xFFFE, U16_NULL)
+
+        arm = p.get("arm") in (1, "1", True, "true", "True")
+        self.records.append(_RECORD.pack(
+            dt, dseq, deltas[0][0], deltas[1][0], values["alt"],
+            values["gs"], values["hdg"], values["volt"], values["wind_spd"], values["wind_dir"],
+            mode, gps, ARMED if arm else 0,
+        ))
+        self.prev_ts = ts
+        if self.has_seq: self.prev_seq = int(seq)
+        self.prev_lat, self.prev_lon = deltas[0][1], deltas[1][1]
+        return True
+
+    def bytes(self) -> bytes:
+        sess = self.sess.encode("utf-8")[:255]
+        out = [
+            _FRAME.pack(MAGIC, VERSION, HAS_SEQ if self.has_seq else 0, self.boat,
+                        self.base_ts, self.base_seq, len(self.records), self.base_lat, self.base_lon),
+            bytes([len(sess)]), sess,
+            bytes([len(self.strings)]),
+        ]
+        for s in self.strings:
+            b = s.encode("utf-8")[:255]
+            out += [bytes([len(b)]), b]
+        out += self.records
+        return b"".join(out)
+
+
+def encode(boat: int, sess, samples) -> bytes:
+    """
+    Кодирует записи одного борта/сессии (dict с ts_epoch или ts_ms, seq, lat, lon, ...).
+    Когда дельта не влезает в поле записи, начинается новый кадр.
+    """
+    frames, fb = [], None
+    for p in samples:
+        if fb is None or not fb.add(p):
+            if fb is not None:
+                frames.append(fb.bytes())
+            fb = _FrameBuilder(int(boat), sess, p)
+            if not fb.add(p):
+                raise BinaryFormatError(f"sample does not fit a frame: {p}")
+    if fb is not None:
+        frames.append(fb.bytes())
+    return b"".join(frames)
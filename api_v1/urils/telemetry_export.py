@@ -0,0 +1,168 @@
+# выгрузка телеметрии в колоночные форматы (Parquet / Feather) кусками, без всей выборки в памяти
+from django.conf import settings
+
+from app.models import Telemetry
+
+
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "feather": ("application/vnd.apache.arrow.file", "feather"),
+}
+
+# строк в одной row group / record batch; столько же держим в памяти
+EXPORT_CHUNK_ROWS = getattr(settings, "TELEMETRY_EXPORT_CHUNK_ROWS", 50000)
+EXPORT_COMPRESSION = getattr(settings, "TELEMETRY_EXPORT_COMPRESSION", "zstd")
+
+# (колонка, тип arrow). lat/lon — float64: во float32 на широте 55° шаг ~0.4 м,
+# для разбора полёта маловато; остальные величины float32 хватает с запасом
+_COLUMNS = (
+    ("ts", "timestamp"),
+    ("ts_epoch", "int64"),
+    ("sess", "string"),
+    ("seq", "int32"),
+    ("lat", "float64"),
+    ("lon", "float64"),
+    ("alt_m", "float32"),
+    ("gs", "float32"),
+    ("hdg", "float32"),
+    ("volt", "float32"),
+    ("wind_spd", "float32"),
+    ("wind_dir", "float32"),
+    ("mode", "dictionary"),
+    ("gps", "dictionary"),
+    ("arm", "bool"),
+)
+
+
+class ExportUnavailable(RuntimeError):
+    pass
+
+
+def _arrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportUnavailable("pyarrow is not installed (pip install pyarrow)")
+    return pyarrow
+
+
+def schema(dictionaries: bool = True):
+    """dictionaries=False — mode/gps обычными строками (для Feather, см. _writer)."""
+    pa = _arrow()
+    types = {
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "int64": pa.int64(), "int32": pa.int32(),
+        "float64": pa.float64(), "float32": pa.float32(),
+        "string": pa.string(),
+        "dictionary": pa.dictionary(pa.int16(), pa.string()) if dictionaries else pa.string(),
+        "bool": pa.bool_(),
+    }
+    return pa.schema([(name, types[t]) for name, t in _COLUMNS])
+
+
+def iter_record_batches(board_id, sess=None, start=None, end=None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Строки борта по (ts, id) через серверный курсор (iterator(chunk_size=...)),
+    по chunk_rows строк на RecordBatch с типизированными колонками.
+    """
+    pa = _arrow()
+    sch = schema()
+    qs = Telemetry.objects.filter(board_id=board_id)
+    if sess is not None:
+        qs = qs.filter(sess=sess)
+    if start is not None:
+        qs = qs.filter(ts__gte=start)
+    if end is not None:
+        qs = qs.filter(ts__lt=end)
+    rows = qs.order_by("ts", "id").values_list(*(name for name, _ in _COLUMNS)).iterator(chunk_size=chunk_rows)
+
+    def batch(chunk):
+        cols = list(zip(*chunk))
+        arrays = []
+        for i, field in enumerate(sch):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(cols[i], type=pa.string()).dictionary_encode().cast(field.type))
+            else:
+                arrays.append(pa.array(cols[i], type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=sch)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield batch(chunk)
+            chunk = []
+    if chunk:
+        yield batch(chunk)
+
+
+def _writer(sink, fmt):
+    """-> (writer, как подготовить пачку к записи)."""
+    pa = _arrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(sink, schema(), compression=EXPORT_COMPRESSION), None
+    if fmt == "feather":
+        # Feather v2 — это файл Arrow IPC: словарь колонки в нём один на файл, а у каждой
+        # пачки свой (dictionary_encode по её строкам) — пишем mode/gps обычными строками
+        plain = schema(dictionaries=False)
+        options = pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+        return pa.ipc.new_file(sink, plain, options=options), lambda b: b.cast(plain)
+    raise ValueError(f"unknown format {fmt}")
+
+
+def write_export(sink, fmt, batches) -> int:
+    """Пишет пачки в файл/поток sink (путь или file-like). Возвращает число строк."""
+    rows = 0
+    w, prepare = _writer(sink, fmt)
+    with w:
+        for b in batches:
+            w.write_batch(prepare(b) if prepare else b)
+            rows += b.num_rows
+    return rows
+
+
+class _Chunks:
+    """File-like для writer'а: копит записанные байты, генератор ответа их забирает."""
+
+    def __init__(self):
+        self.parts, self.pos, self.closed = [], 0, False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out, self.parts = b"".join(self.parts), []
+        return out
+
+
+def stream_export(fmt, batches):
+    """
+    Байты файла для StreamingHttpResponse: после каждой пачки отдаём то, что writer
+    успел записать, так что в памяти не больше одной пачки. Writer создаётся сразу,
+    чтобы ExportUnavailable/неизвестный формат всплыли до начала ответа.
+    """
+    sink = _Chunks()
+    w, prepare = _writer(sink, fmt)
+
+    def chunks():
+        with w:
+            for b in batches:
+                w.write_batch(prepare(b) if prepare else b)
+                data = sink.take()
+                if data:
+                    yield data
+        yield sink.take()
+
+    return chunks()
@@ -0,0 +1,291 @@
+# пакетная запись телеметрии с бортов
+from datetime import timezone as dt_timezone
+
+from django.db import DataError, IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app.models import Telemetry
+
+from . import board_registry, live_bus, live_state, seq_tracker
+from .flight_sessions import apply_sessions, fold_sessions
+from .telemetry_normalize import normalize_batch
+from .telemetry_stream import iter_batches
+from .telemetry_utils import apply_board_summaries, fold_board_summaries
+
+
+# сколько строк уходит в один multi-row INSERT
+TELEMETRY_BULK_BATCH = 500
+
+# сколько записей потока держим в памяти и пишем одной транзакцией
+TELEMETRY_CHUNK_ROWS = 2000
+
+# поля, которые перезаписываются при повторе (board, sess, seq, ts)
+TELEMETRY_UPDATE_FIELDS = [
+    "ts_epoch",
+    "lat", "lon", "alt_m", "gs", "hdg", "volt", "mode",
+    "wind_spd", "wind_dir", "gps", "arm",
+]
+# колонки INSERT (id — из последовательности)
+_INSERT_COLUMNS = ["board", "ts", "sess", "seq"] + TELEMETRY_UPDATE_FIELDS
+
+
+def _key(r):
+    return (r["board_id"], r["sess"], r["seq"], r["ts"])
+
+
+def _telemetry(r):
+    return Telemetry(
+        board_id=r["board_id"],
+        ts=r["ts"], ts_epoch=r["ts_epoch"],
+        sess=r["sess"], seq=r["seq"],
+        lat=r["lat"], lon=r["lon"], alt_m=r["alt_m"],
+        gs=r["gs"], hdg=r["hdg"], volt=r["volt"], mode=r["mode"],
+        wind_spd=r["wind_spd"], wind_dir=r["wind_dir"],
+        gps=r["gps"], arm=r["arm"],
+    )
+
+
+def _db_ts(v):
+    # sqlite отдаёт RETURNING строкой, Postgres — datetime
+    if isinstance(v, str):
+        v = parse_datetime(v)
+    if v is not None and timezone.is_naive(v):
+        v = timezone.make_aware(v, dt_timezone.utc)
+    return v
+
+
+def _insert_new(rows) -> set:
+    """
+    INSERT ... ON CONFLICT (board_id, sess, seq, ts) DO NOTHING RETURNING ключ:
+    возвращает ключи строк, которые добавил именно этот запрос. Параллельная загрузка
+    тех же строк ждёт на уникальном индексе и свои строки новыми уже не увидит.
+    (xmax = 0 в RETURNING секционированная таблица не отдаёт.)
+    """
+    fields = [Telemetry._meta.get_field(name) for name in _INSERT_COLUMNS]
+    table = connection.ops.quote_name(Telemetry._meta.db_table)
+    cols = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    one = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    inserted = set()
+    with connection.cursor() as c:
+        for i in range(0, len(rows), TELEMETRY_BULK_BATCH):
+            part = rows[i:i + TELEMETRY_BULK_BATCH]
+            params = []
+            for obj in map(_telemetry, part):
+                params.extend(f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields)
+            c.execute(
+                f"INSERT INTO {table} ({cols}) VALUES {', '.join([one] * len(part))} "
+                f"ON CONFLICT (board_id, sess, seq, ts) DO NOTHING "
+                f"RETURNING board_id, sess, seq, ts",
+                params,
+            )
+            inserted.update((b, sess, seq, _db_ts(ts)) for b, sess, seq, ts in c.fetchall())
+    return inserted
+
+
+def _upsert(objs):
+    Telemetry.objects.bulk_create(
+        objs,
+        batch_size=TELEMETRY_BULK_BATCH,
+        update_conflicts=True,
+        unique_fields=["board", "sess", "seq", "ts"],
+        update_fields=TELEMETRY_UPDATE_FIELDS,
+    )
+
+
+def _write(keyed, plain) -> set:
+    """
+    Строки без ключа потока (sess/seq пустые) конфликтовать не могут — простой INSERT.
+    Строки с ключом: сначала INSERT ... DO NOTHING, не вставшие (уже были) — upsert.
+    Возвращает ключи вставленных строк.
+    """
+    if plain:
+        Telemetry.objects.bulk_create([_telemetry(r) for r in plain], batch_size=TELEMETRY_BULK_BATCH)
+    inserted = _insert_new(keyed) if keyed else set()
+    rest = [r for r in keyed if _key(r) not in inserted]
+    if rest:
+        _upsert([_telemetry(r) for r in rest])
+    return inserted
+
+
+def _adopt_stored_ts(rows):
+    """
+    ts входит в уникальный ключ, а у записи без времени с борта ts = время приёма —
+    повтор такой записи стал бы новой строкой. Строкам с sess/seq без времени с борта
+    подставляем ts уже записанной строки (board, sess, seq): повтор ляжет на неё upsert'ом.
+    """
+    assumed = {}
+    for r in rows:
+        if r["ts_assumed"] and r["sess"] and r["seq"] is not None:
+            assumed.setdefault((r["board_id"], r["sess"]), []).append(r)
+    if not assumed:
+        return
+    cond = Q()
+    for (board_id, sess), rs in assumed.items():
+        cond |= Q(board_id=board_id, sess=sess, seq__in={r["seq"] for r in rs})
+    stored = {}
+    for board_id, sess, seq, ts in Telemetry.objects.filter(cond).values_list("board_id", "sess", "seq", "ts"):
+        k = (board_id, sess, seq)
+        stored[k] = min(stored[k], ts) if k in stored else ts
+    for rs in assumed.values():
+        for r in rs:
+            r["ts"] = stored.get((r["board_id"], r["sess"], r["seq"]), r["ts"])
+
+
+def write_rows(rows):
+    """
+    Пишет нормализованные строки (с board_id) пачкой в одной транзакции:
+    новые — INSERT ... ON CONFLICT DO NOTHING RETURNING, остальные — ON CONFLICT DO UPDATE.
+    Возвращает (saved, updated, errors) с той же семантикой, что и построчная запись.
+    Строкам, которые добавились впервые, ставит r["fresh"] = True (для сводки по сессиям),
+    не записанным из-за ошибки — r["failed"] = True.
+    Точные повторы строк, которые трекер seq сам видел записанными, в БД не идут вовсе
+    (считаются updated); строки с известным seq, но другим содержимым идут обычным upsert.
+    """
+    keyed, plain = {}, []
+    updated = 0
+    _adopt_stored_ts(rows)
+    seq_tracker.classify(rows)
+    for r in rows:
+        r["fresh"] = r["failed"] = False
+        if r["seq_class"] == seq_tracker.DUPLICATE:
+            updated += 1
+            continue
+        if r["sess"] and r["seq"] is not None:
+            k = _key(r)
+            if k in keyed:
+                # повтор внутри пачки — раньше это был insert + update
+                updated += 1
+            keyed[k] = r
+        else:
+            plain.append(r)
+
+    try:
+        with transaction.atomic():
+            inserted = _write(list(keyed.values()), plain)
+            # в трекер — только то, что точно легло в БД
+            written = list(keyed.values())
+            transaction.on_commit(lambda: seq_tracker.remember(written))
+    except (IntegrityError, DataError) as e:
+        # ошибки соединения (OperationalError) не глотаем — пачку надо повторить целиком
+        print(f"[telemetry] bulk write failed, fallback to per-row: {e}")
+        return _write_rows_one_by_one(list(keyed.values()) + plain, updated)
+
+    for k, r in keyed.items():
+        r["fresh"] = k in inserted
+    for r in plain:
+        r["fresh"] = True
+    updated += len(keyed) - len(inserted)
+    saved = len(inserted) + len(plain)
+    return saved, updated, 0
+
+
+def _write_rows_one_by_one(rows, updated):
+    # запасной путь: одна «ядовитая» строка не должна ронять всю пачку
+    saved, errors = 0, 0
+    for r in rows:
+        try:
+            with transaction.atomic():
+                if r["sess"] and r["seq"] is not None:
+                    fresh = bool(_write([r], []))
+                else:
+                    _write([], [r])
+                    fresh = True
+            if fresh: saved += 1
+            else: updated += 1
+            r["fresh"] = fresh
+        except (IntegrityError, DataError) as e:
+            errors += 1
+            r["failed"] = True
+            print(f"[telemetry] row error: {e}  row={str(r)[:160]}")
+    return saved, updated, errors
+
+
+def ingest_payloads(payloads, chunk_rows: int = TELEMETRY_CHUNK_ROWS, now=None) -> dict:
+    """
+    Полный цикл приёма: нормализация → борта → пакетная запись → сводки сессий и бортов.
+    payloads может быть генератором — он читается кусками по chunk_rows записей,
+    так что память не зависит от размера загрузки. Сводки сессий сливаются в транзакции
+    каждого куска, сводки бортов и live-состояние — один раз в конце.
+    now — время приёма пачки для записей без времени борта (по умолчанию — момент
+    нормализации); пачке, отложенной в очередь или спул, передают время запроса.
+    Возвращает {"saved", "updated", "errors", "boards"}.
+    """
+    return ingest_rows(_normalized(iter_batches(payloads, chunk_rows), now))
+
+
+def _normalized(batches, now=None):
+    for batch in batches:
+        rows, errs = normalize_batch(batch, now=now)
+        for i, msg in errs:
+            print(f"[telemetry] item error: {msg}  obj={str(batch[i])[:160]}")
+        yield rows, len(errs)
+
+
+def _assign_boards(rows) -> dict:
+    # борт (создадим при первом сообщении) — id берём из реестра процесса
+    board_ids = board_registry.board_ids_for(r["boat"] for r in rows)
+    for r in rows:
+        r["board_id"] = board_ids[r["boat"]]
+    return board_ids
+
+
+def _write_chunk(rows):
+    with transaction.atomic():
+        s, u, e = write_rows(rows)
+        # сводка сессий — в той же транзакции, что и строки: если слияние упало, откатится
+        # и кусок, и повтор снова увидит строки новыми. Повторы уже учтены — только новые строки
+        apply_sessions(fold_sessions(r for r in rows if r["fresh"]))
+        # FK на boards отложенные (DEFERRABLE INITIALLY DEFERRED) — проверяем их здесь, а не
+        # на COMMIT внешней транзакции: удалённый борт всплывёт IntegrityError этого куска
+        connection.check_constraints()
+    return s, u, e
+
+
+def ingest_rows(chunks) -> dict:
+    """
+    То же для уже нормализованных строк: chunks — пары (строки, число отброшенных записей),
+    каждая пара пишется своей транзакцией вместе со сводкой своих сессий.
+    """
+    saved, updated, errors = 0, 0, 0
+    boats = set()
+    summaries = {}
+    live = {}
+
+    for rows, bad in chunks:
+        errors += bad
+        boats.update(_assign_boards(rows))
+        try:
+            s, u, e = _write_chunk(rows)
+        except IntegrityError as exc:
+            # id из реестра устарел: борт удалили в другом процессе (сигнал post_delete
+            # чистит только свой) — перечитываем реестр и пишем кусок ещё раз
+            print(f"[telemetry] stale board id, registry reloaded: {exc}")
+            board_registry.clear()
+            boats.update(_assign_boards(rows))
+            s, u, e = _write_chunk(rows)
+        saved, updated, errors = saved + s, updated + u, errors + e
+        if e:
+            # борт могли удалить в другом процессе — перечитаем реестр со следующей пачки
+            board_registry.clear()
+
+        fold_board_summaries(rows, summaries)
+        live_state.fold_live(rows, live)
+        try:
+            live_bus.publish_rows([r for r in rows if r["fresh"]])
+        except Exception as e:
+            print(f"[telemetry] stream publish error: {e}")
+
+    try:
+        live_state.apply_live(live)
+    except Exception as e:
+        print(f"[telemetry] live state error: {e}")
+
+    # сразу отметим «включился», если был оффлайн — один UPDATE на борт за загрузку
+    try:
+        apply_board_summaries(summaries)
+    except Exception as e:
+        print(f"[telemetry] board summary error: {e}")
+
+    return {"saved": saved, "updated": updated, "errors": errors, "boards": sorted(boats)}
@@ -0,0 +1,173 @@
+# лимит приёма на борт: token bucket в общем кэше + подсказки борту, как часто и сколько слать
+#
+# Один борт, настроенный на 50 Гц, не должен занимать воркеры приёма всего парка.
+# На каждый борт — ведро TELEMETRY_BOARD_RATE записей/с с запасом TELEMETRY_BOARD_BURST.
+# Сверх квоты записи либо откладываются в спул (их перенесёт drain_telemetry_spool — в БД
+# они попадут, но позже и без нагрузки на воркеры приёма), либо прореживаются равномерно
+# ("downsample", лишнее не пишется). Если спул недоступен, сверхквотное не пишется и не
+# теряется молча: ответ 429 с Retry-After, борт пришлёт пачку ещё раз. Ведро читается и пишется в кэше одной парой get_many/set_many
+# на пачку без блокировок: одновременные пачки одного борта могут чуть превысить квоту.
+import json
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .telemetry_ingest import TELEMETRY_CHUNK_ROWS
+from .telemetry_spool import spool_batch
+from .telemetry_stream import KIND_NDJSON, iter_batches
+
+
+# записей в секунду на борт и запас (0 — без ограничения, по умолчанию выключено)
+BOARD_RATE = getattr(settings, "TELEMETRY_BOARD_RATE", 0.0)
+BOARD_BURST = getattr(settings, "TELEMETRY_BOARD_BURST", 600)
+# что делать со сверхквотными записями: "defer" — в спул, "downsample" — проредить пачку борта до квоты
+OVER_QUOTA_POLICY = getattr(settings, "TELEMETRY_OVER_QUOTA_POLICY", "defer")
+# сколько записей в секунду приём парка переваривает без очереди — от этого растёт интервал в подсказке
+FLEET_CAPACITY = getattr(settings, "TELEMETRY_FLEET_CAPACITY", 5000.0)
+# интервал отправки, который советуем при нормальной нагрузке
+SEND_INTERVAL = getattr(settings, "TELEMETRY_SEND_INTERVAL", 1.0)
+
+# окно, по которому считаем нагрузку парка (секундные счётчики в кэше)
+_FLEET_WINDOW = 5
+
+
+def _bucket_key(boat) -> str:
+    return f"telemetry:bucket:{boat}"
+
+
+def _fleet_key(second: int) -> str:
+    return f"telemetry:fleet:{second}"
+
+
+def enabled() -> bool:
+    return BOARD_RATE > 0
+
+
+def take(counts: dict, now=None) -> dict:
+    """
+    Списывает записи с вёдер бортов: {boat: сколько пришло} -> {boat: (сколько можно, нехватка)}.
+    Разрешённое списывается сразу; нехватка — сколько записей не влезло.
+    """
+    now = time.time() if now is None else now
+    keys = {boat: _bucket_key(boat) for boat in counts}
+    state = cache.get_many(list(keys.values()))
+    out, new_state = {}, {}
+    for boat, n in counts.items():
+        tokens, stamp = state.get(keys[boat], (BOARD_BURST, now))
+        tokens = min(BOARD_BURST, tokens + max(0.0, now - stamp) * BOARD_RATE)
+        allowed = min(n, int(tokens))
+        out[boat] = (allowed, n - allowed)
+        new_state[keys[boat]] = (tokens - allowed, now)
+    # пустое ведро наполнится за BOARD_BURST / BOARD_RATE — дольше хранить незачем
+    cache.set_many(new_state, timeout=int(BOARD_BURST / BOARD_RATE) + 60)
+    return out
+
+
+def count_fleet(n: int, now=None):
+    key = _fleet_key(int(time.time() if now is None else now))
+    cache.add(key, 0, timeout=_FLEET_WINDOW * 2)
+    try:
+        cache.incr(key, n)
+    except ValueError:
+        # ключ успел истечь между add и incr
+        cache.set(key, n, timeout=_FLEET_WINDOW * 2)
+
+
+def fleet_rate(now=None) -> float:
+    """Записей в секунду по всему парку за последние _FLEET_WINDOW полных секунд."""
+    second = int(time.time() if now is None else now)
+    keys = [_fleet_key(second - i) for i in range(1, _FLEET_WINDOW + 1)]
+    return sum(cache.get_many(keys).values()) / _FLEET_WINDOW
+
+
+def hints(deficit: int = 0, now=None) -> dict:
+    """
+    Подсказка борту: next_send_s — через сколько слать следующую пачку, max_batch — сколько в ней записей.
+    При нагрузке парка выше FLEET_CAPACITY интервал растёт пропорционально, а размер пачки — нет,
+    так что борт сам снижает частоту; борту сверх квоты — ещё и время, за которое ведро покроет нехватку.
+    """
+    pressure = max(1.0, fleet_rate(now) / FLEET_CAPACITY)
+    interval = SEND_INTERVAL * pressure
+    if deficit:
+        interval = max(interval, deficit / BOARD_RATE)
+    return {
+        "next_send_s": round(interval, 2),
+        "max_batch": max(1, min(int(BOARD_BURST), math.ceil(BOARD_RATE * SEND_INTERVAL))),
+    }
+
+
+def _boat_of(obj):
+    try:
+        return int(obj.get("boat"))
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return None
+
+
+def _evenly(items, k):
+    """k элементов из items, равномерно по порядку (прореживание)."""
+    if k <= 0:
+        return []
+    n = len(items)
+    return [items[(i * n) // k] for i in range(k)]
+
+
+class Limiter:
+    """
+    Пропускает поток записей одного запроса через вёдра бортов:
+    limiter.admit(payloads) -> записи, которые пишем сейчас; потом limiter.result() для ответа.
+    """
+
+    def __init__(self, policy: str = None):
+        self.policy = policy or OVER_QUOTA_POLICY
+        self.deferred = 0
+        self.dropped = 0
+        # сверхквотные записи, которые не удалось отложить: ответ — 429
+        self.rejected = 0
+        self.deficit = 0
+
+    def admit(self, payloads, chunk_rows: int = TELEMETRY_CHUNK_ROWS):
+        for batch in iter_batches(payloads, chunk_rows):
+            yield from self._admit_batch(batch)
+
+    def _admit_batch(self, batch):
+        by_boat, passed = {}, []
+        for obj in batch:
+            boat = _boat_of(obj)
+            if boat is None:
+                passed.append(obj)     # без борта — нормализация сама посчитает ошибкой
+            else:
+                by_boat.setdefault(boat, []).append(obj)
+
+        admitted, over = passed, []
+        for boat, (allowed, short) in take({b: len(objs) for b, objs in by_boat.items()}).items():
+            objs = by_boat[boat]
+            if not short:
+                admitted.extend(objs)
+                continue
+            self.deficit = max(self.deficit, short)
+            if self.policy == "downsample":
+                admitted.extend(_evenly(objs, allowed))
+                self.dropped += short
+            else:
+                admitted.extend(objs[:allowed])
+                over.extend(objs[allowed:])
+
+        if over:
+            self._defer(over)
+        count_fleet(len(admitted))
+        return admitted
+
+    def _defer(self, objs):
+        body = "\n".join(json.dumps(o, default=str) for o in objs).encode()
+        try:
+            spool_batch(body, KIND_NDJSON)
+            self.deferred += len(objs)
+        except Exception as e:
+            # спул недоступен — остальное пишем, а эти записи борт повторит (upsert переварит повтор)
+            print(f"[telemetry] defer failed, {len(objs)} rows rejected: {e}")
+            self.rejected += len(objs)
+
+    def result(self) -> dict:
+        return dict(hints(self.deficit), deferred=self.deferred, dropped=self.dropped, rejected=self.rejected)
@@ -0,0 +1,291 @@
+# нормализация пачки записей с бортов по колонкам (numpy) вместо вызовов на каждое поле каждой строки
+#
+# Схема полей ниже; результат — строки для Telemetry (ключи ROW_FIELDS) плюс ошибки
+# по номерам записей. Колонка, в которой встретились типы, отличные от
+# чисел/None (строки, списки), целиком идёт медленным поэлементным путём с той же семантикой.
+from datetime import datetime, timezone
+from itertools import repeat
+from operator import is_not
+
+import numpy as np
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+
+# дробные поля: (min, max) — вне диапазона значение прижимается к границе, None — без проверки
+FLOAT_FIELDS = {
+    "lat": (-90.0, 90.0),
+    "lon": (-180.0, 180.0),
+    "alt_m": None,
+    "gs": None,
+    "hdg": None,
+    "volt": (0.0, getattr(settings, "TELEMETRY_VOLT_MAX", 100.0)),
+    "wind_spd": None,
+    "wind_dir": None,
+}
+# строковые поля: максимальная длина (длиннее — запись с ошибкой)
+STR_FIELDS = {"sess": 64, "mode": 32, "gps": 16}
+
+# ts_assumed — у записи не было ни ts_epoch, ни годного ts, и ts = время приёма
+ROW_FIELDS = ("boat", "ts", "ts_epoch", "ts_assumed", "sess", "seq", "mode", "gps", "arm", "power_on") + tuple(FLOAT_FIELDS)
+
+_NUMERIC = {int, float, bool, type(None)}
+_NULL_STRINGS = ("nan", "null", "none")
+_TRUE = (1, "1", True, "true", "True")
+# что datetime.fromtimestamp ещё переваривает (годы 1..9999)
+_EPOCH_MIN, _EPOCH_MAX = -62135596800, 253402300799
+
+
+def _present(col):
+    """Маска «значение есть» (не None) без цикла на Python."""
+    return np.fromiter(map(is_not, col, repeat(None)), dtype=bool, count=len(col))
+
+
+def _numeric(col) -> bool:
+    return set(map(type, col)) <= _NUMERIC
+
+
+def _int_array(col):
+    """
+    Быстрый путь для целых: float64 (None -> NaN), если в колонке только числа/None
+    и всё влезает в int64; иначе None — колонка пойдёт поэлементно.
+    """
+    if not _numeric(col):
+        return None
+    try:
+        arr = np.array(col, dtype=np.float64)
+    except OverflowError:
+        return None
+    with np.errstate(invalid="ignore"):
+        return None if (np.abs(arr) >= 2.0 ** 62).any() else arr
+
+
+def _scalar_float(v):
+    """Как раньше: _nan_to_none + float(); ValueError/TypeError — ошибка записи."""
+    if v is None:
+        return np.nan
+    if isinstance(v, str) and v.strip().lower() in _NULL_STRINGS:
+        return np.nan
+    return float(v)
+
+
+def _float_column(col, errors, name):
+    """-> float64 с NaN на месте пустых значений."""
+    if _numeric(col):
+        try:
+            return np.array(col, dtype=np.float64)
+        except OverflowError:
+            pass
+    out = np.empty(len(col))
+    for i, v in enumerate(col):
+        try:
+            out[i] = _scalar_float(v)
+        except (TypeError, ValueError) as e:
+            errors.setdefault(i, f"{name}: {e}")
+            out[i] = np.nan
+    return out
+
+
+def _str_column(col, errors, name, empty_is_none=False):
+    limit = STR_FIELDS[name]
+    if set(map(type, col)) <= {str, type(None)}:
+        out = [v or None for v in col] if empty_is_none else col
+        filled = [v for v in out if v]
+        if not filled or max(map(len, filled)) <= limit:
+            return list(out)
+    out = []
+    for i, v in enumerate(col):
+        if v is None or (empty_is_none and not v):
+            out.append(None)
+            continue
+        v = str(v)
+        if len(v) > limit:
+            errors.setdefault(i, f"{name} longer than {limit}")
+        out.append(v)
+    return out
+
+
+def _boat_column(col, errors):
+    n = len(col)
+    arr = _int_array(col)
+    if arr is not None:
+        none = ~_present(col)
+        for i in np.flatnonzero(none | np.isnan(arr) | np.isinf(arr)).tolist():
+            errors.setdefault(i, "boat is required" if col[i] is None else f"bad boat: {col[i]}")
+        return np.where(none | ~np.isfinite(arr), 0, arr).astype(np.int64).tolist()
+    out = []
+    for i, v in enumerate(col):
+        try:
+            if v is None:
+                raise ValueError("boat is required")
+            out.append(int(v))
+        except (TypeError, ValueError, OverflowError) as e:
+            errors.setdefault(i, str(e))
+            out.append(0)
+    return out
+
+
+def _nan_to_none(v):
+    if isinstance(v, str) and v.strip().lower() in _NULL_STRINGS:
+        return None
+    if isinstance(v, float) and np.isnan(v):
+        return None
+    return v
+
+
+def _seq_column(col, sess, errors):
+    """С sess — int() (мусор — ошибка), без sess — только число, остальное отбрасывается."""
+    arr = _int_array(col)
+    if arr is not None:
+        ok = np.isfinite(arr)
+        for i in np.flatnonzero(np.isinf(arr)).tolist():
+            errors.setdefault(i, "seq: cannot convert float infinity to integer")
+        vals = np.where(ok, arr, 0).astype(np.int64).tolist()
+        return [v if k else None for v, k in zip(vals, ok.tolist())]
+    out = []
+    for i, v in enumerate(col):
+        v = _nan_to_none(v)
+        try:
+            if sess[i] and v is not None:
+                out.append(int(v))
+            else:
+                out.append(int(v) if isinstance(v, (int, float)) else None)
+        except (TypeError, ValueError, OverflowError) as e:
+            errors.setdefault(i, f"seq: {e}")
+            out.append(None)
+    return out
+
+
+def _ts_columns(epoch_col, ts_col, errors, now):
+    """
+    ts_epoch -> (ts, ts_epoch). Секунды эпохи переводятся в datetime только для
+    уникальных значений; записи без годного ts_epoch разбирают строку ts, иначе — now.
+    """
+    n = len(epoch_col)
+    ts = [None] * n
+    epochs = [None] * n
+    arr = _int_array(epoch_col)
+    if arr is not None:
+        none = ~_present(epoch_col)
+        finite = np.isfinite(arr)
+        for i in np.flatnonzero(~none & ~finite).tolist():
+            errors.setdefault(i, f"bad ts_epoch: {epoch_col[i]}")
+        ints = np.where(finite, arr, 0).astype(np.int64)
+        usable = finite & (ints >= _EPOCH_MIN) & (ints <= _EPOCH_MAX)
+        if usable.any():
+            uniq, inv = np.unique(ints[usable], return_inverse=True)
+            dts = [datetime.fromtimestamp(e, tz=timezone.utc) for e in uniq.tolist()]
+            for i, k in zip(np.flatnonzero(usable).tolist(), inv.tolist()):
+                ts[i] = dts[k]
+        ints_l = ints.tolist()
+        for i in np.flatnonzero(finite).tolist():
+            epochs[i] = ints_l[i]
+    else:
+        for i, v in enumerate(epoch_col):
+            if v is None:
+                continue
+            try:
+                epochs[i] = int(v)
+            except (TypeError, ValueError, OverflowError) as e:
+                errors.setdefault(i, f"bad ts_epoch: {e}")
+                continue
+            try:
+                ts[i] = datetime.fromtimestamp(epochs[i], tz=timezone.utc)
+            except (OverflowError, ValueError, OSError):
+                pass
+
+    for i in range(n):
+        if ts[i] is not None:
+            continue
+        s = ts_col[i]
+        if s:
+            try:
+                t = parse_datetime(s)
+            except (TypeError, ValueError) as e:
+                errors.setdefault(i, f"bad ts: {e}")
+                t = None
+            if t is not None:
+                ts[i] = t if t.tzinfo is not None else t.replace(tzinfo=timezone.utc)
+                continue
+        ts[i] = now
+    return ts, epochs
+
+
+def _power_on_column(cols):
+    """
+    Признак «включился» по сырым значениям: взведён, известен режим или GPS;
+    иначе годное volt > 10 В, а без него — любая скорость/курс или координаты.
+    """
+    volt_raw = cols["volt"]
+    n = len(volt_raw)
+    on = np.fromiter((v in (1, True) or bool(m) or bool(g)
+                      for v, m, g in zip(cols["arm"], cols["mode"], cols["gps"])), dtype=bool, count=n)
+    # годное число в volt решает само по себе (> 10 В), дальше не смотрим
+    if _numeric(volt_raw):
+        volt_ok = _present(volt_raw)
+        volt = np.array(volt_raw, dtype=np.float64)
+    else:
+        volt_ok, volt = np.zeros(n, dtype=bool), np.full(n, np.nan)
+        for i, v in enumerate(volt_raw):
+            if v is None:
+                continue
+            try:
+                volt[i] = float(v)
+                volt_ok[i] = True
+            except (TypeError, ValueError):
+                pass
+    with np.errstate(invalid="ignore"):
+        by_volt = volt > 10.0
+    motion = (_present(cols["gs"]) | _present(cols["airspd"]) | _present(cols["yaw"]) | _present(cols["hdg"])
+              | (_present(cols["lat"]) & _present(cols["lon"])))
+    return (on | np.where(volt_ok, by_volt, motion)).tolist()
+
+
+def normalize_batch(objs, now=None):
+    """
+    Пачка записей -> (строки, ошибки). Строки — dict с полями ROW_FIELDS для записей
+    без ошибок, в исходном порядке; ошибки — [(номер записи, текст)].
+    """
+    objs = list(objs)
+    n = len(objs)
+    if not n:
+        return [], []
+    errors = {}
+    for i, o in enumerate(objs):
+        if not isinstance(o, dict):
+            errors[i] = f"not an object: {type(o).__name__}"
+    dicts = objs if not errors else [o if isinstance(o, dict) else {} for o in objs]
+
+    raw = {
+        name: list(map(dict.get, dicts, repeat(name)))
+        for name in ("boat", "ts", "ts_epoch", "sess", "seq", "mode", "gps", "arm", "airspd", "yaw")
+        + tuple(FLOAT_FIELDS)
+    }
+
+    cols = {"boat": _boat_column(raw["boat"], errors)}
+    now = now or datetime.now(timezone.utc)
+    cols["ts"], cols["ts_epoch"] = _ts_columns(raw["ts_epoch"], raw["ts"], errors, now)
+    cols["ts_assumed"] = [t is now for t in cols["ts"]]
+    cols["sess"] = _str_column(raw["sess"], errors, "sess", empty_is_none=True)
+    cols["seq"] = _seq_column(raw["seq"], cols["sess"], errors)
+    cols["mode"] = _str_column(raw["mode"], errors, "mode")
+    cols["gps"] = _str_column(raw["gps"], errors, "gps")
+    cols["arm"] = [v in _TRUE for v in raw["arm"]]
+    cols["power_on"] = _power_on_column(raw)
+
+    for name, rng in FLOAT_FIELDS.items():
+        arr = _float_column(raw[name], errors, name)
+        if rng is not None:
+            # NaN (пустые значения) clip не трогает
+            arr = np.clip(arr, *rng)
+        null = np.isnan(arr)
+        vals = arr.tolist()
+        if null.any():
+            for i in np.flatnonzero(null).tolist():
+                vals[i] = None
+        cols[name] = vals
+
+    rows = list(map(dict, map(zip, repeat(ROW_FIELDS), zip(*(cols[f] for f in ROW_FIELDS)))))
+    if errors:
+        rows = [r for i, r in enumerate(rows) if i not in errors]
+    return rows, sorted(errors.items())
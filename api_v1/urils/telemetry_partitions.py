@@ -0,0 +1,143 @@
+# помесячные секции таблицы telemetry (Postgres, RANGE по ts)
+import re
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from app.models import Telemetry
+
+
+PARENT = Telemetry._meta.db_table
+DEFAULT = f"{PARENT}_default"
+_NAME = re.compile(rf"^{PARENT}_p(\d{{4}})(\d{{2}})$")
+
+PARTITIONS_AHEAD = getattr(settings, "TELEMETRY_PARTITIONS_AHEAD", 3)
+# None — хранить всё
+RETENTION_MONTHS = getattr(settings, "TELEMETRY_RETENTION_MONTHS", None)
+
+
+def _month(d) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _utc(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as c:
+        c.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [PARENT],
+        )
+        return c.fetchone() is not None
+
+
+def list_partitions() -> dict:
+    """{первое число месяца: имя секции} для помесячных секций."""
+    with connection.cursor() as c:
+        c.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [PARENT],
+        )
+        names = [r[0] for r in c.fetchall()]
+    out = {}
+    for n in names:
+        m = _NAME.match(n)
+        if m:
+            out[date(int(m.group(1)), int(m.group(2)), 1)] = n
+    return out
+
+
+def create_partition(month: date):
+    """
+    Создаёт секцию месяца. Строки этого месяца, уже попавшие в секцию по умолчанию,
+    переносятся в новую таблицу до ATTACH — иначе Postgres не даст её подключить.
+    """
+    name, lo, hi = partition_name(month), _utc(month), _utc(_add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as c:
+        c.execute(f'CREATE TABLE "{name}" (LIKE "{PARENT}" INCLUDING DEFAULTS)')
+        c.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT}" WHERE ts >= %s AND ts < %s RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [lo, hi],
+        )
+        moved = c.rowcount
+        c.execute(f'ALTER TABLE "{PARENT}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', [lo, hi])
+    return name, moved
+
+
+def ensure_partitions(ahead: int = PARTITIONS_AHEAD, retention_months=RETENTION_MONTHS, today=None) -> list:
+    """
+    Секции на текущий месяц и ahead месяцев вперёд, плюс секции для месяцев,
+    чьи строки лежат в секции по умолчанию (в пределах срока хранения).
+    """
+    current = _month(today or datetime.now(timezone.utc))
+    wanted = {_add_months(current, i) for i in range(ahead + 1)}
+
+    with connection.cursor() as c:
+        c.execute(f'SELECT DISTINCT date_trunc(\'month\', ts AT TIME ZONE \'UTC\')::date FROM "{DEFAULT}"')
+        stray = {r[0] for r in c.fetchall()}
+    if retention_months:
+        cutoff = _add_months(current, -retention_months)
+        stray = {m for m in stray if m >= cutoff}
+    wanted |= {m for m in stray if m <= _add_months(current, ahead)}
+
+    existing = list_partitions()
+    created = []
+    for month in sorted(wanted - set(existing)):
+        name, moved = create_partition(month)
+        created.append({"partition": name, "moved": moved})
+    return created
+
+
+def expire_partitions(retention_months=RETENTION_MONTHS, detach_only: bool = False, today=None) -> list:
+    """
+    Секции, целиком старше срока хранения, отключаются (DETACH) и, если не detach_only, удаляются.
+    Из секции по умолчанию такие строки просто удаляются.
+    """
+    if not retention_months:
+        return []
+    cutoff = _add_months(_month(today or datetime.now(timezone.utc)), -retention_months)
+
+    expired = []
+    for month, name in sorted(list_partitions().items()):
+        if _add_months(month, 1) > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as c:
+            c.execute(f'ALTER TABLE "{PARENT}" DETACH PARTITION "{name}"')
+            if not detach_only:
+                c.execute(f'DROP TABLE "{name}"')
+        expired.append({"partition": name, "dropped": not detach_only})
+
+    if not detach_only:
+        with connection.cursor() as c:
+            c.execute(f'DELETE FROM "{DEFAULT}" WHERE ts < %s', [_utc(cutoff)])
+            if c.rowcount:
+                expired.append({"partition": DEFAULT, "deleted": c.rowcount})
+    return expired
+
+
+def maintain(ahead: int = PARTITIONS_AHEAD, retention_months=RETENTION_MONTHS, detach_only: bool = False) -> dict:
+    if not is_partitioned():
+        return {"partitioned": False}
+    return {
+        "partitioned": True,
+        "created": ensure_partitions(ahead, retention_months),
+        "expired": expire_partitions(retention_months, detach_only),
+    }
@@ -0,0 +1,136 @@
+# чтение телеметрии борта: keyset-пагинация по (ts, id) без OFFSET и без экземпляров моделей
+import json
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from app.models import Telemetry
+
+
+# поля, которые можно запросить через ?fields=
+QUERY_FIELDS = (
+    "ts", "ts_epoch", "sess", "seq",
+    "lat", "lon", "alt_m", "gs", "hdg", "volt", "mode",
+    "wind_spd", "wind_dir", "gps", "arm",
+)
+
+TELEMETRY_PAGE_SIZE = getattr(settings, "TELEMETRY_PAGE_SIZE", 1000)
+TELEMETRY_MAX_PAGE_SIZE = getattr(settings, "TELEMETRY_MAX_PAGE_SIZE", 10000)
+# строк за один fetch серверного курсора
+_CHUNK_SIZE = 2000
+# строк в одном куске ответа
+_STREAM_ROWS = 500
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_time(value, name):
+    """ISO-8601 или секунды эпохи (UTC)."""
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except ValueError:
+        # не число — пробуем ISO; nan тоже сюда
+        pass
+    except (OverflowError, OSError):
+        # inf, 1e20: за пределами datetime
+        raise QueryError(f"bad {name}: {value}")
+    try:
+        ts = parse_datetime(value)
+    except ValueError:
+        # похоже на дату, но такой нет (2024-13-45)
+        ts = None
+    if ts is None:
+        raise QueryError(f"bad {name}: {value}")
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def parse_fields(value):
+    if not value:
+        return list(QUERY_FIELDS)
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in QUERY_FIELDS]
+    if unknown:
+        raise QueryError(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit(value):
+    if value in (None, ""):
+        return TELEMETRY_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise QueryError(f"bad limit: {value}")
+    return max(1, min(limit, TELEMETRY_MAX_PAGE_SIZE))
+
+
+# курсор: "<ts в микросекундах эпохи>.<id>" последней отданной строки
+
+def encode_cursor(ts: datetime, pk: int) -> str:
+    return f"{(ts - _EPOCH) // _US}.{pk}"
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        us, pk = value.split(".")
+        return _EPOCH + int(us) * _US, int(pk)
+    except ValueError:
+        raise QueryError(f"bad cursor: {value}")
+
+
+def page_rows(board_id, fields, limit, start=None, end=None, sess=None, cursor=None):
+    """
+    Кортежи (ts, id, *fields) одной страницы, +1 строка сверх limit — признак следующей.
+    Условие по (ts, id) идёт по индексу (board, ts), поэтому страница N стоит столько же, сколько первая.
+    """
+    qs = Telemetry.objects.filter(board_id=board_id)
+    if start is not None:
+        qs = qs.filter(ts__gte=start)
+    if end is not None:
+        qs = qs.filter(ts__lt=end)
+    if sess is not None:
+        qs = qs.filter(sess=sess)
+    if cursor is not None:
+        ts, pk = cursor
+        qs = qs.filter(ts__gte=ts).filter(Q(ts__gt=ts) | Q(id__gt=pk))
+    qs = qs.order_by("ts", "id").values_list("ts", "id", *fields)[: limit + 1]
+    return qs.iterator(chunk_size=min(limit + 1, _CHUNK_SIZE))
+
+
+def _json_value(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def stream_page(rows, fields, limit):
+    """
+    JSON страницы кусками: {"fields": [...], "rows": [[...], ...], "next": курсор|null}.
+    Строки сериализуются по мере чтения из БД, страница целиком в памяти не собирается.
+    """
+    yield json.dumps({"fields": fields})[:-1].encode() + b', "rows": ['
+    last, sent, buf = None, 0, []
+    for row in rows:
+        if sent == limit:
+            break
+        ts, pk, values = row[0], row[1], row[2:]
+        buf.append(json.dumps([_json_value(v) for v in values]))
+        last, sent = (ts, pk), sent + 1
+        if len(buf) >= _STREAM_ROWS:
+            yield ("," if sent > len(buf) else "").encode() + ",".join(buf).encode()
+            buf = []
+    else:
+        last = None    # строк не больше limit — страница последняя
+    if buf:
+        yield ("," if sent > len(buf) else "").encode() + ",".join(buf).encode()
+    nxt = encode_cursor(*last) if last is not None else None
+    yield b'], "next": ' + json.dumps(nxt).encode() + b"}"
@@ -0,0 +1,268 @@
+# агрегаты телеметрии по интервалам 1 с / 10 с / 1 мин: досчёт по водяной отметке и чтение для графиков
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from app.models import (
+    Telemetry, TelemetryRollup1m, TelemetryRollup1s, TelemetryRollup10s, TelemetryRollupWatermark,
+)
+
+from .telemetry_ingest import TELEMETRY_BULK_BATCH
+
+
+# (ширина интервала в секундах, модель) — от мелкого к крупному
+RESOLUTIONS = [
+    (1, TelemetryRollup1s),
+    (10, TelemetryRollup10s),
+    (60, TelemetryRollup1m),
+]
+
+STAT_FIELDS = ("alt_m", "gs", "volt", "wind_spd", "lat", "lon")   # min/max/avg/last
+LAST_FIELDS = ("hdg", "wind_dir")                                 # только last
+
+# сколько новых строк Telemetry разбирается за один проход
+ROLLUP_BATCH_ROWS = getattr(settings, "TELEMETRY_ROLLUP_BATCH_ROWS", 20000)
+# сколько точек отдаём на один график
+ROLLUP_MAX_POINTS = getattr(settings, "TELEMETRY_ROLLUP_MAX_POINTS", 1000)
+
+# сколько отрезков времени в одном SELECT сырых строк
+_SPANS_PER_QUERY = 200
+
+_ROW_FIELDS = ("board_id", "ts", "id", "mode", "gps", "arm") + STAT_FIELDS + LAST_FIELDS
+_AGG_FIELDS = (
+    ["n", "last_ts"]
+    + [f"{f}_{a}" for f in STAT_FIELDS for a in ("min", "max", "avg", "last")]
+    + [f"{f}_last" for f in LAST_FIELDS]
+    + ["mode", "gps", "arm"]
+)
+
+
+def _table(model) -> str:
+    return model._meta.db_table
+
+
+def _floor(ts: datetime, width: int) -> datetime:
+    epoch = int(ts.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % width, tz=timezone.utc)
+
+
+# досчёт
+
+def _aggregate(rows, width, keys) -> dict:
+    """
+    Сворачивает сырые строки (по возрастанию ts) в {(board_id, bucket): поля агрегата}
+    только для интервалов из keys. last — последнее непустое значение в интервале.
+    """
+    out = {}
+    for r in rows:
+        key = (r["board_id"], _floor(r["ts"], width))
+        if key not in keys:
+            continue
+        a = out.get(key)
+        if a is None:
+            a = out[key] = {"n": 0, "mode": None, "gps": None, "arm": False}
+            for f in STAT_FIELDS:
+                a[f] = [None, None, 0.0, 0, None]   # min, max, sum, count, last
+            for f in LAST_FIELDS:
+                a[f"{f}_last"] = None
+        a["n"] += 1
+        a["last_ts"] = r["ts"]
+        a["arm"] = bool(r["arm"])
+        for f in ("mode", "gps"):
+            if r[f] is not None:
+                a[f] = r[f]
+        for f in STAT_FIELDS:
+            v = r[f]
+            if v is None:
+                continue
+            s = a[f]
+            s[0] = v if s[0] is None else min(s[0], v)
+            s[1] = v if s[1] is None else max(s[1], v)
+            s[2] += v
+            s[3] += 1
+            s[4] = v
+        for f in LAST_FIELDS:
+            if r[f] is not None:
+                a[f"{f}_last"] = r[f]
+
+    for a in out.values():
+        for f in STAT_FIELDS:
+            mn, mx, total, cnt, last = a.pop(f)
+            a[f"{f}_min"], a[f"{f}_max"], a[f"{f}_last"] = mn, mx, last
+            a[f"{f}_avg"] = total / cnt if cnt else None
+    return out
+
+
+def _spans(affected) -> dict:
+    """{board_id: [(from, to), ...]} — объединённые интервалы всех разрешений."""
+    per_board = defaultdict(list)
+    for width, keys in affected.items():
+        for board_id, bucket in keys:
+            per_board[board_id].append((bucket, bucket + timedelta(seconds=width)))
+    out = {}
+    for board_id, intervals in per_board.items():
+        intervals.sort()
+        merged = [list(intervals[0])]
+        for lo, hi in intervals[1:]:
+            if lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        out[board_id] = merged
+    return out
+
+
+def _raw_rows(spans):
+    ranges = [(b, lo, hi) for b, items in spans.items() for lo, hi in items]
+    for i in range(0, len(ranges), _SPANS_PER_QUERY):
+        cond = Q()
+        for b, lo, hi in ranges[i:i + _SPANS_PER_QUERY]:
+            cond |= Q(board_id=b, ts__gte=lo, ts__lt=hi)
+        yield from Telemetry.objects.filter(cond).order_by("ts", "id").values(*_ROW_FIELDS)
+
+
+def _snapshot_xid(func: str):
+    """pg_snapshot_xmin / pg_snapshot_xmax текущего снимка; не Postgres — None."""
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as c:
+        c.execute(f"SELECT {func}(pg_current_snapshot())::text::bigint")
+        return c.fetchone()[0]
+
+
+def update_rollups(max_rows: int = ROLLUP_BATCH_ROWS) -> dict:
+    """
+    Один проход: берёт строки Telemetry с id после отметки, пересчитывает из сырых
+    данных каждый затронутый ими интервал во всех таблицах агрегатов и сдвигает отметки.
+    Опоздавшие строки (ts в прошлом) попадают в свой старый интервал — он пересчитается целиком.
+
+    id раздаются при INSERT, а видны строки после COMMIT, и параллельные транзакции приёма
+    коммитятся не по порядку id: строка с id ниже отметки может появиться позже прохода.
+    Поэтому (safe_id, last_id] ещё «не закрыт»: в конце прохода запоминаем xmax снимка
+    (guard_xid), и когда на следующем проходе xmin снимка его перерос — все транзакции,
+    шедшие во время прошлого прохода, завершились. Тогда, если строк в (safe_id, last_id]
+    стало больше, чем мы видели (seen_rows), их интервалы пересчитываются, и safe_id = last_id.
+    """
+    tables = [_table(m) for _, m in RESOLUTIONS]
+    with transaction.atomic():
+        for t in tables:
+            TelemetryRollupWatermark.objects.get_or_create(table=t)
+        # блокировка отметок: второй параллельный проход ждёт первый
+        marks = list(TelemetryRollupWatermark.objects.select_for_update().filter(table__in=tables))
+        last = min(m.last_id for m in marks)
+        safe = min(m.safe_id for m in marks)
+        seen = min(m.seen_rows for m in marks)
+        guard = max((m.guard_xid for m in marks if m.guard_xid is not None), default=None)
+
+        rows = []
+        oldest = _snapshot_xid("pg_snapshot_xmin")
+        if safe < last and (guard is None or oldest is None or oldest >= guard):
+            span = Telemetry.objects.filter(id__gt=safe, id__lte=last)
+            if span.count() != seen:
+                rows = list(span.values_list("id", "board_id", "ts"))
+            safe, seen = last, 0
+
+        new = list(
+            Telemetry.objects.filter(id__gt=last).order_by("id")
+            .values_list("id", "board_id", "ts")[:max_rows]
+        )
+        rows += new
+
+        written = {}
+        if rows:
+            affected = {width: {(b, _floor(ts, width)) for _, b, ts in rows} for width, _ in RESOLUTIONS}
+            raw = list(_raw_rows(_spans(affected)))
+            for width, model in RESOLUTIONS:
+                aggs = _aggregate(raw, width, affected[width])
+                model.objects.bulk_create(
+                    [model(board_id=b, bucket=bucket, **a) for (b, bucket), a in aggs.items()],
+                    batch_size=TELEMETRY_BULK_BATCH,
+                    update_conflicts=True,
+                    unique_fields=["board", "bucket"],
+                    update_fields=_AGG_FIELDS,
+                )
+                written[_table(model)] = len(aggs)
+
+        if new:
+            last, seen = new[-1][0], seen + len(new)
+        # снимок берём в самом конце: транзакция, взявшая id до нашего SELECT, к этому моменту уже имеет xid
+        guard = _snapshot_xid("pg_snapshot_xmax") if safe < last else None
+        TelemetryRollupWatermark.objects.filter(table__in=tables).update(
+            last_id=last, safe_id=safe, seen_rows=seen, guard_xid=guard,
+        )
+
+    return {
+        "rows": len(new), "rescanned": len(rows) - len(new), "more": len(new) == max_rows,
+        "buckets": written, "last_id": last,
+    }
+
+
+def catch_up(max_rows: int = ROLLUP_BATCH_ROWS, max_passes: int = 10) -> dict:
+    """Проходы update_rollups, пока не догоним таблицу Telemetry (или не упрёмся в max_passes)."""
+    totals = {"rows": 0, "passes": 0}
+    for _ in range(max_passes):
+        res = update_rollups(max_rows)
+        totals["passes"] += 1
+        totals["rows"] += res["rows"]
+        if not res["more"]:
+            break
+    return totals
+
+
+# чтение
+
+def _merge(rows, origin: datetime, step: int) -> list:
+    """Сливает соседние интервалы в интервалы по step секунд от origin (для слишком длинных диапазонов)."""
+    out = []
+    for r in rows:
+        bucket = origin + timedelta(seconds=(r["bucket"] - origin).total_seconds() // step * step)
+        if not out or out[-1]["bucket"] != bucket:
+            out.append(dict(r, bucket=bucket, _w={f: r["n"] if r[f"{f}_avg"] is not None else 0 for f in STAT_FIELDS}))
+            continue
+        m = out[-1]
+        m["n"] += r["n"]
+        m["last_ts"] = r["last_ts"]
+        m["arm"] = r["arm"]
+        for f in STAT_FIELDS:
+            if r[f"{f}_min"] is not None:
+                m[f"{f}_min"] = r[f"{f}_min"] if m[f"{f}_min"] is None else min(m[f"{f}_min"], r[f"{f}_min"])
+                m[f"{f}_max"] = r[f"{f}_max"] if m[f"{f}_max"] is None else max(m[f"{f}_max"], r[f"{f}_max"])
+            if r[f"{f}_avg"] is not None:
+                # среднее взвешиваем по числу строк интервала
+                w = m["_w"][f]
+                m[f"{f}_avg"] = ((m[f"{f}_avg"] or 0.0) * w + r[f"{f}_avg"] * r["n"]) / (w + r["n"])
+                m["_w"][f] = w + r["n"]
+        for k in [f"{f}_last" for f in STAT_FIELDS + LAST_FIELDS] + ["mode", "gps"]:
+            if r[k] is not None:
+                m[k] = r[k]
+    for m in out:
+        del m["_w"]
+    return out
+
+
+def rollup_series(board_id: int, start: datetime, end: datetime, max_points: int = ROLLUP_MAX_POINTS) -> dict:
+    """
+    Ряд агрегатов борта за [start, end): самое мелкое разрешение, при котором точек
+    не больше max_points; если не влезает даже минутное — минутные интервалы сливаются
+    при чтении. Неделя — это ~10 тыс. минутных строк из БД вместо миллионов сырых.
+    """
+    seconds = max((end - start).total_seconds(), 1)
+    for width, model in RESOLUTIONS:
+        if seconds / width <= max_points:
+            break
+
+    origin = _floor(start, width)
+    rows = list(
+        model.objects.filter(board_id=board_id, bucket__gte=origin, bucket__lt=end)
+        .order_by("bucket").values("bucket", *_AGG_FIELDS)
+    )
+
+    step = width
+    if seconds / width > max_points:
+        step = width * math.ceil(seconds / width / max_points)
+        rows = _merge(rows, origin, step)
+    return {"resolution": step, "points": rows}
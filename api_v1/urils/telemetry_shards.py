@@ -0,0 +1,148 @@
+# шардированный приём: пачки борта — всегда в одну очередь Celery, по порядку
+#
+# Борт -> шард через консистентное хеширование номера борта (кольцо с виртуальными узлами:
+# при смене числа шардов переезжает примерно 1/N бортов). На каждую очередь
+# telemetry.ingest.<шард> — один воркер с одним процессом:
+#   celery -A djangoBackend worker -Q telemetry.ingest.0 -c 1 --prefetch-multiplier 1
+# тогда пачки одного борта пишутся строго по очереди, а строки boards / flight_sessions
+# разных шардов не пересекаются — воркеры не ждут блокировок друг друга.
+import bisect
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections
+
+from .telemetry_ingest import TELEMETRY_CHUNK_ROWS, ingest_payloads
+from .telemetry_stream import iter_batches
+
+
+# число шардов (0 — писать прямо в запросе, без очередей)
+INGEST_SHARDS = getattr(settings, "TELEMETRY_INGEST_SHARDS", 0)
+SHARD_QUEUE_PREFIX = "telemetry.ingest."
+# точек на шард на кольце — чем больше, тем ровнее борта делятся между шардами
+_VNODES = 64
+
+# повтор пачки при временной ошибке БД — в той же задаче: пауза растёт от BASE до MAX
+SHARD_RETRY_ATTEMPTS = getattr(settings, "TELEMETRY_SHARD_RETRY_ATTEMPTS", 8)
+SHARD_RETRY_BASE_SECONDS = getattr(settings, "TELEMETRY_SHARD_RETRY_BASE_SECONDS", 1.0)
+SHARD_RETRY_MAX_SECONDS = getattr(settings, "TELEMETRY_SHARD_RETRY_MAX_SECONDS", 60.0)
+# проходят сами (нет соединения, failover); IntegrityError/DataError — дефект пачки, повтор не поможет
+_TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+
+def _hash(key: str) -> int:
+    # не hash(): он свой в каждом процессе (PYTHONHASHSEED), а шард должен совпадать у всех
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Консистентное хеширование ключей на шарды 0..n-1."""
+
+    def __init__(self, n: int, vnodes: int = _VNODES):
+        points = sorted((_hash(f"shard-{s}-{v}"), s) for s in range(n) for v in range(vnodes))
+        self._keys = [p for p, _ in points]
+        self._shards = [s for _, s in points]
+
+    def shard_for(self, key) -> int:
+        i = bisect.bisect(self._keys, _hash(str(key)))
+        return self._shards[i % len(self._shards)]
+
+
+_ring = None
+
+
+def enabled() -> bool:
+    return INGEST_SHARDS > 0
+
+
+def shard_for(boat) -> int:
+    global _ring
+    if _ring is None:
+        _ring = HashRing(INGEST_SHARDS)
+    return _ring.shard_for(boat)
+
+
+def queue_name(shard: int) -> str:
+    return f"{SHARD_QUEUE_PREFIX}{shard}"
+
+
+def _boat_key(obj):
+    try:
+        return int(obj.get("boat"))
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return None
+
+
+def dispatch(payloads, chunk_rows: int = TELEMETRY_CHUNK_ROWS) -> dict:
+    """
+    Раскладывает записи по шардам и ставит задачи ingest_telemetry_shard в их очереди,
+    куском не больше chunk_rows записей на задачу. Записи без номера борта уходят в шард 0
+    (там нормализация посчитает их ошибками). С задачей едет время приёма запроса: ts записей
+    без времени борта — оно, а не момент, когда очередь дошла до пачки (ts входит в ключ строки).
+    Возвращает {"accepted", "shards": {шард: записей}}.
+    """
+    from djangoBackend.tasks import ingest_telemetry_shard
+
+    received_at = time.time()
+    accepted, per_shard = 0, {}
+    for batch in iter_batches(payloads, chunk_rows):
+        groups = {}
+        for obj in batch:
+            boat = _boat_key(obj)
+            groups.setdefault(0 if boat is None else shard_for(boat), []).append(obj)
+        for shard, objs in groups.items():
+            ingest_telemetry_shard.apply_async(args=[objs], kwargs={"received_at": received_at}, queue=queue_name(shard))
+            per_shard[shard] = per_shard.get(shard, 0) + len(objs)
+        accepted += len(batch)
+    return {"accepted": accepted, "shards": {str(s): n for s, n in sorted(per_shard.items())}}
+
+
+def ingest_shard(payloads, received_at=None, sleep=time.sleep) -> dict:
+    """
+    Тело задачи ingest_telemetry_shard; received_at — время приёма запроса (секунды эпохи,
+    None — у задач, поставленных до его появления). Временные ошибки БД повторяются здесь же:
+    retry() Celery поставил бы пачку в хвост очереди шарда, и следующие пачки того же
+    борта записались бы раньше неё. Пока идут повторы, очередь шарда стоит — это и есть
+    порядок. Остальные ошибки (и последняя неудачная попытка) уходят в задачу как есть.
+    """
+    now = None if received_at is None else datetime.fromtimestamp(received_at, tz=timezone.utc)
+    for attempt in range(1, SHARD_RETRY_ATTEMPTS + 1):
+        try:
+            return ingest_payloads(payloads, now=now)
+        except _TRANSIENT_DB_ERRORS as e:
+            if attempt == SHARD_RETRY_ATTEMPTS:
+                raise
+            pause = min(SHARD_RETRY_BASE_SECONDS * 2 ** (attempt - 1), SHARD_RETRY_MAX_SECONDS)
+            print(f"[telemetry] shard ingest attempt {attempt} failed, retry in {pause}s: {e}")
+            # соединение после такой ошибки непригодно — закроется, следующая попытка откроет новое
+            close_old_connections()
+            sleep(pause)
+
+
+def queue_depths() -> list:
+    """
+    Глубина очереди каждого шарда у брокера (сообщений, ещё не взятых воркером):
+    [{"shard", "queue", "depth"}]; depth = None, если брокер не ответил.
+    """
+    from djangoBackend.celery import app
+
+    out = []
+    try:
+        with app.connection_for_read() as conn:
+            channel = conn.default_channel
+            for shard in range(INGEST_SHARDS):
+                name = queue_name(shard)
+                try:
+                    # passive: только спросить, очередь не создаётся
+                    depth = channel.queue_declare(queue=name, passive=True).message_count
+                except conn.channel_errors:
+                    # очереди ещё нет (ни одной задачи и ни одного воркера) — канал после ошибки заново
+                    depth = 0
+                    channel = conn.channel()
+                out.append({"shard": shard, "queue": name, "depth": depth})
+    except Exception as e:
+        print(f"[telemetry] shard queue depth error: {e}")
+        return [{"shard": s, "queue": queue_name(s), "depth": None} for s in range(INGEST_SHARDS)]
+    return out
@@ -0,0 +1,282 @@
+# write-ahead спул телеметрии: приём «быстро» в файл, запись в БД — фоновым дренажом
+import io
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: flock нет, блокировка дренажа — через msvcrt.locking
+    fcntl = None
+    import msvcrt
+
+from .telemetry_ingest import TELEMETRY_CHUNK_ROWS, _normalized, ingest_rows
+from .telemetry_stream import GZIP_MAGIC, BodyTooLarge, KIND_BINARY, KIND_JSON, KIND_NDJSON, iter_batches, iter_bodies_payloads, iter_body
+
+
+SPOOL_DIR = Path(getattr(settings, "TELEMETRY_SPOOL_DIR", Path(settings.BASE_DIR) / "spool" / "telemetry"))
+# сегмент закрывается по размеру или по возрасту — что наступит раньше
+SPOOL_SEGMENT_BYTES = getattr(settings, "TELEMETRY_SPOOL_SEGMENT_BYTES", 64 * 1024 * 1024)
+SPOOL_SEGMENT_SECONDS = getattr(settings, "TELEMETRY_SPOOL_SEGMENT_SECONDS", 300)
+# больше этого одну пачку в спул не берём (413)
+SPOOL_MAX_BATCH_BYTES = getattr(settings, "TELEMETRY_SPOOL_MAX_BATCH_BYTES", 32 * 1024 * 1024)
+
+# запись: magic, вид тела, длина тела, crc32 тела, id пачки (16 байт), время приёма
+# (секунды эпохи) + тело как пришло. TSP1 — прежняя запись без времени приёма, ещё читается
+_MAGIC = b"TSP2"
+_HEADER = struct.Struct(">4sBII16sd")
+_MAGIC_V1 = b"TSP1"
+_HEADER_V1 = struct.Struct(">4sBII16s")
+_KIND_CODES = {KIND_NDJSON: 0, KIND_JSON: 1, KIND_BINARY: 2}
+_CODE_KINDS = {v: k for k, v in _KIND_CODES.items()}
+
+_OPEN, _SEALED, _POS = ".open", ".seg", ".pos"
+# сюда дренаж убирает сегменты с битой рамкой записи, чтобы не застрять на них
+_QUARANTINE = "quarantine"
+
+
+class SpoolError(Exception):
+    pass
+
+
+def validate_framing(body: bytes):
+    """Дешёвая проверка «рамки»: тело не пустое, влезает в лимит, gzip целый (CRC/длина)."""
+    if not body:
+        raise SpoolError("empty body")
+    if len(body) > SPOOL_MAX_BATCH_BYTES:
+        raise SpoolError(f"batch larger than {SPOOL_MAX_BATCH_BYTES} bytes")
+    if body[:2] == GZIP_MAGIC:
+        try:
+            for _ in iter_body(io.BytesIO(body)):
+                pass
+        except (zlib.error, EOFError) as e:
+            raise SpoolError(f"bad gzip: {e}")
+        except BodyTooLarge as e:
+            raise SpoolError(str(e))
+
+
+class _SpoolWriter:
+    """Один открытый сегмент на процесс; запись целиком одним write() + fsync."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fd = None
+        self._path = None
+        self._pid = None
+        self._created = 0.0
+        self._size = 0
+
+    def _open_segment(self):
+        SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+        self._created = time.time()
+        name = f"{int(self._created * 1000):013d}-{os.getpid()}-{uuid.uuid4().hex[:8]}{_OPEN}"
+        self._path = SPOOL_DIR / name
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._pid = os.getpid()
+        self._size = 0
+        # чтобы новый файл пережил падение, fsync нужен и каталогу (на Windows каталог так не открыть)
+        if os.name == "posix":
+            dfd = os.open(SPOOL_DIR, os.O_RDONLY)
+            try: os.fsync(dfd)
+            finally: os.close(dfd)
+
+    def _seal(self):
+        # дескриптор забываем до rename: что бы ни случилось дальше, закрытый fd не переиспользуем
+        fd, self._fd = self._fd, None
+        os.close(fd)
+        try:
+            os.rename(self._path, self._path.with_suffix(_SEALED))
+        except FileNotFoundError:
+            # простоявший .open дренаж уже дочитал и удалил (или убрал в карантин)
+            pass
+
+    def append(self, body: bytes, kind: str) -> str:
+        batch_id = uuid.uuid4()
+        record = _HEADER.pack(_MAGIC, _KIND_CODES[kind], len(body), zlib.crc32(body), batch_id.bytes, time.time()) + body
+        with self._lock:
+            if self._fd is not None and self._pid != os.getpid():
+                # после fork (gunicorn) дескриптор родителя не трогаем
+                self._fd = None
+            if self._fd is not None and (
+                self._size >= SPOOL_SEGMENT_BYTES or time.time() - self._created >= SPOOL_SEGMENT_SECONDS
+            ):
+                self._seal()
+            if self._fd is None:
+                self._open_segment()
+            os.write(self._fd, record)
+            os.fsync(self._fd)
+            self._size += len(record)
+        return batch_id.hex
+
+
+_writer = _SpoolWriter()
+
+
+def spool_batch(body: bytes, kind: str) -> str:
+    """Проверяет и дописывает пачку в спул. Возвращает id пачки."""
+    validate_framing(body)
+    return _writer.append(body, kind)
+
+
+# дренаж
+
+def _read_pos(seg: Path) -> int:
+    try:
+        return int(seg.with_suffix(_POS).read_text() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_pos(seg: Path, pos: int):
+    tmp = seg.with_suffix(_POS + ".tmp")
+    tmp.write_text(str(pos))
+    os.replace(tmp, seg.with_suffix(_POS))
+
+
+def _iter_records(f):
+    """
+    Целые записи от текущей позиции: (вид, тело, время приёма или None у записей TSP1).
+    Недописанный хвост (пишется прямо сейчас) не трогаем.
+    """
+    while True:
+        start = f.tell()
+        head = f.read(_HEADER_V1.size)
+        if len(head) < _HEADER_V1.size:
+            f.seek(start); return
+        if head[:4] == _MAGIC_V1:
+            magic, code, length, crc, batch_id = _HEADER_V1.unpack(head)
+            received = None
+        elif head[:4] == _MAGIC:
+            head += f.read(_HEADER.size - _HEADER_V1.size)
+            if len(head) < _HEADER.size:
+                f.seek(start); return
+            magic, code, length, crc, batch_id, received = _HEADER.unpack(head)
+        else:
+            raise SpoolError(f"bad record magic at {start} in {f.name}")
+        body = f.read(length)
+        if len(body) < length:
+            f.seek(start); return
+        if zlib.crc32(body) != crc:
+            print(f"[spool] crc mismatch, batch {uuid.UUID(bytes=batch_id).hex} skipped")
+            continue
+        yield _CODE_KINDS[code], body, received
+
+
+def _segment_done(seg: Path, pos: int, size: int) -> bool:
+    if pos < size:
+        return False
+    if seg.suffix == _SEALED:
+        return True
+    # .open: писатель сам закрывает его по возрасту, дальше в него уже никто не пишет
+    created = int(seg.name.split("-", 1)[0]) / 1000
+    return time.time() - created > SPOOL_SEGMENT_SECONDS + 60
+
+
+def _quarantine(seg: Path):
+    qdir = SPOOL_DIR / _QUARANTINE
+    qdir.mkdir(exist_ok=True)
+    for p in (seg, seg.with_suffix(_POS)):
+        try:
+            os.replace(p, qdir / p.name)
+        except FileNotFoundError:
+            pass
+
+
+def _timed_chunks(records, chunk_rows: int = TELEMETRY_CHUNK_ROWS):
+    """
+    (строки, отброшено) для ingest_rows кусками по chunk_rows. Каждая пачка нормализуется
+    со своим временем приёма: ts записей без времени борта — момент запроса, а не дренажа.
+    """
+    rows, bad = [], 0
+    for kind, body, received in records:
+        now = None if received is None else datetime.fromtimestamp(received, tz=timezone.utc)
+        for r, b in _normalized(iter_batches(iter_bodies_payloads([(kind, body)]), chunk_rows), now):
+            rows += r
+            bad += b
+            if len(rows) >= chunk_rows:
+                yield rows, bad
+                rows, bad = [], 0
+    if rows or bad:
+        yield rows, bad
+
+
+def _try_lock(f) -> bool:
+    """Неблокирующая эксклюзивная блокировка открытого файла; снимается при его закрытии."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def drain_spool(max_records: int = 10_000) -> dict:
+    """
+    Переносит записи спула в БД через ingest_rows по сегментам, от старых к новым.
+    Позиция в сегменте сдвигается только после успешной записи — при падении БД
+    пачки повторятся на следующем проходе (upsert по (board, sess, seq) это переживает).
+    Одновременно работает только один дренаж (flock, на Windows — msvcrt.locking).
+    Сегмент с битой записью (не та magic) после целых записей перед ней уходит
+    в SPOOL_DIR/quarantine.
+    """
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    totals = {"records": 0, "saved": 0, "updated": 0, "errors": 0, "segments_done": 0, "quarantined": 0}
+
+    with open(SPOOL_DIR / ".drain.lock", "w") as lock:
+        if not _try_lock(lock):
+            return {"skipped": "another drain is running"}
+
+        segments = sorted(p for p in SPOOL_DIR.iterdir() if p.suffix in (_OPEN, _SEALED))
+        for seg in segments:
+            if totals["records"] >= max_records:
+                break
+            pos = _read_pos(seg)
+            try:
+                f = open(seg, "rb")
+            except FileNotFoundError:
+                # писатель только что закрыл .open -> .seg; заберём на следующем проходе
+                continue
+            corrupt = None
+            with f:
+                f.seek(pos)
+                records, size, good = [], 0, pos
+                try:
+                    for kind, body, received in _iter_records(f):
+                        records.append((kind, body, received))
+                        size += len(body)
+                        good = f.tell()
+                        if totals["records"] + len(records) >= max_records or size >= SPOOL_SEGMENT_BYTES:
+                            break
+                    end = f.tell()
+                except SpoolError as e:
+                    corrupt, end = e, good
+                done = corrupt is None and _segment_done(seg, end, os.fstat(f.fileno()).st_size)
+
+            if records:
+                res = ingest_rows(_timed_chunks(records))
+                for k in ("saved", "updated", "errors"):
+                    totals[k] += res.get(k, 0)
+                totals["records"] += len(records)
+                _write_pos(seg, end)
+
+            if corrupt is not None:
+                print(f"[spool] {corrupt}, segment moved to {_QUARANTINE}/")
+                _quarantine(seg)
+                totals["quarantined"] += 1
+            elif done:
+                seg.unlink()
+                seg.with_suffix(_POS).unlink(missing_ok=True)
+                totals["segments_done"] += 1
+
+    return totals
+
@@ -0,0 +1,177 @@
+# потоковое чтение тела запроса с бортов: gzip + NDJSON без полной копии в памяти
+import io
+import json
+import zlib
+from itertools import chain, islice
+
+from django.conf import settings
+
+from . import telemetry_binary
+
+
+# сколько байт читаем из сокета за раз
+STREAM_READ_SIZE = 64 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# больше этого тело (после распаковки gzip) не бывает (защита от «gzip-бомбы» и бесконечного потока)
+MAX_BODY_BYTES = getattr(settings, "TELEMETRY_MAX_BODY_BYTES", 256 * 1024 * 1024)
+# строка NDJSON — одна запись; длиннее этого — не запись, а мусор без переводов строки
+MAX_LINE_BYTES = getattr(settings, "TELEMETRY_MAX_LINE_BYTES", 1024 * 1024)
+
+# виды тела запроса
+KIND_NDJSON, KIND_JSON, KIND_BINARY = "ndjson", "json", "binary"
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+def iter_body(stream, read_size: int = STREAM_READ_SIZE, max_bytes: int = MAX_BODY_BYTES):
+    """
+    Читает поток кусками и, если он начинается с gzip-заголовка,
+    распаковывает на лету (поддерживаются и склеенные gzip-члены).
+    Распакованный кусок — не больше read_size байт, всего (с gzip и без) — не больше
+    max_bytes (иначе BodyTooLarge): пара килобайт gzip не раздуется в памяти в гигабайты.
+    """
+    if stream is None:
+        return
+    head = stream.read(read_size)
+    if not head:
+        return
+    if head[:2] != GZIP_MAGIC:
+        total = 0
+        while head:
+            total += len(head)
+            if total > max_bytes:
+                raise BodyTooLarge(f"body larger than {max_bytes} bytes")
+            yield head
+            head = stream.read(read_size)
+        return
+
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunk, total = head, 0
+    while True:
+        while True:
+            out = d.decompress(chunk, read_size)
+            if out:
+                total += len(out)
+                if total > max_bytes:
+                    raise BodyTooLarge(f"decompressed body larger than {max_bytes} bytes")
+                yield out
+            if d.eof:
+                # следующий gzip-член в том же теле
+                chunk = d.unused_data
+                if not chunk: break
+                d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                # что не влезло в read_size, ждёт в unconsumed_tail (или внутри zlib, если выход полный)
+                chunk = d.unconsumed_tail
+                if not chunk and len(out) < read_size: break
+        chunk = stream.read(read_size)
+        if not chunk: break
+        if d.eof: d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if not d.eof:
+        raise EOFError("truncated gzip stream")
+
+
+def iter_lines(chunks, max_line: int = MAX_LINE_BYTES):
+    """
+    Режет поток байт на строки, не склеивая всё тело целиком. Незаконченная строка копится
+    кусками в списке (без пересборки на каждом куске); длиннее max_line — BodyTooLarge.
+    """
+    parts, size = [], 0
+    for chunk in chunks:
+        lines = chunk.split(b"\n")
+        tail = lines.pop()
+        if lines:
+            first = lines[0]
+            # целые строки внутри куска длиннее max_line только у куска больше max_line
+            if size + len(first) > max_line or (len(chunk) > max_line and max(map(len, lines)) > max_line):
+                raise BodyTooLarge(f"line longer than {max_line} bytes")
+            if parts:
+                parts.append(first)
+                lines[0] = b"".join(parts)
+                parts, size = [], 0
+            yield from lines
+        if tail:
+            size += len(tail)
+            if size > max_line:
+                raise BodyTooLarge(f"line longer than {max_line} bytes")
+            parts.append(tail)
+    if parts:
+        yield b"".join(parts)
+
+
+def iter_ndjson(chunks):
+    """По одному объекту на непустую строку; битые строки пропускаются."""
+    for ln in iter_lines(chunks):
+        s = ln.decode("utf-8", "replace").strip()
+        if not s: continue
+        try:
+            yield json.loads(s)
+        except Exception as e:
+            print(f"[telemetry] jsonl parse error: {e} line={s[:120]}")
+            # пропускаем строку
+
+
+def payload_kind(content_type) -> str:
+    ct = (content_type or "").lower()
+    if telemetry_binary.CONTENT_TYPE in ct:
+        return KIND_BINARY
+    if "application/json" in ct:
+        return KIND_JSON
+    return KIND_NDJSON
+
+
+def iter_payloads(chunks, kind: str):
+    """
+    NDJSON — построчно; application/json — один документ (список или объект),
+    собирается целиком; бинарные кадры — см. telemetry_binary.
+    Битый JSON-документ -> ValueError, битый кадр -> BinaryFormatError.
+    """
+    if kind == KIND_BINARY:
+        return telemetry_binary.iter_frames_payloads(b"".join(chunks))
+    if kind != KIND_JSON:
+        return iter_ndjson(chunks)
+    obj = json.loads(b"".join(chunks).decode("utf-8", "replace"))
+    if isinstance(obj, list):
+        return obj
+    if isinstance(obj, dict):
+        return [obj]
+    return []
+
+
+def sniff_kind(head: bytes) -> str:
+    """Вид тела по первым байтам (уже распакованным) — для каналов без Content-Type."""
+    if head[:4] == telemetry_binary.MAGIC:
+        return KIND_BINARY
+    if head.lstrip()[:1] == b"[":
+        return KIND_JSON
+    return KIND_NDJSON
+
+
+def iter_bodies_payloads(bodies):
+    """
+    Записи из последовательности тел (kind, bytes); kind=None — определить по содержимому.
+    Битое тело пропускается целиком, остальные читаются дальше.
+    """
+    for kind, body in bodies:
+        try:
+            chunks = iter_body(io.BytesIO(body))
+            if kind is None:
+                head = next(chunks, b"")
+                kind = sniff_kind(head)
+                chunks = chain([head], chunks)
+            yield from iter_payloads(chunks, kind)
+        except Exception as e:
+            print(f"[telemetry] bad batch skipped: {e}")
+
+
+def iter_batches(items, size: int):
+    """Нарезает поток записей на списки фиксированного размера."""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch: return
+        yield batch
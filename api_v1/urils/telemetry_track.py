@@ -0,0 +1,115 @@
+# трек сессии для карты: упрощение Дугласа-Пекера (numpy) + encoded polyline, с кэшем
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from app.models import Telemetry
+
+
+# допуск упрощения: TRACK_TOLERANCE_PX пикселей тайла 256 px на данном зуме, в градусах широты
+TRACK_TOLERANCE_PX = getattr(settings, "TELEMETRY_TRACK_TOLERANCE_PX", 1.0)
+TRACK_MAX_ZOOM = 22
+TRACK_DEFAULT_ZOOM = 14
+# сколько держим упрощённый трек (идущая сессия дорастает, поэтому не навсегда)
+TRACK_CACHE_SECONDS = getattr(settings, "TELEMETRY_TRACK_CACHE_SECONDS", 300)
+POLYLINE_PRECISION = 5
+
+
+def zoom_tolerance(zoom: int) -> float:
+    return TRACK_TOLERANCE_PX * 360.0 / (256 * 2 ** zoom)
+
+
+def load_points(board_id: int, sess: str) -> np.ndarray:
+    """(N, 2) lat/lon сессии по времени, без пустых координат."""
+    qs = (
+        Telemetry.objects.filter(board_id=board_id, sess=sess, lat__isnull=False, lon__isnull=False)
+        .order_by("ts", "id").values_list("lat", "lon")
+    )
+    pts = np.array(list(qs.iterator(chunk_size=10000)), dtype=np.float64)
+    return pts.reshape(-1, 2)
+
+
+def simplify(pts: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Дуглас-Пекер: индексы оставленных точек. Расстояние до отрезка (не до прямой),
+    иначе петли и развороты над точкой старта теряются; долгота масштабируется
+    на cos(широты), чтобы допуск был одинаковым по обеим осям.
+    Рекурсия развёрнута по уровням: на каждом уровне все ещё не закрытые отрезки
+    обрабатываются одним векторным проходом, так что циклов Python — по глубине, а не по точкам.
+    """
+    n = len(pts)
+    if n < 3:
+        return np.arange(n)
+    x = pts[:, 1] * np.cos(np.radians(pts[:, 0].mean()))
+    y = np.ascontiguousarray(pts[:, 0])
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    pending = ~keep
+    tol2 = tolerance * tolerance
+
+    while pending.any():
+        kept = np.flatnonzero(keep)
+        p = np.flatnonzero(pending)
+        seg = np.cumsum(keep)[p] - 1                  # отрезок (kept[seg], kept[seg + 1]) точки p
+        ia, ib = kept[seg], kept[seg + 1]
+        ax, ay = x[ia], y[ia]
+        dx, dy = x[ib] - ax, y[ib] - ay
+        rx, ry = x[p] - ax, y[p] - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip((rx * dx + ry * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        rx -= t * dx
+        ry -= t * dy
+        dist2 = rx * rx + ry * ry
+
+        # p упорядочены, значит точки одного отрезка идут подряд
+        starts = np.flatnonzero(np.r_[True, seg[1:] != seg[:-1]])
+        seg_max = np.maximum.reduceat(dist2, starts)
+        group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(p)]))
+        at_max = np.flatnonzero(dist2 == seg_max[group])
+        first = at_max[np.r_[True, group[at_max][1:] != group[at_max][:-1]]]
+
+        split = first[dist2[first] > tol2]
+        keep[p[split]] = True
+        pending[p[split]] = False
+        # отрезки в пределах допуска закрыты — их точки больше не считаем
+        pending[p[(seg_max <= tol2)[group]]] = False
+    return np.flatnonzero(keep)
+
+
+def encode_polyline(pts: np.ndarray, precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded polyline (lat, lon); дельты считаются векторно, в символы — по точкам."""
+    if not len(pts):
+        return ""
+    q = np.round(pts * 10 ** precision).astype(np.int64)
+    deltas = np.diff(q, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist()
+    out = []
+    for v in values:
+        while v >= 0x20:
+            out.append(chr((0x20 | (v & 0x1F)) + 63))
+            v >>= 5
+        out.append(chr(v + 63))
+    return "".join(out)
+
+
+def session_track(board_id: int, sess: str, zoom: int = TRACK_DEFAULT_ZOOM) -> dict:
+    """Упрощённый трек сессии для зума; результат кэшируется по (борт, сессия, зум)."""
+    zoom = max(0, min(int(zoom), TRACK_MAX_ZOOM))
+    key = f"telemetry:track:{board_id}:{sess}:{zoom}"
+    track = cache.get(key)
+    if track is not None:
+        return track
+
+    pts = load_points(board_id, sess)
+    tolerance = zoom_tolerance(zoom)
+    idx = simplify(pts, tolerance)
+    track = {
+        "sess": sess,
+        "zoom": zoom,
+        "tolerance_deg": tolerance,
+        "points": len(pts),
+        "kept": len(idx),
+        "polyline": encode_polyline(pts[idx]),
+    }
+    cache.set(key, track, TRACK_CACHE_SECONDS)
+    return track
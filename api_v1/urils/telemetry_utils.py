@@ -1,52 +1,103 @@
 # telemetry_utils.py (или рядом с APIView)
+from django.db import connection
 from django.utils import timezone
-from datetime import datetime
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, timezone as dt_timezone
 from app.models import Board
-from .notify import tg_send
-
-def _power_on_criteria(p: dict) -> bool:
-    # Считаем «включился», если есть явные признаки активности:
-    if p.get("arm") in (1, True):               # взведён
-        return True
-    if p.get("mode"):                           # режим известен
-        return True
-    if p.get("gps"):                            # есть GPS фиксация ("3D"/"2D")
-        return True
-    if p.get("volt") is not None:
-        try:
-            return float(p["volt"]) > 10.0
-        except Exception:
-            pass
-    if any(p.get(k) is not None for k in ("gs", "airspd", "yaw", "hdg")):
-        return True
-    if p.get("lat") is not None and p.get("lon") is not None:
-        return True
-    return False
-
-def maybe_mark_power_on(board: Board, payload: dict, ts):
-    if ts is None:
-        ts = timezone.now()
-
-    board.last_telemetry_at = ts
-
-    # обновляем быстрые поля независимо от статуса
-    if payload.get("mode"): board.last_mode = payload["mode"]
-    if payload.get("volt") is not None:
-        try: board.last_volt = float(payload["volt"])
-        except Exception: pass
-
-    if board.is_online:
-        board.save(update_fields=["last_telemetry_at", "last_mode", "last_volt"])
-        return False
-
-    if _power_on_criteria(payload):
-        board.is_online = True
-        board.online_since = ts
-        board.save(update_fields=["is_online", "online_since", "last_telemetry_at", "last_mode", "last_volt"])
-        # тут можете дернуть уведомление в ТГ
-        from .notify import tg_send
-        tg_send(f"🟢 Борт #{board.boat_number} включился …")
-        return True
-
-    board.save(update_fields=["last_telemetry_at", "last_mode", "last_volt"])
-    return False
+from .notify import notify_transitions
+
+
+# «сводка» бортов по пачке: одна запись на борт вместо save() на каждую строку
+
+def fold_board_summaries(rows, summaries=None) -> dict:
+    """
+    Сворачивает нормализованные строки (board_id, boat, ts, mode, volt, power_on)
+    в {board_id: сводка} — последний ts, последний режим/напряжение и самый ранний
+    признак включения. Можно вызывать по частям, передавая тот же summaries.
+    """
+    if summaries is None:
+        summaries = {}
+    for r in rows:
+        ts = r["ts"]
+        s = summaries.get(r["board_id"])
+        if s is None:
+            s = summaries[r["board_id"]] = {
+                "boat": r["boat"], "ts": ts,
+                "mode": None, "mode_ts": None,
+                "volt": None, "volt_ts": None,
+                "power_on_ts": None,
+            }
+        if ts >= s["ts"]:
+            s["ts"] = ts
+        if r.get("mode") and (s["mode_ts"] is None or ts >= s["mode_ts"]):
+            s["mode"], s["mode_ts"] = r["mode"], ts
+        if r.get("volt") is not None and (s["volt_ts"] is None or ts >= s["volt_ts"]):
+            s["volt"], s["volt_ts"] = r["volt"], ts
+        if r.get("power_on") and (s["power_on_ts"] is None or ts < s["power_on_ts"]):
+            s["power_on_ts"] = ts
+    return summaries
+
+
+def apply_board_summaries(summaries: dict) -> list:
+    """
+    Один UPDATE на борт. Переход «офлайн -> онлайн» делается условным
+    UPDATE ... WHERE id = ? AND NOT is_online: строку борта под блокировкой
+    перевернёт ровно один запрос, даже если пачки пришли в разные воркеры.
+    Возвращает номера бортов, которые включились.
+    """
+    powered_on = []
+    for board_id, s in summaries.items():
+        fields = {"last_telemetry_at": s["ts"]}
+        if s["mode"]: fields["last_mode"] = s["mode"]
+        if s["volt"] is not None: fields["last_volt"] = s["volt"]
+
+        if s["power_on_ts"] is not None:
+            flipped = Board.objects.filter(pk=board_id, is_online=False).update(
+                is_online=True, online_since=s["power_on_ts"], **fields
+            )
+            if flipped:
+                powered_on.append(s["boat"])
+                continue
+        Board.objects.filter(pk=board_id).update(**fields)
+
+    # в очередь уведомлений одним INSERT — приём не ждёт Telegram, воркер сведёт в сводку
+    notify_transitions("online", [(boat, f"🟢 Борт #{boat} включился …") for boat in sorted(powered_on)])
+    return powered_on
+
+
+# переход «онлайн -> офлайн» для всех молчащих бортов сразу
+
+def _aware(v):
+    # sqlite отдаёт RETURNING строкой, Postgres — datetime
+    if isinstance(v, str):
+        v = parse_datetime(v)
+    if v is not None and timezone.is_naive(v):
+        v = timezone.make_aware(v, dt_timezone.utc)
+    return v
+
+
+def mark_offline_boards(cutoff) -> list:
+    """
+    Один UPDATE ... WHERE is_online AND (молчит с cutoff) RETURNING: строку переворачивает
+    ровно один запрос, повторный или параллельный прогон её уже не увидит.
+    Возвращает [(boat_number, last_telemetry_at), ...] по возрастанию номера.
+    """
+    table = connection.ops.quote_name(Board._meta.db_table)
+    with connection.cursor() as c:
+        c.execute(
+            f"UPDATE {table} SET is_online = %s "
+            f"WHERE is_online AND (last_telemetry_at IS NULL OR last_telemetry_at < %s) "
+            f"RETURNING boat_number, last_telemetry_at",
+            [False, connection.ops.adapt_datetimefield_value(cutoff)],
+        )
+        rows = c.fetchall()
+    return sorted((boat, _aware(ts)) for boat, ts in rows)
+
+
+def notify_offline(boards, cutoff) -> int:
+    """Переходы в офлайн — в очередь уведомлений; воркер сведёт их в одно сообщение на чат."""
+    return notify_transitions("offline", [
+        (boat, f"🔴 <b>Борт #{boat}</b> офлайн\n• Последняя телеметрия: "
+               f"<code>{(ts or cutoff).astimezone().strftime('%d.%m.%Y %H:%M:%S')}</code>")
+        for boat, ts in boards
+    ])
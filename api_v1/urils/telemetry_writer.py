@@ -0,0 +1,131 @@
+# групповая запись (group commit): строки из одновременных запросов процесса — одним upsert
+#
+# Большинство бортов шлёт пачки по 1-10 записей, и каждая была бы отдельным маленьким
+# INSERT + COMMIT. Здесь запрос нормализует свои записи сам, кладёт строки в общую очередь
+# процесса и ждёт; поток-писатель забирает всё накопившееся за TELEMETRY_GROUP_COMMIT_MS
+# (или раньше, как наберётся TELEMETRY_GROUP_COMMIT_ROWS строк) и пишет одним ingest_rows —
+# одна транзакция, один multi-row upsert, одни сводки. Запрос получает ответ только после
+# COMMIT, со своими счётчиками. Выигрыш — при нескольких потоках на процесс (gthread, ASGI);
+# у однопоточного воркера группа всегда из одного запроса, и это просто +N мс к ответу.
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .telemetry_ingest import TELEMETRY_CHUNK_ROWS, _normalized, ingest_rows
+from .telemetry_stream import iter_batches
+
+
+# сколько писатель ждёт попутчиков после первой строки в очереди (0 — групповая запись выключена)
+GROUP_COMMIT_MS = getattr(settings, "TELEMETRY_GROUP_COMMIT_MS", 0)
+# столько строк в очереди — пишем, не дожидаясь таймера
+GROUP_COMMIT_ROWS = getattr(settings, "TELEMETRY_GROUP_COMMIT_ROWS", 1000)
+# дольше запрос не ждёт (писатель завис на БД) — ошибка, борт повторит пачку
+GROUP_COMMIT_TIMEOUT = getattr(settings, "TELEMETRY_GROUP_COMMIT_TIMEOUT", 30.0)
+
+
+class WriterUnavailable(RuntimeError):
+    """Группа не записалась или писатель не ответил вовремя — беда сервера, а не пачки (503)."""
+
+
+def enabled() -> bool:
+    return GROUP_COMMIT_MS > 0
+
+
+class _Ticket:
+    """Строки одного запроса в очереди писателя и то, чем запись закончилась."""
+
+    __slots__ = ("rows", "done", "error")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.error = None
+
+    def counts(self) -> dict:
+        failed = sum(1 for r in self.rows if r["failed"])
+        saved = sum(1 for r in self.rows if r["fresh"])
+        return {"saved": saved, "updated": len(self.rows) - saved - failed, "errors": failed}
+
+
+class GroupCommitWriter:
+    def __init__(self, max_rows: int, delay: float):
+        self.max_rows, self.delay = max_rows, delay
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._rows = 0
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # после fork (gunicorn --preload) потока родителя в дочернем процессе нет
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="telemetry-group-commit", daemon=True)
+            self._thread.start()
+
+    def submit(self, rows) -> dict:
+        """Ставит строки в очередь и ждёт COMMIT. Таймаут и ошибка записи группы — WriterUnavailable."""
+        ticket = _Ticket(rows)
+        with self._cond:
+            self._ensure_thread()
+            self._queue.append(ticket)
+            self._rows += len(rows)
+            self._cond.notify()
+        if not ticket.done.wait(GROUP_COMMIT_TIMEOUT):
+            raise WriterUnavailable(f"group commit: no answer in {GROUP_COMMIT_TIMEOUT}s")
+        if ticket.error is not None:
+            raise WriterUnavailable(f"group commit failed: {ticket.error}") from ticket.error
+        return ticket.counts()
+
+    def _take_group(self) -> list:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # окно отсчитывается от первого в очереди: его задержка не больше delay
+            deadline = time.monotonic() + self.delay
+            while self._rows < self.max_rows:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            group = list(self._queue)
+            self._queue.clear()
+            self._rows = 0
+        return group
+
+    def _run(self):
+        while True:
+            group = self._take_group()
+            close_old_connections()
+            try:
+                ingest_rows([([r for t in group for r in t.rows], 0)])
+            except Exception as e:
+                print(f"[telemetry] group commit failed ({len(group)} requests): {e}")
+                for t in group:
+                    t.error = e
+            for t in group:
+                t.done.set()
+
+
+_writer = GroupCommitWriter(GROUP_COMMIT_ROWS, GROUP_COMMIT_MS / 1000.0)
+
+
+def ingest_payloads(payloads, chunk_rows: int = TELEMETRY_CHUNK_ROWS) -> dict:
+    """
+    То же, что telemetry_ingest.ingest_payloads, но запись — через общего писателя процесса.
+    Нормализация — в потоке запроса; ответ — после COMMIT группы, с числами только этого запроса.
+    """
+    saved, updated, errors = 0, 0, 0
+    boats = set()
+    for rows, bad in _normalized(iter_batches(payloads, chunk_rows)):
+        errors += bad
+        if not rows:
+            continue
+        res = _writer.submit(rows)
+        saved, updated, errors = saved + res["saved"], updated + res["updated"], errors + res["errors"]
+        boats.update(r["boat"] for r in rows)
+    return {"saved": saved, "updated": updated, "errors": errors, "boards": sorted(boats)}
@@ -21,13 +21,24 @@ from .views import NotesByCategoryTagAPIView
 from .views import NoteDetailAPIViewBot
 from .views import SearchNotesByTagAndQueryAPIView
 from .views import NotesByCategoryIdAPIView
-from .views import TelemetryFromJsonl
+from .views import TelemetryFromJsonl, BoardTelemetryAPIView, SessionTrackAPIView, BoardTelemetryExportAPIView
+from .views import BoardLinkStatsAPIView, BoardTelemetryRollupAPIView
+from .views import FleetLiveAPIView, TelemetryShardsAPIView, telemetry_stream
 
 
 urlpatterns = [
     
     # телеметрия с бортов
     path('telemetry/', TelemetryFromJsonl.as_view(), name='telemetry'),
+    path('telemetry/shards/', TelemetryShardsAPIView.as_view(), name='telemetry-shards'),
+    path('fleet/live/', FleetLiveAPIView.as_view(), name='fleet-live'),
+    path('stream/telemetry/', telemetry_stream, name='telemetry-stream'),
+    # WebSocket /api/v1/ws/telemetry/ обслуживается в djangoBackend/asgi.py
+    path('boards/<int:boat>/telemetry/', BoardTelemetryAPIView.as_view(), name='board-telemetry'),
+    path('boards/<int:boat>/telemetry/export/', BoardTelemetryExportAPIView.as_view(), name='board-telemetry-export'),
+    path('boards/<int:boat>/telemetry/rollup/', BoardTelemetryRollupAPIView.as_view(), name='board-telemetry-rollup'),
+    path('boards/<int:boat>/sessions/<str:sess>/track/', SessionTrackAPIView.as_view(), name='session-track'),
+    path('boards/<int:boat>/link-stats/', BoardLinkStatsAPIView.as_view(), name='board-link-stats'),
     
     
     # бот пути
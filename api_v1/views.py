@@ -1,10 +1,12 @@
 import io, gzip, json, math, traceback
 from typing import Dict, Any, List
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
+from django.conf import settings
 from django.utils.dateparse import parse_datetime
 from django.db.models import Q
-from django.db import IntegrityError, transaction
+from django.db import DatabaseError, IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -12,12 +14,15 @@ from rest_framework import status
 
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
-from api_v1.urils.telemetry_utils import maybe_mark_power_on
+from api_v1.urils.telemetry_ingest import ingest_payloads
+from api_v1.urils.telemetry_stream import BodyTooLarge, iter_body, iter_payloads, payload_kind
+from api_v1.urils.telemetry_spool import SPOOL_MAX_BATCH_BYTES, SpoolError, spool_batch
+from api_v1.urils import link_stats, live_state, live_stream, telemetry_batches, telemetry_export, telemetry_limits, telemetry_query, telemetry_rollup, telemetry_shards, telemetry_track, telemetry_writer
 from api_v1.urils.notify import tg_send
 
 from .permissions import IsSuperUser
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 
@@ -44,160 +49,313 @@ from .serializers import NoteDetailSerializerBot
 
 # обработка запросов с бортов
 
-def _nan_to_none(x):
-    try:
-        if x is None: return None
-        if isinstance(x, str) and x.strip().lower() in ("nan","null","none"):
-            return None
-        if isinstance(x, float) and math.isnan(x): return None
-        return x
-    except Exception:
-        return None
-
-def _to_bool01(x):
-    if x in (1,"1",True,"true","True"):   return True
-    if x in (0,"0",False,"false","False"): return False
-    return False
-
-def _ts_from_payload(obj):
-    ts_epoch = obj.get("ts_epoch")
-    ts = None
-    if ts_epoch is not None:
-        try: ts = datetime.fromtimestamp(int(ts_epoch), tz=timezone.utc)
-        except Exception: ts = None
-    if ts is None:
-        ts_str = obj.get("ts")
-        if ts_str:
-            ts = parse_datetime(ts_str)
-            if ts and ts.tzinfo is None:
-                ts = ts.replace(tzinfo=timezone.utc)
-    return ts or datetime.now(timezone.utc), ts_epoch
-
 class TelemetryFromJsonl(APIView):
     """
-    POST text/plain NDJSON (по строке JSON на запись) или application/json (список объектов).
+    POST text/plain NDJSON (по строке JSON на запись), application/json (список объектов)
+    или application/x-sova-telemetry (бинарные кадры, см. urils/telemetry_binary.py).
     Поля: boat, ts/ts_epoch?, sess?, seq?, lat, lon, alt_m, gs, hdg, volt, mode, wind_spd, wind_dir, gps, arm.
+    Необязательный X-Batch-Id: повтор уже записанной пачки (ответ 200) сразу получает ответ
+    первой попытки (с X-Batch-Replay: 1), тело не читается.
+    При TELEMETRY_BOARD_RATE записи сверх квоты борта откладываются в спул или прореживаются;
+    если отложить не вышло — ответ 429 с Retry-After (записанное в пределах квоты остаётся).
+    При TELEMETRY_INGEST_SHARDS записи уходят в очереди шардов по номеру борта — ответ 202.
+    При TELEMETRY_GROUP_COMMIT_MS строки одновременных запросов пишутся одной транзакцией,
+    ответ — после её COMMIT (см. urils/telemetry_writer.py).
     """
 
     def post(self, request, *args, **kwargs):
         try:
-            raw = request.body or b""
-            if raw[:2] == b"\x1f\x8b":
-                raw = gzip.GzipFile(fileobj=io.BytesIO(raw)).read()
-
-            payloads = []
-
-            ct = (request.META.get("CONTENT_TYPE") or "").lower()
-            if "application/json" in ct:
-                try:
-                    obj = json.loads(raw.decode("utf-8", "replace"))
-                    if isinstance(obj, list):
-                        payloads.extend(obj)
-                    elif isinstance(obj, dict):
-                        payloads.append(obj)
-                except Exception as e:
-                    return Response({"error":"bad json","detail":str(e)}, status=400)
+            batch_id = telemetry_batches.batch_id_from(request.META)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        if batch_id is None:
+            return self._ingest(request)
+
+        done = telemetry_batches.lookup(batch_id)
+        if done is not None:
+            code, result = done
+            return Response(result, status=code, headers={"X-Batch-Replay": "1"})
+
+        resp = self._ingest(request)
+        # только 200: пачка уже в БД. 202 (шарды, спул) — принята, но не записана,
+        # и повтор после потерянной задачи должен пройти приём заново
+        if resp.status_code == 200:
+            try:
+                telemetry_batches.remember(batch_id, resp.status_code, resp.data)
+            except Exception as e:
+                # пачка уже записана — ответ отдаём, повтор просто пройдёт приём заново
+                print(f"[telemetry] batch id store error: {e}")
+        return resp
+
+    def _ingest(self, request):
+        if getattr(settings, "TELEMETRY_ACCEPT_FAST", False):
+            return self._accept_fast(request)
+
+        try:
+            # тело читаем потоком: gzip распаковывается на лету, NDJSON разбирается построчно
+            chunks = iter_body(request.stream)
+
+            kind = payload_kind(request.META.get("CONTENT_TYPE"))
+            try:
+                payloads = iter_payloads(chunks, kind)
+            except BodyTooLarge as e:
+                return Response({"error": str(e)}, status=413)
+            except Exception as e:
+                return Response({"error":f"bad {kind}","detail":str(e)}, status=400)
+
+            # квота борта: сверх неё — в спул или прореживание, в ответе — подсказка, как слать дальше
+            limiter = telemetry_limits.Limiter() if telemetry_limits.enabled() else None
+            if limiter is not None:
+                payloads = limiter.admit(payloads)
+
+            if telemetry_shards.enabled():
+                # в очереди шардов по номеру борта — пишут воркеры, ответ сразу
+                resp, code = telemetry_shards.dispatch(payloads), 202
+            elif telemetry_writer.enabled():
+                # мелкие пачки одновременных запросов процесса — одной транзакцией
+                resp, code = telemetry_writer.ingest_payloads(payloads), 200
             else:
-                # NDJSON
-                for ln in raw.decode("utf-8","replace").splitlines():
-                    s = ln.strip()
-                    if not s: continue
-                    try:
-                        payloads.append(json.loads(s))
-                    except Exception as e:
-                        print(f"[telemetry] jsonl parse error: {e} line={s[:120]}")
-                        # пропускаем строку
-
-            saved, updated, errors = 0, 0, 0
-            boards_touched = set()
-
-            for obj in payloads:
-                try:
-                    boat = obj.get("boat")
-                    if boat is None:
-                        errors += 1
-                        continue
-
-                    # борт (создадим при первом сообщении)
-                    board, _ = Board.objects.get_or_create(
-                        boat_number=int(boat),
-                        defaults={"status": "active"},
-                    )
-                    boards_touched.add(board.boat_number)
-
-                    ts, ts_epoch = _ts_from_payload(obj)
-
-                    sess = obj.get("sess") or None
-                    seq = _nan_to_none(obj.get("seq"))
-                    lat = _nan_to_none(obj.get("lat"))
-                    lon = _nan_to_none(obj.get("lon"))
-                    alt_m = _nan_to_none(obj.get("alt_m"))
-                    gs  = _nan_to_none(obj.get("gs"))
-                    hdg = _nan_to_none(obj.get("hdg"))
-                    volt = _nan_to_none(obj.get("volt"))
-                    mode = obj.get("mode")
-                    wind_spd = _nan_to_none(obj.get("wind_spd"))
-                    wind_dir = _nan_to_none(obj.get("wind_dir"))
-                    gps = obj.get("gps")
-                    arm = _to_bool01(obj.get("arm"))
-
-                    # сохраняем телеметрию
-                    if sess and seq is not None:
-                        try:
-                            with transaction.atomic():
-                                Telemetry.objects.create(
-                                    board=board,
-                                    ts=ts, ts_epoch=ts_epoch,
-                                    sess=sess, seq=int(seq),
-                                    lat=lat, lon=lon, alt_m=alt_m,
-                                    gs=gs, hdg=hdg, volt=volt, mode=mode,
-                                    wind_spd=wind_spd, wind_dir=wind_dir,
-                                    gps=gps, arm=arm,
-                                )
-                                saved += 1
-                        except IntegrityError:
-                            q = Telemetry.objects.filter(board=board, sess=sess, seq=int(seq))
-                            updated += q.update(
-                                ts=ts, ts_epoch=ts_epoch,
-                                lat=lat, lon=lon, alt_m=alt_m,
-                                gs=gs, hdg=hdg, volt=volt, mode=mode,
-                                wind_spd=wind_spd, wind_dir=wind_dir,
-                                gps=gps, arm=arm,
-                            )
-                    else:
-                        Telemetry.objects.create(
-                            board=board,
-                            ts=ts, ts_epoch=ts_epoch,
-                            sess=sess, seq=int(seq) if isinstance(seq,(int,float)) else None,
-                            lat=lat, lon=lon, alt_m=alt_m,
-                            gs=gs, hdg=hdg, volt=volt, mode=mode,
-                            wind_spd=wind_spd, wind_dir=wind_dir,
-                            gps=gps, arm=arm,
-                        )
-                        saved += 1
-
-                    # сразу отметим «включился», если был оффлайн
-                    try:
-                        maybe_mark_power_on(board, obj, ts)
-                    except Exception as e:
-                        print(f"[telemetry] maybe_mark_power_on error: {e}")
-
-                except Exception as e:
-                    errors += 1
-                    print(f"[telemetry] item error: {e}  obj={str(obj)[:160]}")
-
-            resp = {"saved": saved, "updated": updated, "errors": errors, "boards": sorted(boards_touched)}
+                resp, code = ingest_payloads(payloads), 200
             # print(f"[telemetry] {resp}")   # видно и в runserver, и в gunicorn
-            return Response(resp, status=200)
-
+            if limiter is None:
+                return Response(resp, status=code)
+            resp.update(limiter.result())
+            if limiter.rejected:
+                # сверхквотное отложить не вышло — эту часть борт должен прислать позже
+                code = 429
+            headers = {"Retry-After": str(math.ceil(resp["next_send_s"]))} if limiter.deficit else None
+            return Response(resp, status=code, headers=headers)
+
+        except BodyTooLarge as e:
+            # NDJSON разбирается по ходу записи — часть пачки могла уже лечь в БД
+            return Response({"error": str(e)}, status=413)
+        except (telemetry_writer.WriterUnavailable, DatabaseError) as e:
+            # пачка тут ни при чём — БД/писатель недоступны, борт повторит её позже
+            print(f"[telemetry] ingest unavailable: {e}")
+            return Response({"error": str(e)}, status=503)
         except Exception as e:
             print(f"[telemetry] fatal: {e}")
             return Response({"error": str(e)}, status=400)
 
+    def _accept_fast(self, request):
+        """
+        Режим «принять быстро»: проверяем рамку, дописываем пачку в спул (fsync)
+        и сразу отвечаем 202. В БД её переносит задача drain_telemetry_spool.
+        """
+        try:
+            stream = request.stream
+            body = stream.read(SPOOL_MAX_BATCH_BYTES + 1) if stream is not None else b""
+            batch_id = spool_batch(body, payload_kind(request.META.get("CONTENT_TYPE")))
+        except SpoolError as e:
+            code = 413 if len(body) > SPOOL_MAX_BATCH_BYTES else 400
+            return Response({"error": str(e)}, status=code)
+        except Exception as e:
+            print(f"[telemetry] spool fatal: {e}")
+            return Response({"error": str(e)}, status=503)
+        return Response({"accepted": True, "batch": batch_id}, status=202)
+
     def get(self, request, *args, **kwargs):
         return Response({"status": "ok"}, status=200)
 
 
+class TelemetryShardsAPIView(APIView):
+    """
+    GET очередей шардированного приёма: [{"shard", "queue", "depth"}] — сколько задач
+    ждёт в очереди каждого шарда (TELEMETRY_INGEST_SHARDS, urils/telemetry_shards.py).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({"shards": telemetry_shards.queue_depths()}, status=200)
+
+
+class FleetLiveAPIView(APIView):
+    """
+    GET последнего состояния всех бортов в сети колонками:
+    {"now", "boat": [...], "ts", "lat", "lon", "alt", "hdg", "gs", "volt", "mode", "arm"}.
+    Данные из кэша, который обновляет приём; токен проверяется без чтения пользователя из БД.
+    """
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(live_state.snapshot_json(), content_type="application/json")
+
+
+async def telemetry_stream(request):
+    """
+    GET Server-Sent Events со свежей телеметрией: ?boats=1,2 (пусто — все борта).
+    Токен — в Authorization: Bearer или ?token= (EventSource не умеет заголовки).
+    Каждое событие "sample" несёт только изменившиеся поля борта. Нужен ASGI-сервер.
+    """
+    token = live_stream.bearer(request.headers.get("Authorization", "")) or request.GET.get("token")
+    if not live_stream.token_ok(token):
+        return JsonResponse({"error": "unauthorized"}, status=401)
+    try:
+        boats = live_stream.parse_boats(request.GET.get("boats"))
+    except ValueError:
+        return JsonResponse({"error": "bad boats"}, status=400)
+
+    resp = StreamingHttpResponse(live_stream.sse_events(boats), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"    # nginx: не буферизовать поток
+    return resp
+
+
+class BoardTelemetryAPIView(APIView):
+    """
+    GET телеметрии борта страницами: ?from=&to= (ISO или epoch), ?sess=, ?fields=lat,lon,...,
+    ?limit= (размер страницы), ?cursor= (значение "next" из прошлой страницы).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, boat, *args, **kwargs):
+        board_id = Board.objects.filter(boat_number=boat).values_list("id", flat=True).first()
+        if board_id is None:
+            return Response({"error": f"board {boat} not found"}, status=404)
+
+        q = request.query_params
+        try:
+            fields = telemetry_query.parse_fields(q.get("fields"))
+            limit = telemetry_query.parse_limit(q.get("limit"))
+            rows = telemetry_query.page_rows(
+                board_id, fields, limit,
+                start=telemetry_query.parse_time(q.get("from"), "from"),
+                end=telemetry_query.parse_time(q.get("to"), "to"),
+                sess=q.get("sess") or None,
+                cursor=telemetry_query.decode_cursor(q.get("cursor")),
+            )
+        except telemetry_query.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return StreamingHttpResponse(
+            telemetry_query.stream_page(rows, fields, limit), content_type="application/json"
+        )
+
+
+class BoardTelemetryRollupAPIView(APIView):
+    """
+    GET ряда агрегатов борта для графиков: ?from=&to= (по умолчанию — последние сутки),
+    ?points= (не больше стольких точек). Разрешение (1 с / 10 с / 1 мин и крупнее) выбирается
+    по длине диапазона; в точке — n, last_ts, min/max/avg/last чисел и последние mode/gps/arm.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, boat, *args, **kwargs):
+        board_id = Board.objects.filter(boat_number=boat).values_list("id", flat=True).first()
+        if board_id is None:
+            return Response({"error": f"board {boat} not found"}, status=404)
+
+        q = request.query_params
+        try:
+            end = telemetry_query.parse_time(q.get("to"), "to") or datetime.now(timezone.utc)
+            start = telemetry_query.parse_time(q.get("from"), "from") or end - timedelta(days=1)
+            points = int(q.get("points", telemetry_rollup.ROLLUP_MAX_POINTS))
+        except telemetry_query.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+        except ValueError:
+            return Response({"error": "bad points"}, status=400)
+        if start >= end:
+            return Response({"error": "from must be before to"}, status=400)
+
+        points = max(1, min(points, telemetry_rollup.ROLLUP_MAX_POINTS))
+        series = telemetry_rollup.rollup_series(board_id, start, end, points)
+        return Response(dict(series, boat=boat), status=200)
+
+
+class SessionTrackAPIView(APIView):
+    """
+    GET упрощённого трека сессии для карты: ?zoom= (0..22, по умолчанию 14).
+    Ответ — encoded polyline (точность 1e-5) и сколько точек было/осталось.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, boat, sess, *args, **kwargs):
+        board_id = Board.objects.filter(boat_number=boat).values_list("id", flat=True).first()
+        if board_id is None:
+            return Response({"error": f"board {boat} not found"}, status=404)
+        try:
+            zoom = int(request.query_params.get("zoom", telemetry_track.TRACK_DEFAULT_ZOOM))
+        except ValueError:
+            return Response({"error": "bad zoom"}, status=400)
+
+        track = telemetry_track.session_track(board_id, sess, zoom)
+        if not track["points"]:
+            return Response({"error": f"no track for session {sess}"}, status=404)
+        return Response(dict(track, boat=boat), status=200)
+
+
+class BoardLinkStatsAPIView(APIView):
+    """
+    GET качества канала борта по сессиям: потерянные seq, разрывы, интервал между
+    соседними seq и его разброс (jitter). ?sess=, ?from=&to= (по умолчанию — последние сутки),
+    ?source=exact (по строкам телеметрии, по умолчанию) | live (счётчики приёма, без чтения строк).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, boat, *args, **kwargs):
+        board_id = Board.objects.filter(boat_number=boat).values_list("id", flat=True).first()
+        if board_id is None:
+            return Response({"error": f"board {boat} not found"}, status=404)
+
+        q = request.query_params
+        source = q.get("source", "exact")
+        if source not in ("exact", "live"):
+            return Response({"error": f"unknown source {source}"}, status=400)
+        try:
+            start = telemetry_query.parse_time(q.get("from"), "from")
+            end = telemetry_query.parse_time(q.get("to"), "to")
+        except telemetry_query.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+
+        stats = link_stats.exact_stats if source == "exact" else link_stats.live_stats
+        sessions = stats(board_id, sess=q.get("sess") or None, start=start, end=end)
+        return Response({"boat": boat, "source": source, "sessions": sessions}, status=200)
+
+
+class BoardTelemetryExportAPIView(APIView):
+    """
+    GET выгрузки телеметрии борта файлом: ?file=parquet|feather, ?sess=, ?from=&to=.
+    (не ?format= — его DRF забирает под выбор рендерера.)
+    Файл пишется и отдаётся кусками по мере чтения из БД.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, boat, *args, **kwargs):
+        board_id = Board.objects.filter(boat_number=boat).values_list("id", flat=True).first()
+        if board_id is None:
+            return Response({"error": f"board {boat} not found"}, status=404)
+
+        q = request.query_params
+        fmt = q.get("file", "parquet")
+        if fmt not in telemetry_export.FORMATS:
+            return Response({"error": f"unknown format {fmt}"}, status=400)
+        sess = q.get("sess") or None
+        try:
+            batches = telemetry_export.iter_record_batches(
+                board_id, sess=sess,
+                start=telemetry_query.parse_time(q.get("from"), "from"),
+                end=telemetry_query.parse_time(q.get("to"), "to"),
+            )
+            body = telemetry_export.stream_export(fmt, batches)
+        except telemetry_query.QueryError as e:
+            return Response({"error": str(e)}, status=400)
+        except telemetry_export.ExportUnavailable as e:
+            return Response({"error": str(e)}, status=501)
+
+        content_type, ext = telemetry_export.FORMATS[fmt]
+        name = f"telemetry_{boat}" + (f"_{sess}" if sess else "") + f".{ext}"
+        resp = StreamingHttpResponse(body, content_type=content_type)
+        resp["Content-Disposition"] = f'attachment; filename="{name}"'
+        return resp
+
+
 # апи для бота
 
 class SearchNotesByTagAndQueryAPIView(APIView):
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_rename_app_telemet_board_i_37fe9a_idx_telemetry_board_i_7b0818_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='telemetry',
+            name='uniq_board_sess_seq',
+        ),
+        migrations.AddConstraint(
+            model_name='telemetry',
+            constraint=models.UniqueConstraint(fields=('board', 'sess', 'seq'), name='uniq_board_sess_seq'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:43
+
+from django.db import migrations, models
+
+
+# Postgres: telemetry -> секционированная по RANGE (ts) таблица.
+# Ключи секционированной таблицы обязаны включать ts: PK (id, ts), UNIQUE (board_id, sess, seq, ts).
+# Все строки сначала ложатся в секцию по умолчанию; помесячные секции создаёт и заполняет
+# manage.py telemetry_partitions (и ежедневная задача maintain_telemetry_partitions).
+# SQLite и прочие СУБД остаются с обычной таблицей.
+PARTITION_SQL = [
+    'ALTER TABLE "telemetry" RENAME TO "telemetry_legacy"',
+    'CREATE TABLE "telemetry" (LIKE "telemetry_legacy" INCLUDING DEFAULTS INCLUDING IDENTITY) PARTITION BY RANGE ("ts")',
+    'CREATE TABLE "telemetry_default" PARTITION OF "telemetry" DEFAULT',
+    'INSERT INTO "telemetry" SELECT * FROM "telemetry_legacy"',
+    '''SELECT setval(pg_get_serial_sequence('"telemetry"', 'id'), COALESCE((SELECT max("id") FROM "telemetry"), 0) + 1, false)''',
+    'DROP TABLE "telemetry_legacy"',
+    'ALTER TABLE "telemetry" ADD CONSTRAINT "telemetry_pkey" PRIMARY KEY ("id", "ts")',
+    'ALTER TABLE "telemetry" ADD CONSTRAINT "uniq_board_sess_seq" UNIQUE ("board_id", "sess", "seq", "ts")',
+    'ALTER TABLE "telemetry" ADD CONSTRAINT "telemetry_board_id_728959ae_fk_boards_id" '
+    'FOREIGN KEY ("board_id") REFERENCES "boards" ("id") DEFERRABLE INITIALLY DEFERRED',
+    'CREATE INDEX "telemetry_board_id_728959ae" ON "telemetry" ("board_id")',
+    'CREATE INDEX "telemetry_board_i_7b0818_idx" ON "telemetry" ("board_id", "ts")',
+    'CREATE INDEX "telemetry_sess_2bd49d_idx" ON "telemetry" ("sess", "seq")',
+]
+
+
+def partition_telemetry(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in PARTITION_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_remove_telemetry_uniq_board_sess_seq_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='telemetry',
+            name='uniq_board_sess_seq',
+        ),
+        migrations.AddConstraint(
+            model_name='telemetry',
+            constraint=models.UniqueConstraint(fields=('board', 'sess', 'seq', 'ts'), name='uniq_board_sess_seq'),
+        ),
+        migrations.RunPython(partition_telemetry),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_partition_telemetry_by_ts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryRollupWatermark',
+            fields=[
+                ('table', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'telemetry_rollup_watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='TelemetryRollup10s',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('n', models.IntegerField(default=0)),
+                ('last_ts', models.DateTimeField()),
+                ('alt_m_min', models.FloatField(blank=True, null=True)),
+                ('alt_m_max', models.FloatField(blank=True, null=True)),
+                ('alt_m_avg', models.FloatField(blank=True, null=True)),
+                ('alt_m_last', models.FloatField(blank=True, null=True)),
+                ('gs_min', models.FloatField(blank=True, null=True)),
+                ('gs_max', models.FloatField(blank=True, null=True)),
+                ('gs_avg', models.FloatField(blank=True, null=True)),
+                ('gs_last', models.FloatField(blank=True, null=True)),
+                ('volt_min', models.FloatField(blank=True, null=True)),
+                ('volt_max', models.FloatField(blank=True, null=True)),
+                ('volt_avg', models.FloatField(blank=True, null=True)),
+                ('volt_last', models.FloatField(blank=True, null=True)),
+                ('wind_spd_min', models.FloatField(blank=True, null=True)),
+                ('wind_spd_max', models.FloatField(blank=True, null=True)),
+                ('wind_spd_avg', models.FloatField(blank=True, null=True)),
+                ('wind_spd_last', models.FloatField(blank=True, null=True)),
+                ('lat_min', models.FloatField(blank=True, null=True)),
+                ('lat_max', models.FloatField(blank=True, null=True)),
+                ('lat_avg', models.FloatField(blank=True, null=True)),
+                ('lat_last', models.FloatField(blank=True, null=True)),
+                ('lon_min', models.FloatField(blank=True, null=True)),
+                ('lon_max', models.FloatField(blank=True, null=True)),
+                ('lon_avg', models.FloatField(blank=True, null=True)),
+                ('lon_last', models.FloatField(blank=True, null=True)),
+                ('hdg_last', models.FloatField(blank=True, null=True)),
+                ('wind_dir_last', models.FloatField(blank=True, null=True)),
+                ('mode', models.CharField(blank=True, max_length=32, null=True)),
+                ('gps', models.CharField(blank=True, max_length=16, null=True)),
+                ('arm', models.BooleanField(default=False)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.board')),
+            ],
+            options={
+                'db_table': 'telemetry_10s',
+                'constraints': [models.UniqueConstraint(fields=('board', 'bucket'), name='uniq_telemetry_10s')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TelemetryRollup1m',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('n', models.IntegerField(default=0)),
+                ('last_ts', models.DateTimeField()),
+                ('alt_m_min', models.FloatField(blank=True, null=True)),
+                ('alt_m_max', models.FloatField(blank=True, null=True)),
+                ('alt_m_avg', models.FloatField(blank=True, null=True)),
+                ('alt_m_last', models.FloatField(blank=True, null=True)),
+                ('gs_min', models.FloatField(blank=True, null=True)),
+                ('gs_max', models.FloatField(blank=True, null=True)),
+                ('gs_avg', models.FloatField(blank=True, null=True)),
+                ('gs_last', models.FloatField(blank=True, null=True)),
+                ('volt_min', models.FloatField(blank=True, null=True)),
+                ('volt_max', models.FloatField(blank=True, null=True)),
+                ('volt_avg', models.FloatField(blank=True, null=True)),
+                ('volt_last', models.FloatField(blank=True, null=True)),
+                ('wind_spd_min', models.FloatField(blank=True, null=True)),
+                ('wind_spd_max', models.FloatField(blank=True, null=True)),
+                ('wind_spd_avg', models.FloatField(blank=True, null=True)),
+                ('wind_spd_last', models.FloatField(blank=True, null=True)),
+                ('lat_min', models.FloatField(blank=True, null=True)),
+                ('lat_max', models.FloatField(blank=True, null=True)),
+                ('lat_avg', models.FloatField(blank=True, null=True)),
+                ('lat_last', models.FloatField(blank=True, null=True)),
+                ('lon_min', models.FloatField(blank=True, null=True)),
+                ('lon_max', models.FloatField(blank=True, null=True)),
+                ('lon_avg', models.FloatField(blank=True, null=True)),
+                ('lon_last', models.FloatField(blank=True, null=True)),
+                ('hdg_last', models.FloatField(blank=True, null=True)),
+                ('wind_dir_last', models.FloatField(blank=True, null=True)),
+                ('mode', models.CharField(blank=True, max_length=32, null=True)),
+                ('gps', models.CharField(blank=True, max_length=16, null=True)),
+                ('arm', models.BooleanField(default=False)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.board')),
+            ],
+            options={
+                'db_table': 'telemetry_1m',
+                'constraints': [models.UniqueConstraint(fields=('board', 'bucket'), name='uniq_telemetry_1m')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TelemetryRollup1s',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('n', models.IntegerField(default=0)),
+                ('last_ts', models.DateTimeField()),
+                ('alt_m_min', models.FloatField(blank=True, null=True)),
+                ('alt_m_max', models.FloatField(blank=True, null=True)),
+                ('alt_m_avg', models.FloatField(blank=True, null=True)),
+                ('alt_m_last', models.FloatField(blank=True, null=True)),
+                ('gs_min', models.FloatField(blank=True, null=True)),
+                ('gs_max', models.FloatField(blank=True, null=True)),
+                ('gs_avg', models.FloatField(blank=True, null=True)),
+                ('gs_last', models.FloatField(blank=True, null=True)),
+                ('volt_min', models.FloatField(blank=True, null=True)),
+                ('volt_max', models.FloatField(blank=True, null=True)),
+                ('volt_avg', models.FloatField(blank=True, null=True)),
+                ('volt_last', models.FloatField(blank=True, null=True)),
+                ('wind_spd_min', models.FloatField(blank=True, null=True)),
+                ('wind_spd_max', models.FloatField(blank=True, null=True)),
+                ('wind_spd_avg', models.FloatField(blank=True, null=True)),
+                ('wind_spd_last', models.FloatField(blank=True, null=True)),
+                ('lat_min', models.FloatField(blank=True, null=True)),
+                ('lat_max', models.FloatField(blank=True, null=True)),
+                ('lat_avg', models.FloatField(blank=True, null=True)),
+                ('lat_last', models.FloatField(blank=True, null=True)),
+                ('lon_min', models.FloatField(blank=True, null=True)),
+                ('lon_max', models.FloatField(blank=True, null=True)),
+                ('lon_avg', models.FloatField(blank=True, null=True)),
+                ('lon_last', models.FloatField(blank=True, null=True)),
+                ('hdg_last', models.FloatField(blank=True, null=True)),
+                ('wind_dir_last', models.FloatField(blank=True, null=True)),
+                ('mode', models.CharField(blank=True, max_length=32, null=True)),
+                ('gps', models.CharField(blank=True, max_length=16, null=True)),
+                ('arm', models.BooleanField(default=False)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.board')),
+            ],
+            options={
+                'db_table': 'telemetry_1s',
+                'constraints': [models.UniqueConstraint(fields=('board', 'bucket'), name='uniq_telemetry_1s')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_telemetry_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='distance_m',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='flight_seconds',
+            field=models.FloatField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FlightSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sess', models.CharField(max_length=64)),
+                ('start_ts', models.DateTimeField()),
+                ('end_ts', models.DateTimeField()),
+                ('samples', models.IntegerField(default=0)),
+                ('seq_min', models.IntegerField(blank=True, null=True)),
+                ('seq_max', models.IntegerField(blank=True, null=True)),
+                ('distance_m', models.FloatField(default=0)),
+                ('arm_seconds', models.FloatField(default=0)),
+                ('alt_max', models.FloatField(blank=True, null=True)),
+                ('gs_max', models.FloatField(blank=True, null=True)),
+                ('volt_min', models.FloatField(blank=True, null=True)),
+                ('volt_max', models.FloatField(blank=True, null=True)),
+                ('modes', models.JSONField(default=dict)),
+                ('last_lat', models.FloatField(blank=True, null=True)),
+                ('last_lon', models.FloatField(blank=True, null=True)),
+                ('last_arm', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flights', to='app.board')),
+            ],
+            options={
+                'db_table': 'flight_sessions',
+                'indexes': [models.Index(fields=['board', 'start_ts'], name='flight_sess_board_i_93c109_idx')],
+                'constraints': [models.UniqueConstraint(fields=('board', 'sess'), name='uniq_flight_session')],
+            },
+        ),
+    ]
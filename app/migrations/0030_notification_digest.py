@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-16 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='boat',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('', 'message'), ('online', 'online'), ('offline', 'offline')], default='', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'pending'), ('sent', 'sent'), ('failed', 'failed'), ('digested', 'digested')], default='pending', max_length=16),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-16 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0030_notification_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightsession',
+            name='gap_runs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flightsession',
+            name='iat_n',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flightsession',
+            name='iat_sq_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flightsession',
+            name='iat_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flightsession',
+            name='last_seq',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightsession',
+            name='late_samples',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-16 21:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0031_flight_session_link_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryBatch',
+            fields=[
+                ('batch_id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('status_code', models.SmallIntegerField(default=200)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'telemetry_batches',
+            },
+        ),
+    ]
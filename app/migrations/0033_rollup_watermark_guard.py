@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def close_existing_marks(apps, schema_editor):
+    # всё, что досчитано до сих пор, считаем закрытым — иначе первый проход пересчитает всю таблицу
+    Watermark = apps.get_model('app', 'TelemetryRollupWatermark')
+    Watermark.objects.update(safe_id=F('last_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0032_telemetry_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telemetryrollupwatermark',
+            name='guard_xid',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='telemetryrollupwatermark',
+            name='safe_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='telemetryrollupwatermark',
+            name='seen_rows',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(close_existing_marks, migrations.RunPython.noop),
+    ]
@@ -23,6 +23,10 @@ class Board(models.Model):
     last_mode = models.CharField(max_length=64, blank=True, null=True)
     last_volt = models.FloatField(blank=True, null=True)
 
+    # накопительные счётчики за всё время (из FlightSession при приёме)
+    flight_seconds = models.FloatField(default=0)   # время во взведённом состоянии
+    distance_m = models.FloatField(default=0)
+
     class Meta:
         verbose_name = 'Board'
         verbose_name_plural = 'Boards'
@@ -58,15 +62,18 @@ class Telemetry(models.Model):
 
     class Meta:
         db_table = "telemetry"   # <<< добавь это, если хочешь ровно public.telemetry
+        # в Postgres таблица секционирована по месяцам ts (миграция 0026, urils/telemetry_partitions.py):
+        # поэтому ts входит и в первичный ключ (id, ts), и в уникальный ключ ниже
         indexes = [
             models.Index(fields=["board", "ts"]),
             models.Index(fields=["sess", "seq"]),
         ]
         constraints = [
+            # без deferrable: ON CONFLICT (board_id, sess, seq, ts) не работает с отложенными ограничениями;
+            # повтор записи с sess/seq без времени с борта приём сводит к уже записанному ts
             models.UniqueConstraint(
-                fields=["board", "sess", "seq"],
+                fields=["board", "sess", "seq", "ts"],
                 name="uniq_board_sess_seq",
-                deferrable=models.Deferrable.DEFERRED,
             )
         ]
 
@@ -74,6 +81,176 @@ class Telemetry(models.Model):
         return f"TEL #{self.board.boat_number} @ {self.ts}"
 
 
+# сводка по сессии (полёту) — обновляется при приёме, urils/flight_sessions.py
+
+class FlightSession(models.Model):
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name="flights")
+    sess = models.CharField(max_length=64)
+
+    start_ts = models.DateTimeField()
+    end_ts = models.DateTimeField()
+    samples = models.IntegerField(default=0)
+    seq_min = models.IntegerField(blank=True, null=True)
+    seq_max = models.IntegerField(blank=True, null=True)
+
+    distance_m = models.FloatField(default=0)
+    arm_seconds = models.FloatField(default=0)
+    alt_max = models.FloatField(blank=True, null=True)
+    gs_max = models.FloatField(blank=True, null=True)
+    volt_min = models.FloatField(blank=True, null=True)
+    volt_max = models.FloatField(blank=True, null=True)
+    modes = models.JSONField(default=dict)          # {режим: число записей}
+
+    # качество канала по ходу приёма (urils/link_stats.py): разрывы seq, опоздавшие строки,
+    # интервалы между соседними seq — суммы, чтобы сливать пачки сложением
+    gap_runs = models.IntegerField(default=0)
+    late_samples = models.IntegerField(default=0)
+    iat_n = models.IntegerField(default=0)
+    iat_sum = models.FloatField(default=0)
+    iat_sq_sum = models.FloatField(default=0)
+
+    # последняя точка — чтобы следующая пачка продолжила дистанцию и время во взводе
+    last_lat = models.FloatField(blank=True, null=True)
+    last_lon = models.FloatField(blank=True, null=True)
+    last_arm = models.BooleanField(default=False)
+    last_seq = models.IntegerField(blank=True, null=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "flight_sessions"
+        constraints = [models.UniqueConstraint(fields=["board", "sess"], name="uniq_flight_session")]
+        indexes = [models.Index(fields=["board", "start_ts"])]
+
+    def __str__(self):
+        return f"Flight #{self.board.boat_number} {self.sess}"
+
+
+# агрегаты телеметрии по интервалам (ведёт urils/telemetry_rollup.py)
+
+class TelemetryRollup(models.Model):
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name="+")
+    bucket = models.DateTimeField()            # начало интервала
+    n = models.IntegerField(default=0)         # строк в интервале
+    last_ts = models.DateTimeField()
+
+    alt_m_min = models.FloatField(blank=True, null=True)
+    alt_m_max = models.FloatField(blank=True, null=True)
+    alt_m_avg = models.FloatField(blank=True, null=True)
+    alt_m_last = models.FloatField(blank=True, null=True)
+    gs_min = models.FloatField(blank=True, null=True)
+    gs_max = models.FloatField(blank=True, null=True)
+    gs_avg = models.FloatField(blank=True, null=True)
+    gs_last = models.FloatField(blank=True, null=True)
+    volt_min = models.FloatField(blank=True, null=True)
+    volt_max = models.FloatField(blank=True, null=True)
+    volt_avg = models.FloatField(blank=True, null=True)
+    volt_last = models.FloatField(blank=True, null=True)
+    wind_spd_min = models.FloatField(blank=True, null=True)
+    wind_spd_max = models.FloatField(blank=True, null=True)
+    wind_spd_avg = models.FloatField(blank=True, null=True)
+    wind_spd_last = models.FloatField(blank=True, null=True)
+    lat_min = models.FloatField(blank=True, null=True)
+    lat_max = models.FloatField(blank=True, null=True)
+    lat_avg = models.FloatField(blank=True, null=True)
+    lat_last = models.FloatField(blank=True, null=True)
+    lon_min = models.FloatField(blank=True, null=True)
+    lon_max = models.FloatField(blank=True, null=True)
+    lon_avg = models.FloatField(blank=True, null=True)
+    lon_last = models.FloatField(blank=True, null=True)
+    # углы: среднее арифметическое по кругу бессмысленно, храним только последнее
+    hdg_last = models.FloatField(blank=True, null=True)
+    wind_dir_last = models.FloatField(blank=True, null=True)
+
+    mode = models.CharField(max_length=32, blank=True, null=True)
+    gps = models.CharField(max_length=16, blank=True, null=True)
+    arm = models.BooleanField(default=False)
+
+    class Meta:
+        abstract = True
+
+
+class TelemetryRollup1s(TelemetryRollup):
+    class Meta:
+        db_table = "telemetry_1s"
+        constraints = [models.UniqueConstraint(fields=["board", "bucket"], name="uniq_telemetry_1s")]
+
+
+class TelemetryRollup10s(TelemetryRollup):
+    class Meta:
+        db_table = "telemetry_10s"
+        constraints = [models.UniqueConstraint(fields=["board", "bucket"], name="uniq_telemetry_10s")]
+
+
+class TelemetryRollup1m(TelemetryRollup):
+    class Meta:
+        db_table = "telemetry_1m"
+        constraints = [models.UniqueConstraint(fields=["board", "bucket"], name="uniq_telemetry_1m")]
+
+
+class TelemetryRollupWatermark(models.Model):
+    # до какого Telemetry.id таблица агрегатов уже досчитана
+    table = models.CharField(max_length=32, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    # ниже safe_id новых строк уже не появится; в (safe_id, last_id] видели seen_rows строк,
+    # там ещё могут закоммититься транзакции с xid < guard_xid (urils/telemetry_rollup.py)
+    safe_id = models.BigIntegerField(default=0)
+    seen_rows = models.BigIntegerField(default=0)
+    guard_xid = models.BigIntegerField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "telemetry_rollup_watermark"
+
+
+# пачки с заголовком X-Batch-Id, уже записанные приёмом: повтор получает сохранённый ответ
+# (urils/telemetry_batches.py), старше TELEMETRY_BATCH_ID_TTL_HOURS — удаляются задачей
+
+class TelemetryBatch(models.Model):
+    batch_id = models.CharField(max_length=64, primary_key=True)
+    status_code = models.SmallIntegerField(default=200)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = "telemetry_batches"
+
+    def __str__(self):
+        return f"Batch {self.batch_id}"
+
+
+# исходящие уведомления в Telegram: пишет приём/задачи, отправляет urils/notify_outbox.py
+
+class NotificationOutbox(models.Model):
+    PENDING, SENT, FAILED, DIGESTED = "pending", "sent", "failed", "digested"
+    STATUSES = [(PENDING, "pending"), (SENT, "sent"), (FAILED, "failed"), (DIGESTED, "digested")]
+    # переходы бортов копятся и уходят сводкой (DIGESTED — вошёл в сводку или погашен)
+    ONLINE, OFFLINE = "online", "offline"
+    KINDS = [("", "message"), (ONLINE, "online"), (OFFLINE, "offline")]
+
+    chat_id = models.CharField(max_length=64)
+    thread_id = models.IntegerField(blank=True, null=True)
+    text = models.TextField()
+    parse_mode = models.CharField(max_length=16, blank=True, default="HTML")
+    kind = models.CharField(max_length=16, choices=KINDS, blank=True, default="")
+    boat = models.IntegerField(blank=True, null=True)
+
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "notification_outbox"
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"Notification #{self.pk} {self.status}"
+
+
 class AuthGroup(models.Model):
     name = models.CharField(unique=True, max_length=150)
 
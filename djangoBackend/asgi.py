@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoBackend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# после инициализации Django: модуль тянет настройки и simplejwt
+from api_v1.urils.live_stream import websocket_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # WebSocket Django не обслуживает — поток телеметрии отдаём сами, остальное — Django
+    if scope["type"] == "websocket":
+        return await websocket_app(scope, receive, send)
+    return await django_application(scope, receive, send)
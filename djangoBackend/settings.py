@@ -48,6 +48,38 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID   = os.getenv("TELEGRAM_CHAT_ID", "")
 TELEGRAM_THREAD_ID = os.getenv("TELEGRAM_THREAD_ID", "")
 
+# телеметрия: «принять быстро» — пачка пишется в спул на диске и сразу 202,
+# в БД её переносит drain_telemetry_spool (спул должен быть общим для веба и celery)
+TELEMETRY_ACCEPT_FAST = os.getenv("TELEMETRY_ACCEPT_FAST", "0") == "1"
+TELEMETRY_SPOOL_DIR = os.getenv("TELEMETRY_SPOOL_DIR", str(BASE_DIR / "spool" / "telemetry"))
+
+# секции telemetry (Postgres): сколько месяцев создавать заранее и сколько хранить (пусто — всё)
+TELEMETRY_PARTITIONS_AHEAD = int(os.getenv("TELEMETRY_PARTITIONS_AHEAD", "3"))
+TELEMETRY_RETENTION_MONTHS = int(os.getenv("TELEMETRY_RETENTION_MONTHS", "0")) or None
+
+# квота приёма на борт (записей/с, 0 — без квоты) и что делать сверх неё: defer (в спул) / downsample
+TELEMETRY_BOARD_RATE = float(os.getenv("TELEMETRY_BOARD_RATE", "0"))
+TELEMETRY_OVER_QUOTA_POLICY = os.getenv("TELEMETRY_OVER_QUOTA_POLICY", "defer")
+
+# приём через очереди Celery по шардам (борт -> шард по номеру, 0 — писать прямо в запросе);
+# на каждую очередь telemetry.ingest.<N> — воркер с -c 1, см. urils/telemetry_shards.py
+TELEMETRY_INGEST_SHARDS = int(os.getenv("TELEMETRY_INGEST_SHARDS", "0"))
+
+# групповая запись в процессе веба: строки одновременных запросов копятся столько мс и пишутся
+# одной транзакцией (0 — каждый запрос пишет сам); имеет смысл при нескольких потоках на воркер
+TELEMETRY_GROUP_COMMIT_MS = float(os.getenv("TELEMETRY_GROUP_COMMIT_MS", "0"))
+
+# общий для всех процессов кэш (live-состояние бортов, треки сессий);
+# без CACHE_REDIS_URL — память процесса, годится только для разработки
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_REDIS_URL}
+        if CACHE_REDIS_URL else
+        {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+}
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "Europe/Moscow"
@@ -58,6 +90,26 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(),  # каждую минуту
         "args": (3,),           # таймаут 3 минуты
     },
+    "drain-telemetry-spool": {
+        "task": "djangoBackend.tasks.drain_telemetry_spool",
+        "schedule": 5.0,        # каждые 5 секунд
+    },
+    "maintain-telemetry-partitions": {
+        "task": "djangoBackend.tasks.maintain_telemetry_partitions",
+        "schedule": crontab(hour=3, minute=15),  # раз в сутки
+    },
+    "update-telemetry-rollups": {
+        "task": "djangoBackend.tasks.update_telemetry_rollups",
+        "schedule": 10.0,       # каждые 10 секунд
+    },
+    "deliver-notifications": {
+        "task": "djangoBackend.tasks.deliver_notifications",
+        "schedule": 5.0,        # каждые 5 секунд
+    },
+    "purge-telemetry-batches": {
+        "task": "djangoBackend.tasks.purge_telemetry_batches",
+        "schedule": crontab(minute=40),  # раз в час
+    },
 }
 
 
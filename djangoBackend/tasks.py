@@ -1,23 +1,66 @@
 from datetime import datetime, timezone, timedelta
 from celery import shared_task
-from django.db.models import Q
-from app.models import Board
-from api_v1.urils.notify import tg_send
+from django.db import connection, transaction
+from api_v1.urils.telemetry_spool import drain_spool
+from api_v1.urils.telemetry_utils import mark_offline_boards, notify_offline
+from api_v1.urils import notify_outbox, telemetry_batches, telemetry_partitions, telemetry_rollup, telemetry_shards
+
+# ключ pg_try_advisory_xact_lock для check_offline_boards
+OFFLINE_CHECK_LOCK = 0x0FF11E
 
 @shared_task
 def check_offline_boards(timeout_minutes: int = 3):
     now = datetime.now(timezone.utc)
     cutoff = now - timedelta(minutes=timeout_minutes)
 
-    qs = Board.objects.filter(is_online=True).filter(
-        Q(last_telemetry_at__isnull=True) | Q(last_telemetry_at__lt=cutoff)
-    )
-
-    cnt = 0
-    for b in qs:
-        b.is_online = False
-        b.save(update_fields=["is_online"])
-        when = (b.last_telemetry_at or cutoff).astimezone().strftime("%d.%m.%Y %H:%M:%S")
-        tg_send(f"🔴 <b>Борт #{b.boat_number}</b> офлайн\n• Последняя телеметрия: <code>{when}</code>")
-        cnt += 1
-    return cnt
\ No newline at end of file
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # второй beat / наложившийся прогон не ждёт блокировок на строках, а просто пропускает минуту
+            with connection.cursor() as c:
+                c.execute("SELECT pg_try_advisory_xact_lock(%s)", [OFFLINE_CHECK_LOCK])
+                if not c.fetchone()[0]:
+                    print("[telemetry] check_offline_boards: previous run still active, skip")
+                    return 0
+        boards = mark_offline_boards(cutoff)
+        # одной пачкой в очередь уведомлений — в той же транзакции, что и переход в офлайн
+        notify_offline(boards, cutoff)
+    return len(boards)
+
+@shared_task
+def drain_telemetry_spool(max_records: int = 10000):
+    # пачки, принятые в режиме TELEMETRY_ACCEPT_FAST, переносим из спула в БД
+    return drain_spool(max_records=max_records)
+
+
+# подтверждение — после записи: упавший воркер не теряет пачку, её получит следующий.
+# Повтор безопасен — строки идут upsert'ом, сводка сессий сливается в той же транзакции.
+# Временные ошибки БД повторяются внутри задачи, а не retry(): так пачка не обгоняется
+# следующими пачками борта (см. telemetry_shards.ingest_shard)
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def ingest_telemetry_shard(payloads, received_at=None):
+    # записи бортов одного шарда (urils/telemetry_shards.py); очередь шарда разбирает один процесс
+    return telemetry_shards.ingest_shard(payloads, received_at)
+
+
+@shared_task
+def maintain_telemetry_partitions():
+    # секции telemetry на месяцы вперёд + срок хранения (TELEMETRY_RETENTION_MONTHS)
+    return telemetry_partitions.maintain()
+
+
+@shared_task
+def update_telemetry_rollups():
+    # агрегаты 1с/10с/1мин по новым строкам Telemetry (после водяной отметки)
+    return telemetry_rollup.catch_up()
+
+
+@shared_task
+def deliver_notifications(max_seconds: int = 30):
+    # очередь NotificationOutbox -> Telegram (лимиты, повторы); наложившийся прогон выходит сразу
+    return notify_outbox.deliver(max_seconds=max_seconds)
+
+
+@shared_task
+def purge_telemetry_batches():
+    # X-Batch-Id записанных пачек старше TELEMETRY_BATCH_ID_TTL_HOURS
+    return telemetry_batches.purge()